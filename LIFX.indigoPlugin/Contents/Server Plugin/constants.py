@@ -129,6 +129,16 @@ K_RECOVERY_FREQUENCY = 98
 K_HIDE_RECOVERY_MESSAGES = 99
 K_INITIAL_DISCOVERY_COMPLETE = 100
 K_LOCATION = 101
+K_PACKETS_PER_SECOND = 102
+K_DEVICE_PACKETS_PER_SECOND = 103
+K_BROADCAST = 104
+K_DISCOVERY_CACHE_PATH = 105
+K_CACHED = 106
+
+# Discovery change events (see diff_discovered_lifx_devices in discovery.py)
+DISCOVERY_EVENT_FOUND = 1     # A lamp that wasn't known, or only known from the discovery cache, has been seen and refreshed
+DISCOVERY_EVENT_CHANGED = 2   # A known lamp has been refreshed (e.g. because its IP address changed) and its details have changed
+DISCOVERY_EVENT_VANISHED = 3  # A known lamp didn't answer the discovery broadcast
 
 # Plugin Internal commands
 CMD_BRIGHTEN = 1001
@@ -165,6 +175,7 @@ CMD_STOP_THREAD = 1031
 CMD_WAVEFORM = 1032
 CMD_WAVEFORM_OFF = 1033
 CMD_WHITE = 1034
+CMD_DISCOVERY_INCREMENTAL = 1035
 
 # Plugin Internal commands (translation)
 CMD_TRANSLATION = dict()
@@ -175,6 +186,7 @@ CMD_TRANSLATION[CMD_COLOR] = 'COLOR'
 CMD_TRANSLATION[CMD_DIM] = 'DIM'
 CMD_TRANSLATION[CMD_DIM_BY_TIMER] = 'DIM BY TIMER'
 CMD_TRANSLATION[CMD_DISCOVERY] = 'DISCOVERY'
+CMD_TRANSLATION[CMD_DISCOVERY_INCREMENTAL] = 'DISCOVERY INCREMENTAL'
 CMD_TRANSLATION[CMD_GET_GROUP] = 'GET GROUP'
 CMD_TRANSLATION[CMD_GET_HOST_INFO] = 'GET HOST INFO'
 CMD_TRANSLATION[CMD_GET_INFO] = 'GET INFO'
@@ -203,6 +215,25 @@ CMD_TRANSLATION[CMD_WAVEFORM] = 'WAVEFORM'
 CMD_TRANSLATION[CMD_WAVEFORM_OFF] = 'WAVEFORM OFF'
 CMD_TRANSLATION[CMD_WHITE] = 'WHITE'
 
+# Plugin Internal commands (coalescing)
+# A command queued for a device supersedes any commands of the same class still waiting to be processed for that device
+# (see CommandDispatcher.dispatch). Commands not listed here are never coalesced.
+CMD_COALESCE_CLASS = dict()
+CMD_COALESCE_CLASS[CMD_BRIGHTEN] = CMD_BRIGHTNESS  # Dim / Brighten / Brightness all carry the new absolute brightness
+CMD_COALESCE_CLASS[CMD_BRIGHTNESS] = CMD_BRIGHTNESS
+CMD_COALESCE_CLASS[CMD_DIM] = CMD_BRIGHTNESS
+CMD_COALESCE_CLASS[CMD_COLOR] = CMD_COLOR
+CMD_COALESCE_CLASS[CMD_WHITE] = CMD_COLOR
+CMD_COALESCE_CLASS[CMD_IMMEDIATE_ON] = CMD_ON
+CMD_COALESCE_CLASS[CMD_OFF] = CMD_ON
+CMD_COALESCE_CLASS[CMD_ON] = CMD_ON
+CMD_COALESCE_CLASS[CMD_INFRARED_OFF] = CMD_INFRARED_SET
+CMD_COALESCE_CLASS[CMD_INFRARED_ON] = CMD_INFRARED_SET
+CMD_COALESCE_CLASS[CMD_INFRARED_SET] = CMD_INFRARED_SET
+CMD_COALESCE_CLASS[CMD_POLLING_STATUS] = CMD_STATUS
+CMD_COALESCE_CLASS[CMD_RECOVERY_STATUS] = CMD_STATUS
+CMD_COALESCE_CLASS[CMD_STATUS] = CMD_STATUS
+
 # Number of discoveries to executed at start-up
 START_UP_REQUIRED_DISCOVERY_COUNT = 10 
 
@@ -218,6 +249,15 @@ QUEUE_PRIORITY_DISCOVERY      = 600
 QUEUE_PRIORITY_POLLING        = 700
 QUEUE_PRIORITY_LOW            = 800
 
+# Number of worker threads that process lifxlanHandler commands (each LIFX device is processed by one worker at a time)
+LIFXLAN_HANDLER_WORKER_THREADS = 32
+
+# Number of seconds that a broadcast status poll waits for LIFX devices to reply
+POLLING_BROADCAST_WINDOW_SECONDS = 0.5
+
+# CMD_POLLING_STATUS argument for a LIFX device that the polling thread asked for its status but got no reply from
+POLLING_NO_REPLY = 'NO REPLY'
+
 # LIFX product constants
 # LIFX_PRODUCTS = dict()
 #                    Color, Infrared, Multizone, Name
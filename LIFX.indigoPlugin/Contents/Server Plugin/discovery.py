@@ -20,8 +20,11 @@ except ImportError:
     # Python 2
     import Queue as queue
 
+import json
+import os
 import sys
 import threading
+from time import time as current_time  # 'time' is redefined by 'from lifxlan.lifxlan import *'
 import traceback
 
 # ============================== Custom Imports ===============================
@@ -33,9 +36,128 @@ except ImportError:
 # ============================== Plugin Imports ===============================
 from constants import *
 from lifxlan.lifxlan import *
+from lifxlan.device import refresh_broadcast_targets, static_attributes
+from lifxlan.products import features_map, product_map
 
 
-def store_discovered_lifx_device(globals_discovery, lifx_device):
+# Discovery record fields saved in the discovery cache file, with their names in the file. The product name and
+# features aren't saved: they are looked up from the product, as lifxlan does.
+DISCOVERY_CACHE_FIELDS = [(K_LABEL, "label"), (K_IP_ADDRESS, "ip_address"), (K_PORT, "port"), (K_GROUP, "group"),
+                          (K_LOCATION, "location"), (K_POWER_LEVEL, "power_level"),
+                          (K_HOST_FIRMWARE_BUILD_TIMESTAMP, "host_firmware_build_timestamp"), (K_HOST_FIRMWARE_VERSION, "host_firmware_version"),
+                          (K_WIFI_FIRMWARE_BUILD_TIMESTAMP, "wifi_firmware_build_timestamp"), (K_WIFI_FIRMWARE_VERSION, "wifi_firmware_version"),
+                          (K_FIRMWARE_UI, "firmware_ui"), (K_VENDOR, "vendor"), (K_PRODUCT, "product"), (K_VERSION, "version")]
+DISCOVERY_CACHE_FORMAT = 1
+
+
+def save_discovery_cache(globals_discovery, cache_path):
+    # Saves the discovery records (MAC -> address, product, features, firmware and labels) so that, after a restart,
+    # lamps can be started straight away while discovery runs in the background
+    try:
+        # One row of values per device, in the order of the field names given once at the top
+        cache = {"format": DISCOVERY_CACHE_FORMAT, "saved_at": current_time(), "fields": [name for key, name in DISCOVERY_CACHE_FIELDS], "devices": {}}
+        for lifx_mac_address, lifx_value in list(globals_discovery.items()):
+            cache["devices"][lifx_mac_address] = [lifx_value[key] for key, name in DISCOVERY_CACHE_FIELDS]
+
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temporary_path = f"{cache_path}.tmp"
+        with open(temporary_path, "w") as cache_file:
+            json.dump(cache, cache_file, separators=(",", ":"))
+        os.replace(temporary_path, cache_path)  # Never leave a half written cache behind
+        return True, None
+
+    except Exception as exception_error:
+        return False, f"Unable to save LIFX discovery cache '{cache_path}': {exception_error}"
+
+
+def load_discovery_cache(globals_discovery, cache_path):
+    # Loads the records saved by save_discovery_cache as cached (K_CACHED) records, for devices discovery hasn't yet seen.
+    # Also primes lifxlan's version and firmware cache so that the first refresh of each lamp needn't ask for them.
+    try:
+        if not os.path.exists(cache_path):
+            return True, None
+        with open(cache_path) as cache_file:
+            cache = json.load(cache_file)
+        if cache.get("format") != DISCOVERY_CACHE_FORMAT or cache["fields"] != [name for key, name in DISCOVERY_CACHE_FIELDS]:
+            return True, None  # Written by another version of the plugin: discovery will rebuild it
+
+        for lifx_mac_address, lifx_cached in cache["devices"].items():
+            if lifx_mac_address in globals_discovery:
+                continue
+            lifx_value = {key: value for (key, name), value in zip(DISCOVERY_CACHE_FIELDS, lifx_cached)}
+            lifx_value[K_PRODUCT_NAME] = product_map.get(lifx_value[K_PRODUCT])
+            lifx_value[K_PRODUCT_FEATURES] = features_map[lifx_value[K_PRODUCT]] if lifx_value[K_PRODUCT] in product_map else None
+            lifx_value[K_CHANGED_INFO] = False
+            lifx_value[K_INDIGO_DEVICE_ID] = 0
+            lifx_value[K_CACHED] = True
+            globals_discovery[lifx_mac_address] = lifx_value
+
+            static_attributes.put(lifx_mac_address, {"host_firmware_build_timestamp": lifx_value[K_HOST_FIRMWARE_BUILD_TIMESTAMP],
+                                                     "host_firmware_version": lifx_value[K_HOST_FIRMWARE_VERSION],
+                                                     "wifi_firmware_build_timestamp": lifx_value[K_WIFI_FIRMWARE_BUILD_TIMESTAMP],
+                                                     "wifi_firmware_version": lifx_value[K_WIFI_FIRMWARE_VERSION],
+                                                     "vendor": lifx_value[K_VENDOR],
+                                                     "product": lifx_value[K_PRODUCT],
+                                                     "version": lifx_value[K_VERSION]}, cached_at=cache["saved_at"])
+        return True, None
+
+    except Exception as exception_error:
+        return False, f"Ignoring unreadable LIFX discovery cache '{cache_path}': {exception_error}"
+
+
+def lifx_device_from_discovery_cache(lifx_mac_address, lifx_value):
+    # A Light for a cached discovery record, with its attributes filled in from the record rather than from the lamp
+    lifx_device = Light(lifx_mac_address, lifx_value[K_IP_ADDRESS], port=lifx_value[K_PORT])
+    lifx_device.label = lifx_value[K_LABEL]
+    lifx_device.group = lifx_value[K_GROUP]
+    lifx_device.location = lifx_value[K_LOCATION]
+    lifx_device.power_level = lifx_value[K_POWER_LEVEL]
+    lifx_device.host_firmware_build_timestamp = lifx_value[K_HOST_FIRMWARE_BUILD_TIMESTAMP]
+    lifx_device.host_firmware_version = lifx_value[K_HOST_FIRMWARE_VERSION]
+    lifx_device.wifi_firmware_build_timestamp = lifx_value[K_WIFI_FIRMWARE_BUILD_TIMESTAMP]
+    lifx_device.wifi_firmware_version = lifx_value[K_WIFI_FIRMWARE_VERSION]
+    lifx_device.vendor = lifx_value[K_VENDOR]
+    lifx_device.product = lifx_value[K_PRODUCT]
+    lifx_device.version = lifx_value[K_VERSION]
+    lifx_device.product_name = lifx_value[K_PRODUCT_NAME]
+    lifx_device.product_features = lifx_value[K_PRODUCT_FEATURES]
+    return lifx_device
+
+
+def lifx_light(lifx_mac_address, lifx_ip_address, globals_discovery):
+    # A Light for a lamp, with its vendor, product and version taken from its discovery record if it has one, so that
+    # its capability checks (and its refresh) needn't ask the lamp for them
+    lifx_device = Light(lifx_mac_address, lifx_ip_address)
+    lifx_value = globals_discovery.get(lifx_mac_address)
+    if lifx_value is not None and lifx_value[K_PRODUCT] is not None:
+        lifx_device.vendor, lifx_device.product, lifx_device.version = lifx_value[K_VENDOR], lifx_value[K_PRODUCT], lifx_value[K_VERSION]
+    return lifx_device
+
+
+def diff_discovered_lifx_devices(globals_discovery, responses):
+    # Compares the StateService replies to a GetService broadcast with the discovery records. Returns the
+    # DISCOVERY_EVENT_VANISHED events for confirmed lamps that didn't reply (their records are kept, but are marked
+    # K_CACHED as no longer confirmed), and the replies from lamps that need refreshing: those that are new, only
+    # known from the discovery cache, or whose IP address or port has changed.
+    discovery_events = []
+    responses_to_refresh = []
+    responding_mac_addresses = set()
+    for response in responses:
+        responding_mac_addresses.add(response.target_addr)
+        lifx_value = globals_discovery.get(response.target_addr)
+        if (lifx_value is None or lifx_value[K_CACHED]
+                or lifx_value[K_IP_ADDRESS] != response.ip_addr or lifx_value[K_PORT] != response.port):
+            responses_to_refresh.append(response)
+
+    for lifx_mac_address, lifx_value in globals_discovery.items():
+        if lifx_mac_address not in responding_mac_addresses and not lifx_value[K_CACHED]:
+            lifx_value[K_CACHED] = True
+            discovery_events.append((DISCOVERY_EVENT_VANISHED, lifx_mac_address))
+
+    return discovery_events, responses_to_refresh
+
+
+def store_discovered_lifx_device(globals_discovery, lifx_device, cached=False):
 
     lifx_mac_address = None
     try:
@@ -78,7 +200,8 @@ def store_discovered_lifx_device(globals_discovery, lifx_device):
             globals_discovery[lifx_mac_address][K_VERSION] = lifx_version
             globals_discovery[lifx_mac_address][K_PRODUCT_NAME] = lifx_product_name
             globals_discovery[lifx_mac_address][K_PRODUCT_FEATURES] = lifx_product_features
-            globals_discovery[lifx_mac_address][K_CHANGED_INFO] = False
+
+        globals_discovery[lifx_mac_address][K_CHANGED_INFO] = False  # Set below if anything has changed since the last store
 
         if globals_discovery[lifx_mac_address][K_LABEL] != lifx_label:
             globals_discovery[lifx_mac_address][K_LABEL] = lifx_label
@@ -132,6 +255,8 @@ def store_discovered_lifx_device(globals_discovery, lifx_device):
         if K_INDIGO_DEVICE_ID not in globals_discovery[lifx_mac_address]:
             globals_discovery[lifx_mac_address][K_INDIGO_DEVICE_ID] = 0  # Default to no Indigo device
 
+        globals_discovery[lifx_mac_address][K_CACHED] = cached  # False once the details have come from the lamp itself
+
         return True, None
 
     except Exception as exception_error:
@@ -195,6 +320,8 @@ class ThreadDiscovery(threading.Thread):
 
                     if lifx_command == CMD_DISCOVERY:
                         self.discovery()
+                    elif lifx_command == CMD_DISCOVERY_INCREMENTAL:
+                        self.incremental_discovery()
 
                 except queue.Empty:
                     pass
@@ -207,22 +334,25 @@ class ThreadDiscovery(threading.Thread):
     def discovery(self):
         # Discover LIFX Lamps on demand
         try:
-            self.d_logger.info("LIFX device discovery starting (this can take up to 60 seconds) . . .")
+            self.d_logger.info("LIFX device discovery starting . . .")
 
-            # Search LAN for LIF Lamps
-            lifxlan = LifxLAN(None)
-            lifxlan_devices = lifxlan.get_lights()
+            refresh_broadcast_targets()  # The Mac's network interfaces may have changed since the last full discovery
 
-            number_of_lifx_devices_detected = len(lifxlan_devices)
+            # Search LAN for LIFX Lamps: each lamp is classified and refreshed concurrently with the others and
+            # is stored as soon as it is ready, so a lamp that is slow or gone only delays itself
+            lifxlan = LifxLAN(None)
 
+            number_of_lifx_devices_detected = 0
             max_len_label = 0
             max_len_ip_address = 0
             number_of_lifx_devices_discovered = 0
-            for lifx_device in lifxlan_devices:
-                try:
-                    lifx_device.refresh()
-                except WorkflowException:
-                    self.d_logger.error(f"Refresh Error for LIFX device:\n{lifx_device}\n")
+            # No expected MACs: a full discovery always listens for its whole repeat schedule, so new lamps aren't missed
+            for lifx_device, lifx_error in lifxlan.iter_devices(refresh=True):
+                if lifx_error is None and not isinstance(lifx_device, Light):
+                    continue  # Not a lamp (already logged by lifxlan)
+                number_of_lifx_devices_detected += 1
+                if lifx_error is not None:
+                    self.d_logger.error(f"Refresh Error for LIFX device [MAC {lifx_device.mac_addr}] at IP {lifx_device.ip_addr}: {lifx_error!r}")
                     continue
 
                 #  Now store information about the discovered LIFX device
@@ -257,6 +387,8 @@ class ThreadDiscovery(threading.Thread):
 
             discovery_lines = []
             for lifx_key, lifx_value in self.globals[K_DISCOVERY].items():
+                if lifx_value[K_CACHED]:
+                    continue  # Only known from the discovery cache: not seen by this discovery
                 lifx_mac_address = lifx_key
                 lifx_label = (f"'{lifx_value[K_LABEL]}'").ljust(max_len_label)
                 lifx_ip_address = (f"'{lifx_value[K_IP_ADDRESS]}'.").ljust(max_len_ip_address)
@@ -272,23 +404,16 @@ class ThreadDiscovery(threading.Thread):
             discoveryMessage = f"{discoveryMessage}<---- End of discovered LIFX devices list.\n"
             self.d_logger.info(discoveryMessage)
 
+            return_ok, return_message = save_discovery_cache(self.globals[K_DISCOVERY], self.globals[K_PLUGIN_INFO][K_DISCOVERY_CACHE_PATH])
+            if not return_ok:
+                self.d_logger.warning(return_message)
+
             # At this point we have discovered all the LIFX Lamps that can currently be detected.
 
             # Now check for Indigo LIFX Devices and update the self.globals[K_DISCOVERY] dictionary with the Indigo device Ids
 
             for dev in indigo.devices.iter("self"):
-                if dev.address in self.globals[K_DISCOVERY]:
-                    self.globals[K_DISCOVERY][dev.address][K_INDIGO_DEVICE_ID] = dev.id
-                    connected = True
-                    discovered = True
-                else:
-                    connected = False
-                    discovered = False
-                    # discovery_ui += (f"LIFX Device {index_ui}: '{dev.name}' [{dev.address}] is not yet visible on the network and therefore a further discovery is required.\n")
-                keyValueList = [
-                    {"key": "connected", "value": connected},
-                    {"key": "discovered", "value": discovered}]
-                dev.updateStatesOnServer(keyValueList)
+                self.update_indigo_device(dev)
 
             self.globals[K_INITIAL_DISCOVERY_COMPLETE] = True  # used by plugin startup method
 
@@ -297,55 +422,144 @@ class ThreadDiscovery(threading.Thread):
 
             # Now check if any lamps need to be auto-created as Indigo devices.
 
-            for lifx_key, lifx_value in self.globals[K_DISCOVERY].items():
-                lifx_mac_address = lifx_key
-                lifx_label = lifx_value[K_LABEL]
-                lifx_ip_address = lifx_value[K_IP_ADDRESS]
-                lifx_indigo_device_id = lifx_value[K_INDIGO_DEVICE_ID]
-                lifx_product = lifx_value[K_PRODUCT]
-                lifx_product_name = lifx_value[K_PRODUCT_NAME]
-                lifx_product_features = lifx_value[K_PRODUCT_FEATURES]
-                lifx_product_feature_color = lifx_product_features["color"]
-                lifx_product_feature_temperature = lifx_product_features["temperature"]
-                lifx_product_feature_min_kelvin = lifx_product_features["min_kelvin"]
-                lifx_product_feature_max_kelvin = lifx_product_features["max_kelvin"]
-                lifx_product_feature_chain = lifx_product_features["chain"]
-                lifx_product_feature_multizone = lifx_product_features["multizone"]
-                lifx_product_feature_infrared = lifx_product_features["infrared"]
-                lifx_firmware_ui = lifx_value[K_FIRMWARE_UI]
-
-                if lifx_indigo_device_id == 0:  # Create Indigo LIFX devices
-                    self.d_logger.info(f"Auto creating Indigo device for LIFX device '{lifx_product_name}' - '{lifx_label}'")
-
-                    dev = (indigo.device.create(protocol=indigo.kProtocol.Plugin,
-                                                address=lifx_mac_address,
-                                                name=lifx_label,
-                                                description="LIFX Device",
-                                                pluginId="com.autologplugin.indigoplugin.lifxcontroller",
-                                                deviceTypeId="lifxDevice",
-                                                props={"version": lifx_firmware_ui,
-                                                       "onBrightensToLast": True,
-                                                       "SupportsColor": lifx_product_feature_color,
-                                                       "SupportsRGB": lifx_product_feature_color,
-                                                       "SupportsWhite": lifx_product_feature_temperature,
-                                                       "SupportsTwoWhiteLevels": False,
-                                                       "SupportsWhiteTemperature": lifx_product_feature_temperature,
-                                                       "WhiteTemperatureMin": lifx_product_feature_min_kelvin,
-                                                       "WhiteTemperatureMax": lifx_product_feature_max_kelvin,
-                                                       "chain": lifx_product_feature_chain,
-                                                       "multizone": lifx_product_feature_multizone,
-                                                       "supports_infrared": lifx_product_feature_infrared,
-                                                       "mac_address": lifx_mac_address,
-                                                       "ip_address": lifx_ip_address,
-                                                       "lifx_label": lifx_label,
-                                                       "set_name_from_lifx_label": True,
-                                                       "lifx_device_list": lifx_mac_address},
-                                                folder=self.globals[K_FOLDERS][K_DEVICES_ID]))
-
-                    dev.model = f"{lifx_product_name} [{lifx_product}]"
-                    dev.replaceOnServer()
-
-                    self.globals[K_DISCOVERY][lifx_mac_address][K_INDIGO_DEVICE_ID] = dev.id
+            for lifx_mac_address, lifx_value in list(self.globals[K_DISCOVERY].items()):
+                if lifx_value[K_CACHED]:
+                    continue  # Only known from the discovery cache: not seen by this discovery
+                if lifx_value[K_INDIGO_DEVICE_ID] == 0:
+                    self.create_indigo_device(lifx_mac_address, lifx_value)
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def incremental_discovery(self):
+        # Discover only what has changed since the last discovery: one GetService broadcast finds the lamps that are
+        # new, gone or at a new address, only those are refreshed, and only their Indigo devices are updated.
+        # Falls back to a full discovery until one has completed.
+        try:
+            if not self.globals[K_INITIAL_DISCOVERY_COMPLETE]:
+                self.discovery()
+                return
+
+            lifxlan = LifxLAN(None)
+            # Once the known lamps have answered, one more repeat gives new lamps a chance to answer too
+            responses = lifxlan.broadcast_with_resp(GetService, StateService, expected_macs=self.expected_mac_addresses(), extra_repeats=1)
+            discovery_events, responses_to_refresh = diff_discovered_lifx_devices(self.globals[K_DISCOVERY], responses)
+
+            for lifx_device, lifx_error in lifxlan.iter_devices(refresh=True, responses=responses_to_refresh):
+                if lifx_error is None and not isinstance(lifx_device, Light):
+                    continue  # Not a lamp (already logged by lifxlan)
+                if lifx_error is not None:
+                    self.d_logger.error(f"Refresh Error for LIFX device [MAC {lifx_device.mac_addr}] at IP {lifx_device.ip_addr}: {lifx_error!r}")
+                    continue
+
+                previously_confirmed = lifx_device.mac_addr in self.globals[K_DISCOVERY] and not self.globals[K_DISCOVERY][lifx_device.mac_addr][K_CACHED]
+                return_ok, return_message = store_discovered_lifx_device(self.globals[K_DISCOVERY], lifx_device)
+                if not return_ok:
+                    self.d_logger.error(return_message)
+                    continue
+                if not previously_confirmed:
+                    discovery_events.append((DISCOVERY_EVENT_FOUND, lifx_device.mac_addr))
+                elif self.globals[K_DISCOVERY][lifx_device.mac_addr][K_CHANGED_INFO]:
+                    discovery_events.append((DISCOVERY_EVENT_CHANGED, lifx_device.mac_addr))
+
+            if not discovery_events:
+                self.d_logger.debug(f"LIFX incremental discovery: no changes to the {len(responses)} LIFX device(s) that responded")
+                return
+
+            discovery_message = f"LIFX incremental discovery: {len(discovery_events)} change(s)"
+            for discovery_event, lifx_mac_address in discovery_events:
+                lifx_value = self.globals[K_DISCOVERY][lifx_mac_address]
+                event_ui = {DISCOVERY_EVENT_FOUND: "found", DISCOVERY_EVENT_CHANGED: "changed", DISCOVERY_EVENT_VANISHED: "not responding"}[discovery_event]
+                discovery_message += f"\n  '{lifx_value[K_LABEL]}' [MAC {lifx_mac_address}] at IP {lifx_value[K_IP_ADDRESS]}: {event_ui}"
+
+                if lifx_value[K_INDIGO_DEVICE_ID] != 0 and lifx_value[K_INDIGO_DEVICE_ID] in indigo.devices:
+                    self.update_indigo_device(indigo.devices[lifx_value[K_INDIGO_DEVICE_ID]])
+                elif discovery_event == DISCOVERY_EVENT_FOUND and self.globals[K_PLUGIN_CONFIG_DEFAULT][K_AUTO_CREATE_LIFX_DEVICES]:
+                    self.create_indigo_device(lifx_mac_address, lifx_value)
+            self.d_logger.info(discovery_message)
+
+            return_ok, return_message = save_discovery_cache(self.globals[K_DISCOVERY], self.globals[K_PLUGIN_INFO][K_DISCOVERY_CACHE_PATH])
+            if not return_ok:
+                self.d_logger.warning(return_message)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+    def expected_mac_addresses(self):
+        # The lamps an incremental discovery's broadcast should hear from: those already discovered (or known from the
+        # discovery cache) and those with an Indigo device. The broadcast stops listening once all of them have answered.
+        expected_mac_addresses = set(self.globals[K_DISCOVERY])
+        for dev in indigo.devices.iter("self"):
+            if dev.address:
+                expected_mac_addresses.add(dev.address)
+        return expected_mac_addresses
+
+    def update_indigo_device(self, dev):
+        # Brings an Indigo LIFX device's connected and discovered states into line with its discovery record
+        if dev.address in self.globals[K_DISCOVERY]:
+            self.globals[K_DISCOVERY][dev.address][K_INDIGO_DEVICE_ID] = dev.id
+        if dev.address in self.globals[K_DISCOVERY] and not self.globals[K_DISCOVERY][dev.address][K_CACHED]:
+            connected = True
+            discovered = True
+            if dev.enabled and dev.pluginProps.get("ip_address", "") != self.globals[K_DISCOVERY][dev.address][K_IP_ADDRESS]:
+                # Started at an IP address that is no longer current: restart it at its new address
+                self.d_logger.info(f"Restarting '{dev.name}' at its new IP address {self.globals[K_DISCOVERY][dev.address][K_IP_ADDRESS]}")
+                indigo.device.enable(dev.id, value=False)
+                indigo.device.enable(dev.id, value=True)
+                return
+        else:
+            connected = False
+            discovered = False
+            # discovery_ui += (f"LIFX Device {index_ui}: '{dev.name}' [{dev.address}] is not yet visible on the network and therefore a further discovery is required.\n")
+        keyValueList = [
+            {"key": "connected", "value": connected},
+            {"key": "discovered", "value": discovered}]
+        dev.updateStatesOnServer(keyValueList)
+
+    def create_indigo_device(self, lifx_mac_address, lifx_value):
+        # Auto creates an Indigo LIFX device for a discovered LIFX lamp
+        lifx_label = lifx_value[K_LABEL]
+        lifx_ip_address = lifx_value[K_IP_ADDRESS]
+        lifx_product = lifx_value[K_PRODUCT]
+        lifx_product_name = lifx_value[K_PRODUCT_NAME]
+        lifx_product_features = lifx_value[K_PRODUCT_FEATURES]
+        lifx_product_feature_color = lifx_product_features["color"]
+        lifx_product_feature_temperature = lifx_product_features["temperature"]
+        lifx_product_feature_min_kelvin = lifx_product_features["min_kelvin"]
+        lifx_product_feature_max_kelvin = lifx_product_features["max_kelvin"]
+        lifx_product_feature_chain = lifx_product_features["chain"]
+        lifx_product_feature_multizone = lifx_product_features["multizone"]
+        lifx_product_feature_infrared = lifx_product_features["infrared"]
+        lifx_firmware_ui = lifx_value[K_FIRMWARE_UI]
+
+        self.d_logger.info(f"Auto creating Indigo device for LIFX device '{lifx_product_name}' - '{lifx_label}'")
+
+        dev = (indigo.device.create(protocol=indigo.kProtocol.Plugin,
+                                    address=lifx_mac_address,
+                                    name=lifx_label,
+                                    description="LIFX Device",
+                                    pluginId="com.autologplugin.indigoplugin.lifxcontroller",
+                                    deviceTypeId="lifxDevice",
+                                    props={"version": lifx_firmware_ui,
+                                           "onBrightensToLast": True,
+                                           "SupportsColor": lifx_product_feature_color,
+                                           "SupportsRGB": lifx_product_feature_color,
+                                           "SupportsWhite": lifx_product_feature_temperature,
+                                           "SupportsTwoWhiteLevels": False,
+                                           "SupportsWhiteTemperature": lifx_product_feature_temperature,
+                                           "WhiteTemperatureMin": lifx_product_feature_min_kelvin,
+                                           "WhiteTemperatureMax": lifx_product_feature_max_kelvin,
+                                           "chain": lifx_product_feature_chain,
+                                           "multizone": lifx_product_feature_multizone,
+                                           "supports_infrared": lifx_product_feature_infrared,
+                                           "mac_address": lifx_mac_address,
+                                           "ip_address": lifx_ip_address,
+                                           "lifx_label": lifx_label,
+                                           "set_name_from_lifx_label": True,
+                                           "lifx_device_list": lifx_mac_address},
+                                    folder=self.globals[K_FOLDERS][K_DEVICES_ID]))
+
+        dev.model = f"{lifx_product_name} [{lifx_product}]"
+        dev.replaceOnServer()
+
+        self.globals[K_DISCOVERY][lifx_mac_address][K_INDIGO_DEVICE_ID] = dev.id
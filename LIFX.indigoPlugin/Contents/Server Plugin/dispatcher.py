@@ -0,0 +1,141 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# LIFX V7 Controller © Autolog 2020-2022
+
+# noinspection PyUnresolvedReferences
+# ============================== Native Imports ===============================
+import heapq
+import itertools
+import logging
+import sys
+import threading
+import traceback
+
+# ============================== Plugin Imports ===============================
+from constants import *
+
+
+class CommandDispatcher(object):
+
+    # This class runs queued lifxlanHandler commands on a bounded pool of worker threads.
+    #
+    # Commands are sharded by Indigo device id: each device has its own lane of pending commands and
+    #   at most one worker processes a device at any one time, so a device's commands run one after another
+    #   in priority order (and in the order they were queued within a priority).
+    # Idle workers always take the device whose next command has the highest priority (lowest value),
+    #   so e.g. QUEUE_PRIORITY_COMMAND_HIGH commands keep precedence over status traffic across all devices.
+    # An unresponsive device therefore only holds up its own commands and one worker.
+    #
+    # A command listed in CMD_COALESCE_CLASS supersedes any commands of the same class still waiting for its device
+    #   (e.g. only the latest of a run of slider-drag CMD_BRIGHTNESS is sent, repeated CMD_STATUS collapse into one).
+
+    def __init__(self, process_command, worker_count):
+
+        self.process_command = process_command  # Called with each queued entry: [priority, command, dev_id, arguments]
+
+        self.d_logger = logging.getLogger("Plugin.DISPATCHER")
+
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()  # Tie-breaker to keep queued order within a priority
+        self.lanes = dict()  # dev_id -> heap of (priority, sequence, entry)
+        self.busy = set()  # dev_ids currently being processed by a worker
+        self.ready = list()  # heap of (priority, sequence, dev_id) for idle devices with pending commands
+        self.stopping = False
+
+        self.dispatched_count = 0
+        self.coalesced_counts = dict()  # command -> number of queued commands of that type superseded before being processed
+
+        self.workers = list()
+        for worker_number in range(worker_count):
+            worker = threading.Thread(target=self.worker, name=f"lifxlanHandler-worker-{worker_number + 1}")
+            worker.daemon = True
+            self.workers.append(worker)
+
+    def exception_handler(self, exception_error_message, log_failing_statement):
+        filename, line_number, method, statement = traceback.extract_tb(sys.exc_info()[2])[-1]
+        module = filename.split('/')
+        log_message = f"'{exception_error_message}' in module '{module[-1]}', method '{method}'"
+        if log_failing_statement:
+            log_message = log_message + f"\n   Failing statement [line {line_number}]: '{statement}'"
+        else:
+            log_message = log_message + f" at line {line_number}"
+        self.d_logger.error(log_message)
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self, timeout=5.0):
+        # Pending commands are discarded; commands already being processed are allowed to finish
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.join(timeout)
+
+    def dispatch(self, entry):
+        priority, command, dev_id = entry[0], entry[1], entry[2]
+        coalesce_class = CMD_COALESCE_CLASS.get(command)
+        with self.condition:
+            self.dispatched_count += 1
+            lane = self.lanes.setdefault(dev_id, list())
+            if coalesce_class is not None:
+                superseded = [item for item in lane if CMD_COALESCE_CLASS.get(item[2][1]) == coalesce_class]
+                if superseded:
+                    # The newer command runs in place of the superseded ones, so it inherits the best of their priorities
+                    priority = min([priority] + [item[0] for item in superseded])
+                    lane[:] = [item for item in lane if CMD_COALESCE_CLASS.get(item[2][1]) != coalesce_class]
+                    heapq.heapify(lane)
+                    for item in superseded:
+                        self.coalesced_counts[item[2][1]] = self.coalesced_counts.get(item[2][1], 0) + 1
+                    self.d_logger.debug(f"Coalesced {len(superseded)} queued command(s) into '{CMD_TRANSLATION[command]}' for device id {dev_id}")
+            heapq.heappush(lane, (priority, next(self.sequence), entry))
+            if dev_id not in self.busy:
+                self.schedule(dev_id)
+
+    def statistics(self):
+        # Returns the number of commands dispatched and a dict of command -> number of those commands superseded
+        with self.condition:
+            return self.dispatched_count, dict(self.coalesced_counts)
+
+    def schedule(self, dev_id):
+        # Must be called holding self.condition, for a device that isn't busy and has pending commands.
+        # A device may end up in self.ready more than once (e.g. when a higher priority command arrives for it);
+        #   entries that no longer match the head of its lane are skipped by next_device().
+        priority, sequence, _ = self.lanes[dev_id][0]
+        heapq.heappush(self.ready, (priority, sequence, dev_id))
+        self.condition.notify()
+
+    def next_device(self):
+        # Must be called holding self.condition. Returns the dev_id to process next or None if there isn't one.
+        while self.ready:
+            priority, sequence, dev_id = heapq.heappop(self.ready)
+            lane = self.lanes.get(dev_id)
+            if dev_id not in self.busy and lane and lane[0][1] == sequence:
+                return dev_id
+        return None
+
+    def worker(self):
+        while True:
+            with self.condition:
+                dev_id = self.next_device()
+                while dev_id is None and not self.stopping:
+                    self.condition.wait()
+                    dev_id = self.next_device()
+                if self.stopping:
+                    return
+                _, _, entry = heapq.heappop(self.lanes[dev_id])
+                self.busy.add(dev_id)
+
+            try:
+                self.process_command(entry)
+            except Exception as exception_error:
+                self.exception_handler(exception_error, True)  # Log error and display failing statement
+
+            with self.condition:
+                self.busy.discard(dev_id)
+                if self.lanes[dev_id]:
+                    self.schedule(dev_id)
+                else:
+                    del self.lanes[dev_id]
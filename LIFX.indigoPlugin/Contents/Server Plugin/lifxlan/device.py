@@ -19,27 +19,33 @@
 # per device, and also to capture in real time when a service is down (port = 0).
 
 from datetime import datetime
-from socket import AF_INET, SOCK_DGRAM, SOL_SOCKET, SO_BROADCAST, SO_REUSEADDR, socket, timeout, gethostbyname_ex, gethostname
-from time import sleep, time
-import platform
+from time import time
+import asyncio
 #import netifaces as ni
-import ifaddr
 import struct
+import threading
 
 from .errors import WorkflowException
 from .msgtypes import Acknowledgement, GetGroup, GetHostFirmware, GetInfo, GetLabel, GetLocation, GetPower, GetVersion, \
     GetWifiFirmware, GetWifiInfo, SERVICE_IDS, SetLabel, SetPower, StateGroup, StateHostFirmware, StateInfo, StateLabel, \
     StateLocation, StatePower, StateVersion, StateWifiFirmware, StateWifiInfo, str_map
 from .message import BROADCAST_MAC
-from .products import features_map, product_map, light_products, switch_products
+from .pack import frame_cache
+from .products import CAPABILITY_CHAIN, CAPABILITY_COLOR, CAPABILITY_INFRARED, CAPABILITY_LIGHT, CAPABILITY_MULTIZONE, \
+    CAPABILITY_SWITCH, CAPABILITY_TEMPERATURE, capabilities_map, features_map, product_map
+from .transport import get_transport
 from .unpack import unpack_lifx_message
 
 DEFAULT_TIMEOUT = 1 #second
 DEFAULT_ATTEMPTS = 1
 
+# How long a device's version and firmware, which only change with a firmware update, are trusted before refresh() asks again
+STATIC_ATTRIBUTES_TTL = 24 * 60 * 60 #seconds
+
 VERBOSE = False
 
 def get_broadcast_addrs():
+    import ifaddr  # only needed here, and slow to import (it loads ctypes)
     broadcast_addrs = []
     for iface in ifaddr.get_adapters():
         for addr in iface.ips:
@@ -69,9 +75,150 @@ def get_broadcast_addrs():
 
     return broadcast_addrs
 
-UDP_BROADCAST_IP_ADDRS = get_broadcast_addrs()
 UDP_BROADCAST_PORT = 56700
 
+# The (ip_addr, port) pairs that broadcasts, and requests to devices whose IP address isn't known, are sent to.
+# Enumerating the network adapters is left until the targets are first used, rather than done on import, and
+# refresh() has them enumerated again (e.g. when the interfaces may have changed). A list, so existing code
+# can keep iterating over it, that set_broadcast_targets() changes in place.
+class BroadcastTargets(list):
+    def __init__(self):
+        super(BroadcastTargets, self).__init__()
+        self.lock = threading.Lock()
+        self.resolved = False
+        self.explicit = False  # set by set_broadcast_targets(targets): not replaced by refresh()
+
+    def resolve(self):
+        if not self.resolved:
+            with self.lock:
+                if not self.resolved:
+                    list.__setitem__(self, slice(None), [(ip_addr, UDP_BROADCAST_PORT) for ip_addr in get_broadcast_addrs()])
+                    self.resolved = True
+
+    def set(self, targets):
+        with self.lock:
+            list.__setitem__(self, slice(None), targets)
+            self.resolved = True
+            self.explicit = True
+
+    # The adapters are enumerated again on next use, unless the targets were set explicitly
+    def refresh(self):
+        with self.lock:
+            if not self.explicit:
+                self.resolved = False
+
+    def reset(self):
+        with self.lock:
+            self.resolved = False
+            self.explicit = False
+
+    def __iter__(self):
+        self.resolve()
+        return list.__iter__(self)
+
+    def __len__(self):
+        self.resolve()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self.resolve()
+        return list.__getitem__(self, index)
+
+    def __setitem__(self, index, value):
+        self.resolve()
+        with self.lock:
+            list.__setitem__(self, index, value)
+            self.explicit = True
+
+    def __contains__(self, target):
+        self.resolve()
+        return list.__contains__(self, target)
+
+    def __repr__(self):
+        self.resolve()
+        return list.__repr__(self)
+
+UDP_BROADCAST_TARGETS = BroadcastTargets()
+
+# targets: e.g. [emulator.address] to point lifxlan at a lifxlan.emulator.Emulator, or None to go back to the
+# broadcast addresses of the network adapters
+def set_broadcast_targets(targets=None):
+    if targets is None:
+        UDP_BROADCAST_TARGETS.reset()
+    else:
+        UDP_BROADCAST_TARGETS.set(targets)
+
+# Has the network adapters enumerated again before the next broadcast, unless targets were set explicitly
+def refresh_broadcast_targets():
+    UDP_BROADCAST_TARGETS.refresh()
+
+# UDP_BROADCAST_IP_ADDRS, the IP addresses of UDP_BROADCAST_TARGETS: the adapters are enumerated when it is first
+# used, and again only after refresh_broadcast_targets()
+def __getattr__(name):
+    if name == "UDP_BROADCAST_IP_ADDRS":
+        return [ip_addr for ip_addr, port in UDP_BROADCAST_TARGETS]
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+# Version and firmware attributes last read from each device, by MAC address. Shared by every Device object, so a
+# device found again by discovery, or rebuilt after losing contact, doesn't have to be asked for them again.
+class StaticAttributeCache(object):
+    def __init__(self, ttl=STATIC_ATTRIBUTES_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}  # mac_addr -> (time cached, {attribute: value})
+        self.versions = {}  # mac_addr -> (vendor, product, version), kept when the entry expires or when only these are known
+        self.hits = 0
+        self.misses = 0
+
+    # Returns the attributes cached for mac_addr, or None if there are none or they are older than the TTL
+    def get(self, mac_addr):
+        with self.lock:
+            entry = self.entries.get(mac_addr)
+            if entry is not None and time() - entry[0] < self.ttl:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    # Returns the (vendor, product, version) cached for mac_addr however old they are, as a device's product never
+    # changes, or None if there are none. Not counted as a hit or miss.
+    def get_version_tuple(self, mac_addr):
+        with self.lock:
+            return self.versions.get(mac_addr)
+
+    # cached_at: when the attributes were read, if not just now (e.g. when they come from a file)
+    def put(self, mac_addr, attributes, cached_at=None):
+        with self.lock:
+            self.entries[mac_addr] = (time() if cached_at is None else cached_at, attributes)
+            self.versions[mac_addr] = attributes["vendor"], attributes["product"], attributes["version"]
+
+    # Caches just the (vendor, product, version), e.g. as read by discovery to classify a device
+    def put_version(self, mac_addr, vendor, product, version):
+        with self.lock:
+            self.versions[mac_addr] = vendor, product, version
+
+    # e.g. when a device may have had its firmware updated
+    def invalidate(self, mac_addr):
+        with self.lock:
+            self.entries.pop(mac_addr, None)
+
+    # Returns (hits, misses, number of devices cached)
+    def statistics(self):
+        with self.lock:
+            return self.hits, self.misses, len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+
+
+# The process-wide cache used by Device.refresh()
+static_attributes = StaticAttributeCache()
+
+STATIC_ATTRIBUTES = ("host_firmware_build_timestamp", "host_firmware_version", "wifi_firmware_build_timestamp", "wifi_firmware_version",
+                     "vendor", "product", "version")
+
 class Device(object):
     # mac_addr is a string, with the ":" and everything.
     # service is an integer that maps to a service type. See SERVICE_IDS in msgtypes.py
@@ -115,10 +262,9 @@ class Device(object):
         # uptime
         # downtime
 
-        # The following attributes are used for handling multithreading requests
-
-        self.socket_counter = 0
-        self.socket_table = {}
+        # Requests are sent through the process-wide transport (see transport.py), which
+        # matches responses to requests by MAC + sequence number, so several threads can
+        # talk to the same device at once.
 
 
     ############################################################################
@@ -128,17 +274,45 @@ class Device(object):
     ############################################################################
 
     # update the device's (relatively) persistent attributes
-    def refresh(self):
-        self.label = self.get_label()
-        self.location = self.get_location()
-        self.group = self.get_group()
-        self.power_level = self.get_power()
-        self.host_firmware_build_timestamp, self.host_firmware_version = self.get_host_firmware_tuple()
-        self.wifi_firmware_build_timestamp, self.wifi_firmware_version = self.get_wifi_firmware_tuple()
-        self.vendor, self.product, self.version = self.get_version_tuple()
+    # The attributes come in three tiers, all requested concurrently:
+    #   static  - version and firmware: taken from static_attributes unless they aren't cached, are older than
+    #             STATIC_ATTRIBUTES_TTL, or refresh_cache is True (e.g. the device may have been updated). The
+    #             version is only requested if it has never been cached, as a device's product never changes.
+    #   slow    - label, location and group: always requested
+    #   dynamic - power (and colour, for a Light): always requested
+    def refresh(self, refresh_cache=False):
+        self.run_sync(self.refresh_async(refresh_cache))
+
+    async def refresh_async(self, refresh_cache=False):
+        static = None if refresh_cache else static_attributes.get(self.mac_addr)
+        if static is None:
+            await asyncio.gather(self.refresh_static_async(), self.refresh_slow_async(), self.refresh_dynamic_async())
+        else:
+            for attribute in STATIC_ATTRIBUTES:
+                setattr(self, attribute, static[attribute])
+            await asyncio.gather(self.refresh_slow_async(), self.refresh_dynamic_async())
         self.product_name = self.get_product_name()
         self.product_features = self.get_product_features()
 
+    async def refresh_static_async(self):
+        self.load_cached_version()
+        if self.product == None:
+            host_firmware, wifi_firmware, version = await asyncio.gather(self.get_host_firmware_tuple_async(),
+                                                                         self.get_wifi_firmware_tuple_async(),
+                                                                         self.get_version_tuple_async())
+            self.vendor, self.product, self.version = version
+        else:
+            host_firmware, wifi_firmware = await asyncio.gather(self.get_host_firmware_tuple_async(), self.get_wifi_firmware_tuple_async())
+        self.host_firmware_build_timestamp, self.host_firmware_version = host_firmware
+        self.wifi_firmware_build_timestamp, self.wifi_firmware_version = wifi_firmware
+        static_attributes.put(self.mac_addr, {attribute: getattr(self, attribute) for attribute in STATIC_ATTRIBUTES})
+
+    async def refresh_slow_async(self):
+        await asyncio.gather(self.get_label_async(), self.get_location_async(), self.get_group_async())
+
+    async def refresh_dynamic_async(self):
+        await self.get_power_async()
+
     def get_mac_addr(self):
         return self.mac_addr
 
@@ -155,8 +329,11 @@ class Device(object):
         return self.source_id
 
     def get_label(self):
+        return self.run_sync(self.get_label_async())
+
+    async def get_label_async(self):
         try:
-            response = self.req_with_resp(GetLabel, StateLabel)
+            response = await self.req_with_resp_async(GetLabel, StateLabel)
             self.label = response.label.encode('utf-8')
             if type(self.label).__name__ == 'bytes': # Python 3
                 self.label = self.label.decode('utf-8')
@@ -165,8 +342,11 @@ class Device(object):
         return self.label
 
     def get_location(self):
+        return self.run_sync(self.get_location_async())
+
+    async def get_location_async(self):
         try:
-            response = self.req_with_resp(GetLocation, StateLocation)
+            response = await self.req_with_resp_async(GetLocation, StateLocation)
             self.location = response.label.encode('utf-8')
             if type(self.location).__name__ == 'bytes': # Python 3
                 self.location = self.location.decode('utf-8')
@@ -175,8 +355,11 @@ class Device(object):
         return self.location
 
     def get_group(self):
+        return self.run_sync(self.get_group_async())
+
+    async def get_group_async(self):
         try:
-            response = self.req_with_resp(GetGroup, StateGroup)
+            response = await self.req_with_resp_async(GetGroup, StateGroup)
             self.group = response.label.encode('utf-8')
             if type(self.group).__name__ == 'bytes': # Python 3
                 self.group = self.group.decode('utf-8')
@@ -190,30 +373,39 @@ class Device(object):
         self.req_with_ack(SetLabel, {"label": label})
 
     def get_power(self):
+        return self.run_sync(self.get_power_async())
+
+    async def get_power_async(self):
         try:
-            response = self.req_with_resp(GetPower, StatePower)
+            response = await self.req_with_resp_async(GetPower, StatePower)
             self.power_level = response.power_level
         except:
             raise
         return self.power_level
 
     def set_power(self, power, rapid=False):
+        self.run_sync(self.set_power_async(power, rapid))
+
+    async def set_power_async(self, power, rapid=False):
         on = [True, 1, "on"]
         off = [False, 0, "off"]
         if power in on and not rapid:
-            success = self.req_with_ack(SetPower, {"power_level": 65535})
+            success = await self.req_with_ack_async(SetPower, {"power_level": 65535})
         elif power in off and not rapid:
-            success = self.req_with_ack(SetPower, {"power_level": 0})
+            success = await self.req_with_ack_async(SetPower, {"power_level": 0})
         elif power in on and rapid:
-            success = self.fire_and_forget(SetPower, {"power_level": 65535})
+            success = await self.fire_and_forget_async(SetPower, {"power_level": 65535})
         elif power in off and rapid:
-            success = self.fire_and_forget(SetPower, {"power_level": 0})
+            success = await self.fire_and_forget_async(SetPower, {"power_level": 0})
 
     def get_host_firmware_tuple(self):
+        return self.run_sync(self.get_host_firmware_tuple_async())
+
+    async def get_host_firmware_tuple_async(self):
         build = None
         version = None
         try:
-            response = self.req_with_resp(GetHostFirmware, StateHostFirmware)
+            response = await self.req_with_resp_async(GetHostFirmware, StateHostFirmware)
             build = response.build
             version = float(str(str(response.version >> 16) + "." + str(response.version & 0xff)))
         except:
@@ -254,10 +446,13 @@ class Device(object):
         return rx
 
     def get_wifi_firmware_tuple(self):
+        return self.run_sync(self.get_wifi_firmware_tuple_async())
+
+    async def get_wifi_firmware_tuple_async(self):
         build = None
         version = None
         try:
-            response = self.req_with_resp(GetWifiFirmware, StateWifiFirmware)
+            response = await self.req_with_resp_async(GetWifiFirmware, StateWifiFirmware)
             build = response.build
             version = float(str(str(response.version >> 16) + "." + str(response.version & 0xff)))
         except:
@@ -273,11 +468,14 @@ class Device(object):
         return self.wifi_firmware_version
 
     def get_version_tuple(self):
+        return self.run_sync(self.get_version_tuple_async())
+
+    async def get_version_tuple_async(self):
         vendor = None
         product = None
         version = None
         try:
-            response = self.req_with_resp(GetVersion, StateVersion)
+            response = await self.req_with_resp_async(GetVersion, StateVersion)
             vendor = response.vendor
             product = response.product
             version = response.version
@@ -285,8 +483,16 @@ class Device(object):
             raise
         return vendor, product, version
 
+    # Takes the vendor, product and version from static_attributes if they aren't known yet. Never makes a request.
+    def load_cached_version(self):
+        if self.product == None:
+            cached = static_attributes.get_version_tuple(self.mac_addr)
+            if cached != None:
+                self.vendor, self.product, self.version = cached
+
     def get_product_name(self):
         product_name = None
+        self.load_cached_version()
         if self.product == None:
             self.vendor, self.product, self.version = self.get_version_tuple()
         if self.product in product_map:
@@ -295,6 +501,7 @@ class Device(object):
 
     def get_product_features(self):
         product_features = None
+        self.load_cached_version()
         if self.product == None:
             self.vendor, self.product, self.version = self.get_version_tuple()
         if self.product in product_map:
@@ -376,40 +583,37 @@ class Device(object):
         time, uptime, downtime = self.get_info_tuple()
         return downtime
 
+    # The product's entry in products.capabilities_map: its capability bits and kelvin range. The product comes from
+    # this device or from static_attributes and is never requested: until it is known (e.g. by refresh() or
+    # get_version_tuple()), the device has no capabilities.
+    def get_product_capabilities(self):
+        self.load_cached_version()
+        return capabilities_map.get(self.product, capabilities_map[None])
+
+    # capability: one or more of the products.CAPABILITY_* bits, all of which must be supported
+    def has_capability(self, capability):
+        return (self.get_product_capabilities().capabilities & capability) == capability
+
     def is_light(self):
-        if self.product == None:
-            self.vendor, self.product, self.version = self.get_version_tuple()
-        return self.product in light_products
+        return self.has_capability(CAPABILITY_LIGHT)
 
     def is_switch(self):
-        if self.product == None:
-            self.vendor, self.product, self.version = self.get_version_tuple()
-        return self.product in switch_products
+        return self.has_capability(CAPABILITY_SWITCH)
 
     def supports_color(self):
-        if self.product_features == None:
-            self.product_features = self.get_product_features()
-        return self.product_features['color']
+        return self.has_capability(CAPABILITY_COLOR)
 
     def supports_temperature(self):
-        if self.product_features == None:
-            self.product_features = self.get_product_features()
-        return self.product_features['temperature']
+        return self.has_capability(CAPABILITY_TEMPERATURE)
 
     def supports_multizone(self):
-        if self.product_features == None:
-            self.product_features = self.get_product_features()
-        return self.product_features['multizone']
+        return self.has_capability(CAPABILITY_MULTIZONE)
 
     def supports_infrared(self):
-        if self.product_features == None:
-            self.product_features = self.get_product_features()
-        return self.product_features['infrared']
+        return self.has_capability(CAPABILITY_INFRARED)
 
     def supports_chain(self):
-        if self.product_features == None:
-            self.product_features = self.get_product_features()
-        return self.product_features['chain']
+        return self.has_capability(CAPABILITY_CHAIN)
 
     ############################################################################
     #                                                                          #
@@ -481,115 +685,141 @@ class Device(object):
 
     # Don't wait for Acks or Responses, just send the same message repeatedly as fast as possible
     def fire_and_forget(self, msg_type, payload={}, timeout_secs=DEFAULT_TIMEOUT, num_repeats=DEFAULT_ATTEMPTS):
-        socket_id = self.initialize_socket(timeout_secs)
-        sock = self.socket_table[socket_id]
-        msg = msg_type(self.mac_addr, self.source_id, seq_num=0, payload=payload, ack_requested=False, response_requested=False)
+        return self.run_sync(self.fire_and_forget_async(msg_type, payload, timeout_secs, num_repeats))
+
+    async def fire_and_forget_async(self, msg_type, payload={}, timeout_secs=DEFAULT_TIMEOUT, num_repeats=DEFAULT_ATTEMPTS):
+        transport = get_transport()
+        packed_message = frame_cache.pack(msg_type, self.mac_addr, self.source_id, transport.next_seq_num(self.mac_addr), payload, ack_requested=False, response_requested=False)
         sent_msg_count = 0
         sleep_interval = 0.05 if num_repeats > 20 else 0
         while(sent_msg_count < num_repeats):
             if self.ip_addr:
-                sock.sendto(msg.packed_message, (self.ip_addr, self.port))
+                transport.sendto(packed_message, (self.ip_addr, self.port))
             else:
-                for ip_addr in UDP_BROADCAST_IP_ADDRS:
-                    sock.sendto(msg.packed_message, (ip_addr, self.port))
+                for broadcast_addr in UDP_BROADCAST_TARGETS:
+                    transport.sendto(packed_message, broadcast_addr)
             if self.verbose:
-                print("SEND: " + str(msg))
+                print("SEND: " + str(unpack_lifx_message(packed_message)))
             sent_msg_count += 1
-            sleep(sleep_interval)  # Max num of messages device can handle is 20 per second.
-        sleep(0.05)  # fix - let socket.sendto complete sending before closing socket
-        self.close_socket(socket_id)
+            if sleep_interval:
+                await asyncio.sleep(sleep_interval)  # Max num of messages device can handle is 20 per second.
 
     # Usually used for Set messages
     def req_with_ack(self, msg_type, payload, timeout_secs=DEFAULT_TIMEOUT, max_attempts=DEFAULT_ATTEMPTS):
-        self.req_with_resp(msg_type, Acknowledgement, payload, timeout_secs, max_attempts)
+        self.run_sync(self.req_with_ack_async(msg_type, payload, timeout_secs, max_attempts))
+
+    async def req_with_ack_async(self, msg_type, payload, timeout_secs=DEFAULT_TIMEOUT, max_attempts=DEFAULT_ATTEMPTS):
+        await self.req_with_resp_async(msg_type, Acknowledgement, payload, timeout_secs, max_attempts)
 
     # Usually used for Get messages, or for state confirmation after Set (hence the optional payload)
     def req_with_resp(self, msg_type, response_type, payload={}, timeout_secs=DEFAULT_TIMEOUT, max_attempts=DEFAULT_ATTEMPTS):
+        return self.run_sync(self.req_with_resp_async(msg_type, response_type, payload, timeout_secs, max_attempts))
+
+    async def req_with_resp_async(self, msg_type, response_type, payload={}, timeout_secs=DEFAULT_TIMEOUT, max_attempts=DEFAULT_ATTEMPTS):
         # Need to put error checking here for aguments
         if type(response_type) != type([]):
             response_type = [response_type]
         success = False
         device_response = None
-        socket_id = self.initialize_socket(timeout_secs)
-        sock = self.socket_table[socket_id]
-        if len(response_type) == 1 and Acknowledgement in response_type:
-            msg = msg_type(self.mac_addr, self.source_id, seq_num=0, payload=payload, ack_requested=True, response_requested=False)
-        else:
-            msg = msg_type(self.mac_addr, self.source_id, seq_num=0, payload=payload, ack_requested=False, response_requested=True)
-        response_seen = False
-        attempts = 0
-        while not response_seen and attempts < max_attempts:
-            sent = False
-            start_time = time()
-            timedout = False
-            while not response_seen and not timedout:
-                if not sent:
-                    if self.ip_addr:
-                        # AUTOLOG CODE START
-                        try:  # Autolog
-                            sock.sendto(msg.packed_message, (self.ip_addr, self.port))
-                        except Exception as exception_error:  # Autolog
-                            print(f"Autolog - Sock Errore: {exception_error}")  # Autolog
-                        # AUTOLOG CODE END
-                    else:
-                        for ip_addr in UDP_BROADCAST_IP_ADDRS:
-                            sock.sendto(msg.packed_message, (ip_addr, self.port))
-                    sent = True
-                    if self.verbose:
-                        print("SEND: " + str(msg))
-                try:
-                    data, (ip_addr, port) = sock.recvfrom(1024)
-                    response = unpack_lifx_message(data)
+        transport = get_transport()
+        # The transport routes replies carrying this MAC + sequence number (and our source_id) back to us
+        request = transport.register(self.mac_addr, self.source_id, response_type)
+        try:
+            if len(response_type) == 1 and Acknowledgement in response_type:
+                packed_message = frame_cache.pack(msg_type, self.mac_addr, self.source_id, request.seq_num, payload, ack_requested=True, response_requested=False)
+            else:
+                packed_message = frame_cache.pack(msg_type, self.mac_addr, self.source_id, request.seq_num, payload, ack_requested=False, response_requested=True)
+            response_seen = False
+            attempts = 0
+            while not response_seen and attempts < max_attempts:
+                if self.ip_addr:
+                    # AUTOLOG CODE START
+                    try:  # Autolog
+                        transport.sendto(packed_message, (self.ip_addr, self.port))
+                    except Exception as exception_error:  # Autolog
+                        print(f"Autolog - Sock Errore: {exception_error}")  # Autolog
+                    # AUTOLOG CODE END
+                else:
+                    for broadcast_addr in UDP_BROADCAST_TARGETS:
+                        transport.sendto(packed_message, broadcast_addr)
+                if self.verbose:
+                    print("SEND: " + str(unpack_lifx_message(packed_message)))
+                deadline = time() + timeout_secs
+                while not response_seen:
+                    remaining_secs = deadline - time()
+                    if remaining_secs <= 0:
+                        break
+                    response, ip_addr = await request.get_response(remaining_secs)
+                    if response is None:
+                        break
                     if self.verbose:
                         print("RECV: " + str(response))
-                    if type(response) in response_type:
-                        if response.source_id == self.source_id and (response.target_addr == self.mac_addr or response.target_addr == BROADCAST_MAC):
-                            response_seen = True
-                            device_response = response
-                            self.ip_addr = ip_addr
-                            success = True
-                except timeout:
-                    pass
-                elapsed_time = time() - start_time
-                timedout = True if elapsed_time > timeout_secs else False
-            attempts += 1
+                    if response.target_addr == self.mac_addr or response.target_addr == BROADCAST_MAC:
+                        response_seen = True
+                        device_response = response
+                        self.ip_addr = ip_addr
+                        success = True
+                attempts += 1
+        finally:
+            transport.unregister(request)
         if not success:
-            self.close_socket(socket_id)
             # TODO: Modified by @autolog - added '.__name__" to 'response_type' and 'msg_type'
             raise WorkflowException("WorkflowException: Did not receive {} from {} (Name: {}) in response to {}".format(str(response_type), str(self.mac_addr), str(self.label), str(msg_type)))
-        else:
-            self.close_socket(socket_id)
         return device_response
 
+    # Used for Get messages that the device answers with a series of responses (e.g. one MultiZoneStateMultiZone per
+    # 8 zones in reply to a single MultiZoneGetColorZones). Each response is passed to collect(response), which returns
+    # True once it has everything it needs. If the responses stop before then the request is sent again (up to
+    # max_attempts) with the same sequence number, and collect() keeps whatever it already had.
+    def req_with_multi_resp(self, msg_type, response_type, collect, payload={}, timeout_secs=DEFAULT_TIMEOUT, max_attempts=DEFAULT_ATTEMPTS):
+        self.run_sync(self.req_with_multi_resp_async(msg_type, response_type, collect, payload, timeout_secs, max_attempts))
+
+    async def req_with_multi_resp_async(self, msg_type, response_type, collect, payload={}, timeout_secs=DEFAULT_TIMEOUT, max_attempts=DEFAULT_ATTEMPTS):
+        if type(response_type) != type([]):
+            response_type = [response_type]
+        complete = False
+        transport = get_transport()
+        request = transport.register(self.mac_addr, self.source_id, response_type)
+        try:
+            packed_message = frame_cache.pack(msg_type, self.mac_addr, self.source_id, request.seq_num, payload, ack_requested=False, response_requested=True)
+            attempts = 0
+            while not complete and attempts < max_attempts:
+                if self.ip_addr:
+                    transport.sendto(packed_message, (self.ip_addr, self.port))
+                else:
+                    for broadcast_addr in UDP_BROADCAST_TARGETS:
+                        transport.sendto(packed_message, broadcast_addr)
+                if self.verbose:
+                    print("SEND: " + str(unpack_lifx_message(packed_message)))
+                # The deadline restarts with every response, so a long series isn't cut short
+                deadline = time() + timeout_secs
+                while not complete:
+                    remaining_secs = deadline - time()
+                    if remaining_secs <= 0:
+                        break
+                    response, ip_addr = await request.get_response(remaining_secs)
+                    if response is None:
+                        break
+                    if self.verbose:
+                        print("RECV: " + str(response))
+                    if response.target_addr == self.mac_addr or response.target_addr == BROADCAST_MAC:
+                        self.ip_addr = ip_addr
+                        complete = collect(response)
+                        deadline = time() + timeout_secs
+                attempts += 1
+        finally:
+            transport.unregister(request)
+        if not complete:
+            raise WorkflowException("WorkflowException: Did not receive all {} from {} (Name: {}) in response to {}".format(str(response_type), str(self.mac_addr), str(self.label), str(msg_type)))
+
+    # Blocking wrapper used by the sync API: runs an *_async coroutine on the transport's event loop
+    def run_sync(self, coro):
+        return get_transport().run(coro)
+
     # Not currently implemented, although the LIFX LAN protocol supports this kind of workflow natively
     def req_with_ack_resp(self, msg_type, response_type, payload, timeout_secs=DEFAULT_TIMEOUT, max_attempts=DEFAULT_ATTEMPTS):
         pass
 
-    ############################################################################
-    #                                                                          #
-    #                              Socket Methods                              #
-    #                                                                          #
-    ############################################################################
-
-    def initialize_socket(self, timeout):
-        sock = socket(AF_INET, SOCK_DGRAM)
-        sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-        sock.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
-        sock.settimeout(timeout)
-        try:
-            sock.bind(("", 0))  # allow OS to assign next available source port
-            socket_id = self.socket_counter
-            self.socket_table[socket_id] = sock
-            self.socket_counter += 1
-            return socket_id
-        except Exception as err:
-            raise WorkflowException("WorkflowException: error {} while trying to open socket".format(str(err)))
-
-    def close_socket(self, socket_id):
-        sock = self.socket_table.pop(socket_id, None)
-        if sock != None:
-            sock.close()
-
 ################################################################################
 #                                                                              #
 #                             Formatting Functions                             #
@@ -0,0 +1,454 @@
+# coding=utf-8
+# emulator.py
+#
+# Virtual LIFX devices, for exercising lifxlan (and the code built on it) without real bulbs.
+#
+# An Emulator binds one UDP port (on localhost by default) and answers the LAN protocol for every
+# virtual device it holds: a packet addressed to a device's MAC is answered by that device, and a
+# tagged (broadcast) packet is answered by all of them. Replies use the same wire format as real
+# devices, are sent back to whoever asked and can be delayed, dropped and rate limited:
+#
+#   latency      seconds before each reply is sent, plus up to jitter seconds at random
+#   loss         probability (0.0 - 1.0) that a device never sees a given packet
+#   rate_limit   packets per second a device will accept (LIFX recommend no more than 20);
+#                packets over the limit are dropped, as a busy bulb would
+#
+# To point lifxlan at an emulator:
+#
+#   emulator = Emulator([VirtualLight("d0:73:d5:00:00:01"), VirtualMultiZoneLight("d0:73:d5:00:00:02")], latency=0.02)
+#   emulator.start()
+#   set_broadcast_targets([emulator.address])      # broadcasts (e.g. discovery) go to the emulator
+#   lights = LifxLAN().get_lights()                # the devices found report the emulator's address and port
+#   ...
+#   emulator.stop()
+#
+# or run one on its own with "python -m lifxlan.emulator --lights 10 --multizone 2 --tiles 1".
+
+from time import time
+import argparse
+import asyncio
+import random
+import threading
+
+from .message import BROADCAST_MAC
+from .msgtypes import *
+from .products import features_map, supports_extended_multizone
+from .unpack import unpack_lifx_message
+
+DEFAULT_RATE_LIMIT = 20  # packets per second
+
+
+################################################################################
+#                                                                              #
+#                               Virtual Devices                                #
+#                                                                              #
+################################################################################
+
+# Each handler takes the received message and returns a list of (message type, payload) replies.
+# Acknowledgements are added by VirtualDevice.handle(). As with real devices, Get messages are always
+# answered, whereas Set messages are only answered with their State if a response was requested.
+
+class VirtualDevice(object):
+    def __init__(self, mac_addr, label=None, product=27, power_level=0, host_firmware_version=(3, 70),
+                 location_label="Emulator", group_label="Emulator"):
+        self.mac_addr = mac_addr.lower()
+        self.label = label if label is not None else "Virtual {}".format(mac_addr[-5:])
+        self.vendor = 1
+        self.product = product
+        self.version = 0
+        self.power_level = power_level
+        self.host_firmware_build = 1600000000000000000
+        self.host_firmware_version = (host_firmware_version[0] << 16) | host_firmware_version[1]
+        self.wifi_firmware_build = 1500000000000000000
+        self.wifi_firmware_version = (1 << 16) | 0
+        self.location = [random.randrange(256) for _ in range(16)]
+        self.location_label = location_label
+        self.group = [random.randrange(256) for _ in range(16)]
+        self.group_label = group_label
+        self.updated_at = int(time() * 1e9)
+        self.started_at = time()
+        self.port = None  # set by the Emulator, reported in StateService
+
+        self.handlers = {
+            GetService: self.get_service,
+            GetHostInfo: self.get_host_info,
+            GetHostFirmware: self.get_host_firmware,
+            GetWifiInfo: self.get_wifi_info,
+            GetWifiFirmware: self.get_wifi_firmware,
+            GetPower: self.get_power,
+            SetPower: self.set_power,
+            GetLabel: self.get_label,
+            SetLabel: self.set_label,
+            GetVersion: self.get_version,
+            GetInfo: self.get_info,
+            GetLocation: self.get_location,
+            GetGroup: self.get_group,
+            EchoRequest: self.echo_request,
+        }
+
+    def handle(self, msg):
+        replies = [(Acknowledgement, {})] if msg.ack_requested else []
+        handler = self.handlers.get(type(msg))
+        if handler is not None:
+            replies.extend(handler(msg))
+        return replies
+
+    def supports(self, feature):
+        return bool(features_map.get(self.product, {}).get(feature, False))
+
+    def get_service(self, msg):
+        return [(StateService, {"service": 1, "port": self.port})]
+
+    def get_host_info(self, msg):
+        return [(StateHostInfo, {"signal": 1e-5, "tx": 0, "rx": 0, "reserved1": 0})]
+
+    def get_host_firmware(self, msg):
+        return [(StateHostFirmware, {"build": self.host_firmware_build, "reserved1": 0, "version": self.host_firmware_version})]
+
+    def get_wifi_info(self, msg):
+        return [(StateWifiInfo, {"signal": 1e-5, "tx": 0, "rx": 0, "reserved1": 0})]
+
+    def get_wifi_firmware(self, msg):
+        return [(StateWifiFirmware, {"build": self.wifi_firmware_build, "reserved1": 0, "version": self.wifi_firmware_version})]
+
+    def get_power(self, msg):
+        return [(StatePower, {"power_level": self.power_level})]
+
+    def set_power(self, msg):
+        self.power_level = msg.power_level
+        return self.get_power(msg) if msg.response_requested else []
+
+    def get_label(self, msg):
+        return [(StateLabel, {"label": self.label})]
+
+    def set_label(self, msg):
+        self.label = msg.label
+        return self.get_label(msg) if msg.response_requested else []
+
+    def get_version(self, msg):
+        return [(StateVersion, {"vendor": self.vendor, "product": self.product, "version": self.version})]
+
+    def get_info(self, msg):
+        uptime = int((time() - self.started_at) * 1e9)
+        return [(StateInfo, {"time": int(time() * 1e9), "uptime": uptime, "downtime": 0})]
+
+    def get_location(self, msg):
+        return [(StateLocation, {"location": self.location, "label": self.location_label, "updated_at": self.updated_at})]
+
+    def get_group(self, msg):
+        return [(StateGroup, {"group": self.group, "label": self.group_label, "updated_at": self.updated_at})]
+
+    def echo_request(self, msg):
+        return [(EchoResponse, {"byte_array": msg.byte_array})]
+
+
+class VirtualLight(VirtualDevice):
+    def __init__(self, mac_addr, label=None, product=27, power_level=0, color=(0, 0, 65535, 3500), infrared_brightness=0, **kwargs):
+        super(VirtualLight, self).__init__(mac_addr, label, product, power_level, **kwargs)
+        self.color = tuple(color)
+        self.infrared_brightness = infrared_brightness
+
+        self.handlers.update({
+            LightGet: self.light_get,
+            LightSetColor: self.light_set_color,
+            LightSetWaveform: self.light_set_waveform,
+            LightGetPower: self.light_get_power,
+            LightSetPower: self.light_set_power,
+        })
+        if self.supports("infrared"):
+            self.handlers.update({
+                LightGetInfrared: self.light_get_infrared,
+                LightSetInfrared: self.light_set_infrared,
+            })
+
+    def light_get(self, msg):
+        return [(LightState, {"color": self.color, "reserved1": 0, "power_level": self.power_level, "label": self.label, "reserved2": 0})]
+
+    def light_set_color(self, msg):
+        self.color = tuple(msg.color)
+        return self.light_get(msg) if msg.response_requested else []
+
+    def light_set_waveform(self, msg):
+        if not msg.transient:
+            self.color = tuple(msg.color)
+        return self.light_get(msg) if msg.response_requested else []
+
+    def light_get_power(self, msg):
+        return [(LightStatePower, {"power_level": self.power_level})]
+
+    def light_set_power(self, msg):
+        self.power_level = msg.power_level
+        return self.light_get_power(msg) if msg.response_requested else []
+
+    def light_get_infrared(self, msg):
+        return [(LightStateInfrared, {"infrared_brightness": self.infrared_brightness})]
+
+    def light_set_infrared(self, msg):
+        self.infrared_brightness = msg.infrared_brightness
+        return self.light_get_infrared(msg) if msg.response_requested else []
+
+
+class VirtualMultiZoneLight(VirtualLight):
+    def __init__(self, mac_addr, label=None, product=32, zone_count=16, **kwargs):
+        super(VirtualMultiZoneLight, self).__init__(mac_addr, label, product, **kwargs)
+        self.zones = [self.color] * zone_count
+        self.pending_zones = list(self.zones)  # MultiZoneSetColorZones with apply=0 is buffered until the next apply
+
+        self.handlers.update({
+            MultiZoneGetColorZones: self.get_color_zones,
+            MultiZoneSetColorZones: self.set_color_zones,
+        })
+        if supports_extended_multizone(self.product, self.host_firmware_version):
+            self.handlers.update({
+                MultiZoneGetExtendedColorZones: self.get_extended_color_zones,
+                MultiZoneSetExtendedColorZones: self.set_extended_color_zones,
+            })
+
+    def light_get(self, msg):
+        self.color = self.zones[0]
+        return super(VirtualMultiZoneLight, self).light_get(msg)
+
+    def light_set_color(self, msg):
+        self.zones = [tuple(msg.color)] * len(self.zones)
+        self.pending_zones = list(self.zones)
+        return super(VirtualMultiZoneLight, self).light_set_color(msg)
+
+    # Like a real strip: one StateZone if a single zone is asked for, otherwise a StateMultiZone per 8 zones
+    def get_color_zones(self, msg):
+        zone_count = len(self.zones)
+        start_index = min(msg.start_index, zone_count - 1)
+        end_index = min(msg.end_index, zone_count - 1)
+        if start_index == end_index:
+            return [(MultiZoneStateZone, {"count": zone_count, "index": start_index, "color": self.zones[start_index]})]
+        replies = []
+        for index in range(start_index - (start_index % 8), end_index + 1, 8):
+            colors = self.zones[index:index + 8]
+            colors = colors + [(0, 0, 0, 0)] * (8 - len(colors))
+            replies.append((MultiZoneStateMultiZone, {"count": zone_count, "index": index, "color": colors}))
+        return replies
+
+    def set_color_zones(self, msg):
+        for index in range(msg.start_index, min(msg.end_index, len(self.zones) - 1) + 1):
+            self.pending_zones[index] = tuple(msg.color)
+        if msg.apply:  # APPLY or APPLY_ONLY
+            self.zones = list(self.pending_zones)
+        return self.get_color_zones(msg) if msg.response_requested else []
+
+    # A StateExtendedColorZones per 82 zones
+    def get_extended_color_zones(self, msg):
+        replies = []
+        for index in range(0, len(self.zones), EXTENDED_ZONE_COLORS):
+            colors = self.zones[index:index + EXTENDED_ZONE_COLORS]
+            replies.append((MultiZoneStateExtendedColorZones, {"count": len(self.zones), "index": index, "colors_count": len(colors), "colors": colors}))
+        return replies
+
+    def set_extended_color_zones(self, msg):
+        for offset, color in enumerate(msg.colors[:msg.colors_count]):
+            if msg.zone_index + offset < len(self.pending_zones):
+                self.pending_zones[msg.zone_index + offset] = tuple(color)
+        if msg.apply:  # APPLY or APPLY_ONLY
+            self.zones = list(self.pending_zones)
+        return self.get_extended_color_zones(msg) if msg.response_requested else []
+
+
+class VirtualTileChain(VirtualLight):
+    def __init__(self, mac_addr, label=None, product=55, tile_count=5, **kwargs):
+        super(VirtualTileChain, self).__init__(mac_addr, label, product, **kwargs)
+        self.tiles = [{"user_x": float(i), "user_y": 0.0, "width": 8, "height": 8, "colors": [self.color] * 64} for i in range(tile_count)]
+
+        self.handlers.update({
+            GetDeviceChain: self.get_device_chain,
+            SetUserPosition: self.set_user_position,
+            GetTileState64: self.get_tile_state64,
+            SetTileState64: self.set_tile_state64,
+        })
+
+    def light_set_color(self, msg):
+        for tile in self.tiles:
+            tile["colors"] = [tuple(msg.color)] * 64
+        return super(VirtualTileChain, self).light_set_color(msg)
+
+    def get_device_chain(self, msg):
+        tile_devices = []
+        for index in range(16):
+            tile = self.tiles[index] if index < len(self.tiles) else {"user_x": 0.0, "user_y": 0.0, "width": 0, "height": 0}
+            tile_devices.append({"reserved1": 0, "reserved2": 0, "reserved3": 0, "reserved4": 0,
+                                 "user_x": tile["user_x"], "user_y": tile["user_y"], "width": tile["width"], "height": tile["height"],
+                                 "reserved5": 0, "device_version_vendor": self.vendor, "device_version_product": self.product,
+                                 "device_version_version": self.version, "firmware_build": self.host_firmware_build, "reserved6": 0,
+                                 "firmware_version": self.host_firmware_version, "reserved7": 0})
+        return [(StateDeviceChain, {"start_index": 0, "tile_devices": tile_devices, "total_count": len(self.tiles)})]
+
+    def set_user_position(self, msg):
+        if msg.tile_index < len(self.tiles):
+            self.tiles[msg.tile_index]["user_x"] = msg.user_x
+            self.tiles[msg.tile_index]["user_y"] = msg.user_y
+        return []
+
+    # The colors of the rectangle at (x, y) of the given width, row by row, for each tile asked for
+    def get_tile_state64(self, msg):
+        replies = []
+        width = max(msg.width, 1)
+        for tile_index in range(msg.tile_index, min(msg.tile_index + msg.length, len(self.tiles))):
+            tile = self.tiles[tile_index]
+            colors = []
+            for i in range(64):
+                x, y = msg.x + (i % width), msg.y + (i // width)
+                if x < tile["width"] and y < tile["height"]:
+                    colors.append(tile["colors"][(y * tile["width"]) + x])
+                else:
+                    colors.append((0, 0, 0, 0))
+            replies.append((StateTileState64, {"tile_index": tile_index, "reserved": 0, "x": msg.x, "y": msg.y,
+                                               "width": msg.width, "colors": colors}))
+        return replies
+
+    def set_tile_state64(self, msg):
+        width = max(msg.width, 1)
+        for tile_index in range(msg.tile_index, min(msg.tile_index + msg.length, len(self.tiles))):
+            tile = self.tiles[tile_index]
+            for i, color in enumerate(msg.colors):
+                x, y = msg.x + (i % width), msg.y + (i // width)
+                if x < tile["width"] and y < tile["height"]:
+                    tile["colors"][(y * tile["width"]) + x] = tuple(color)
+        return []
+
+
+################################################################################
+#                                                                              #
+#                                   Emulator                                   #
+#                                                                              #
+################################################################################
+
+class EmulatorProtocol(asyncio.DatagramProtocol):
+    def __init__(self, emulator):
+        self.emulator = emulator
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.emulator.receive(data, addr)
+
+
+class Emulator(object):
+    def __init__(self, devices, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, loss=0.0, rate_limit=DEFAULT_RATE_LIMIT):
+        self.devices = {device.mac_addr: device for device in devices}
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rate_limit = rate_limit
+        self.allowance = {}  # mac_addr -> (packets allowed, time last checked), a token bucket per device
+        self.received_count = 0
+        self.dropped_count = 0
+        self.sent_count = 0
+        self.loop = None
+        self.thread = None
+        self.endpoint = None
+
+    # (host, port) the emulator is listening on, e.g. for set_broadcast_targets()
+    @property
+    def address(self):
+        return self.host, self.port
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="lifxlan-emulator")
+        self.thread.daemon = True
+        self.thread.start()
+        self.endpoint, _ = asyncio.run_coroutine_threadsafe(
+            self.loop.create_datagram_endpoint(lambda: EmulatorProtocol(self), local_addr=(self.host, self.port)), self.loop).result()
+        self.port = self.endpoint.get_extra_info("sockname")[1]
+        for device in self.devices.values():
+            device.port = self.port
+        return self
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.endpoint.close)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(1.0)
+            self.loop = self.thread = self.endpoint = None
+
+    # called on the emulator's loop
+    def receive(self, data, addr):
+        try:
+            msg = unpack_lifx_message(data)
+        except Exception:
+            return  # not a LIFX packet
+        self.received_count += 1
+        if msg.tagged or msg.target_addr == BROADCAST_MAC:
+            devices = list(self.devices.values())
+        else:
+            devices = [self.devices[msg.target_addr]] if msg.target_addr in self.devices else []
+        for device in devices:
+            if (self.loss and random.random() < self.loss) or not self.allow(device.mac_addr):
+                self.dropped_count += 1
+                continue
+            replies = [msg_type(device.mac_addr, msg.source_id, msg.seq_num, payload, False, False).packed_message
+                       for msg_type, payload in device.handle(msg)]
+            if replies:
+                delay = self.latency + (random.random() * self.jitter if self.jitter else 0.0)
+                if delay > 0:
+                    self.loop.call_later(delay, self.send, replies, addr)
+                else:
+                    self.send(replies, addr)
+
+    def send(self, replies, addr):
+        for packed_message in replies:
+            self.endpoint.sendto(packed_message, addr)
+            self.sent_count += 1
+
+    def allow(self, mac_addr):
+        if not self.rate_limit:
+            return True
+        now = time()
+        allowance, last_checked = self.allowance.get(mac_addr, (self.rate_limit, now))
+        allowance = min(self.rate_limit, allowance + ((now - last_checked) * self.rate_limit))
+        if allowance < 1:
+            self.allowance[mac_addr] = (allowance, now)
+            return False
+        self.allowance[mac_addr] = (allowance - 1, now)
+        return True
+
+
+# Virtual devices with MACs d0:73:d5:ee:00:01, d0:73:d5:ee:00:02, ...: lights first, then strips, then tile chains
+def make_devices(light_count=0, multizone_count=0, tilechain_count=0):
+    devices = []
+    for index in range(light_count + multizone_count + tilechain_count):
+        mac_addr = "d0:73:d5:ee:{:02x}:{:02x}".format((index + 1) >> 8, (index + 1) & 0xff)
+        if index < light_count:
+            devices.append(VirtualLight(mac_addr))
+        elif index < light_count + multizone_count:
+            devices.append(VirtualMultiZoneLight(mac_addr))
+        else:
+            devices.append(VirtualTileChain(mac_addr))
+    return devices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate LIFX devices on a UDP port.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=56700)
+    parser.add_argument("--lights", type=int, default=10)
+    parser.add_argument("--multizone", type=int, default=0)
+    parser.add_argument("--tiles", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds at random")
+    parser.add_argument("--loss", type=float, default=0.0, help="probability that a packet is dropped")
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_RATE_LIMIT, help="packets per second per device, 0 for none")
+    args = parser.parse_args()
+
+    emulator = Emulator(make_devices(args.lights, args.multizone, args.tiles), args.host, args.port,
+                        args.latency, args.jitter, args.loss, args.rate_limit).start()
+    print("Emulating {} LIFX devices on {}:{} (Ctrl-C to stop)".format(len(emulator.devices), *emulator.address))
+    try:
+        emulator.thread.join()
+    except KeyboardInterrupt:
+        emulator.stop()
+
+
+if __name__ == "__main__":
+    main()
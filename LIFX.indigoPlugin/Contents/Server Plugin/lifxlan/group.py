@@ -1,8 +1,11 @@
 #import thread
 from threading import Thread
 from time import sleep
+import asyncio
 import sys
 
+from .transport import get_transport
+
 class Group(object):
 
     def __init__(self, devices=[], verbose=False):
@@ -30,19 +33,13 @@ class Group(object):
         return self.devices
 
     def set_power(self, power, duration=0, rapid=False):
-        threads = []
-        for d in self.devices:
-            t = Thread(target = self.set_power_helper, args = (d, power, duration, rapid))
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
+        self.run_concurrently([self.set_power_helper(d, power, duration, rapid) for d in self.devices])
 
     def set_power_helper(self, device, power, duration, rapid):
         if device.is_light():
-            device.set_power(power, duration, rapid) # Light::set_power(power, [duration], [rapid])
+            return device.set_power_async(power, duration, rapid) # Light::set_power(power, [duration], [rapid])
         else:
-            device.set_power(power, rapid) # Device::set_power(power, [rapid])
+            return device.set_power_async(power, rapid) # Device::set_power(power, [rapid])
 
     def set_color(self, color, duration=0, rapid=False):
         # pre-calculate which devices you'll operate on
@@ -51,14 +48,8 @@ class Group(object):
         for d in self.devices:
             if d.supports_color:
                 color_supporting_devices.append(d)
-        # multi-threaded color change
-        threads = []
-        for d in color_supporting_devices:
-            t = Thread(target = d.set_color, args = (color, duration, rapid))
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
+        # concurrent color change
+        self.run_concurrently([d.set_color_async(color, duration, rapid) for d in color_supporting_devices])
 
     # Hue, saturation, brightness, and colortemp are a little different than the
     # other functions. You can't just spawn a new thread with "set_saturation"
@@ -79,15 +70,12 @@ class Group(object):
         for d in color_supporting_devices:
             colors.append(d.get_color())
         # "simultaneous" change
-        threads = []
+        coros = []
         for (i, d) in enumerate(color_supporting_devices):
             _, saturation, brightness, kelvin = colors[i]
             color = [hue, saturation, brightness, kelvin]
-            t = Thread(target = d.set_color, args = (color, duration, rapid))
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
+            coros.append(d.set_color_async(color, duration, rapid))
+        self.run_concurrently(coros)
 
     def set_brightness(self, brightness, duration=0, rapid=False):
         # pre-calculate which devices to operate on
@@ -100,15 +88,12 @@ class Group(object):
         for d in color_supporting_devices:
             colors.append(d.get_color())
         # "simultaneous" change
-        threads = []
+        coros = []
         for (i, d) in enumerate(color_supporting_devices):
             hue, saturation, _, kelvin = colors[i]
             color = [hue, saturation, brightness, kelvin]
-            t = Thread(target = d.set_color, args = (color, duration, rapid))
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
+            coros.append(d.set_color_async(color, duration, rapid))
+        self.run_concurrently(coros)
 
     def set_saturation(self, saturation, duration=0, rapid=False):
         # pre-calculate which devices to operate on
@@ -121,15 +106,12 @@ class Group(object):
         for d in color_supporting_devices:
             colors.append(d.get_color())
         # "simultaneous" change
-        threads = []
+        coros = []
         for (i, d) in enumerate(color_supporting_devices):
             hue, _, brightness, kelvin = colors[i]
             color = [hue, saturation, brightness, kelvin]
-            t = Thread(target = d.set_color, args = (color, duration, rapid))
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
+            coros.append(d.set_color_async(color, duration, rapid))
+        self.run_concurrently(coros)
 
     def set_colortemp(self, kelvin, duration=0, rapid=False):
         # pre-calculate which devices to operate on
@@ -142,15 +124,12 @@ class Group(object):
         for d in color_supporting_devices:
             colors.append(d.get_color())
         # "simultaneous" change
-        threads = []
+        coros = []
         for (i, d) in enumerate(color_supporting_devices):
             hue, saturation, brightness, _ = colors[i]
             color = [hue, saturation, brightness, kelvin]
-            t = Thread(target = d.set_color, args = (color, duration, rapid))
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
+            coros.append(d.set_color_async(color, duration, rapid))
+        self.run_concurrently(coros)
 
     def set_infrared(self, infrared_brightness):
         # pre-calculate which devices to operate on
@@ -198,8 +177,18 @@ class Group(object):
         for t in threads:
             t.join()
 
+    # Runs one coroutine per device on the transport's event loop, instead of one thread per device.
+    # As with the threads this replaces, a device that fails doesn't stop the others.
+    def run_concurrently(self, coros):
+        if coros:
+            get_transport().run(gather_ignoring_errors(coros))
+
     def __str__(self):
         s = "Group ({}):\n\n".format(len(self.devices))
         for d in self.devices:
             s += str(d) + "\n"
         return s
+
+
+async def gather_ignoring_errors(coros):
+    return await asyncio.gather(*coros, return_exceptions=True)
@@ -3,18 +3,22 @@
 # Author: Meghan Clark
 
 from random import randint
-from socket import AF_INET, SOCK_DGRAM, SOL_SOCKET, SO_BROADCAST, SO_REUSEADDR, socket, timeout
 from time import sleep, time
+import asyncio
+import queue
 import random
 
-from .device import DEFAULT_ATTEMPTS, DEFAULT_TIMEOUT, Device, UDP_BROADCAST_IP_ADDRS, UDP_BROADCAST_PORT
+from .device import DEFAULT_ATTEMPTS, DEFAULT_TIMEOUT, Device, UDP_BROADCAST_TARGETS, static_attributes
 from .errors import InvalidParameterException, WorkflowException
 from .light import Light
 from .message import BROADCAST_MAC
 from .msgtypes import Acknowledgement, GetService, LightGet, LightGetPower, LightSetColor, LightSetPower, \
     LightSetWaveform, LightState, LightStatePower, StateService
 from .multizonelight import MultiZoneLight
+from .pack import frame_cache
+from .registry import REGISTRY_TTL, DeviceRegistry
 from .tilechain import TileChain
+from .transport import get_transport
 from .unpack import unpack_lifx_message
 from .group import Group
 
@@ -25,15 +29,23 @@ except ImportError:
 
 import logging
 
+DISCOVERY_CONCURRENCY = 16 # devices classified and refreshed at once
+DISCOVERY_DEADLINE = 5 #seconds a device has to be classified (and refreshed) in, before discovery gives up on it
+BROADCAST_REPEAT_INTERVAL = 0.1 #seconds before a broadcast is first repeated for devices that haven't answered yet
+BROADCAST_REPEAT_BACKOFF = 2 #each later repeat waits this many times longer than the one before
+
 
 class LifxLAN:
-    def __init__(self, num_lights=None, verbose=False):
+    # registry_ttl: seconds before the devices found by the last discovery are rediscovered, in the background, by
+    # the next lookup (see registry.py)
+    def __init__(self, num_lights=None, verbose=False, registry_ttl=REGISTRY_TTL):
         self.source_id = random.randrange(2, 1 << 32)
         self.num_devices = num_lights
         self.num_lights = num_lights
         self.devices = None
         self.lights = None
         self.verbose = verbose
+        self.registry = DeviceRegistry(self, registry_ttl)
 
     ############################################################################
     #                                                                          #
@@ -41,126 +53,136 @@ class LifxLAN:
     #                                                                          #
     ############################################################################
 
-    def get_devices(self):
-        self.discover_devices()
+    # The lookups below are answered from the registry of the devices found by the last discovery: only the first
+    # one, or one made with refresh=True, waits for a discovery (see registry.py)
+
+    def get_devices(self, refresh=False):
+        self.devices = self.registry.get_devices(refresh)
         return self.devices
 
-    def get_lights(self):
-        self.discover_devices()
+    def get_lights(self, refresh=False):
+        self.lights = self.registry.get_lights(refresh)
         return self.lights
 
     # more of an internal helper function
     # forces a refresh of the internal list of available devices
     def discover_devices(self):
-
-        self.lights = []
-        self.devices = []
-        responses = self.broadcast_with_resp(GetService, StateService,)
-        for r in responses:
-            device = Device(r.target_addr, r.ip_addr, r.service, r.port, self.source_id, self.verbose)
-            try:
-                if device.is_light():
-                    if device.supports_multizone():
-                        device = MultiZoneLight(r.target_addr, r.ip_addr, r.service, r.port, self.source_id, self.verbose)
-                    elif device.supports_chain():
-                        device = TileChain(r.target_addr, r.ip_addr, r.service, r.port, self.source_id, self.verbose)
-                    else:
-                        device = Light(r.target_addr, r.ip_addr, r.service, r.port, self.source_id, self.verbose)
-                    self.lights.append(device)
-                elif device.is_switch():
-                    vendor, product, version = device.get_version_tuple()
-                    indigo.server.log(
-                        u'LIFXLAN [discover_devices] discovered a LIFX Switch device with product code: \'{}\'. Device\'s MAC is \'{}\' and IP Address is \'{}\'. LIFX switch devices are not supported by the plugin'
-                        .format(product, r.target_addr, r.ip_addr), level=logging.WARNING)
-                else:
-                    vendor, product, version = device.get_version_tuple()
-                    indigo.server.log(
-                        u'LIFXLAN [discover_devices] discovered an unknown LIFX device with product code: \'{}\'. Device\'s MAC is \'{}\' and IP Address is \'{}\'. Plugin is unable to manage this device. Please report this on the support forum.'
-                        .format(product, r.target_addr, r.ip_addr), level=logging.WARNING)
-
-            except WorkflowException:
-                # cheating -- it just so happens that all LIFX devices are lights right now = NOT ANY LONGER!
-                # device = Light(r.target_addr, r.ip_addr, r.service, r.port, self.source_id, self.verbose)
-                # self.lights.append(device)
-                pass
-            self.devices.append(device)
-
-    def get_multizone_lights(self):
-        multizone_lights = []
-        all_lights = self.get_lights()
-        for l in all_lights:
-            if l.supports_multizone():
-                multizone_lights.append(l)
-        return multizone_lights
-
-    def get_infrared_lights(self):
-        infrared_lights = []
-        all_lights = self.get_lights()
-        for l in all_lights:
-            if l.supports_infrared():
-                infrared_lights.append(l)
-        return infrared_lights
-
-    def get_color_lights(self):
-        color_lights = []
-        all_lights = self.get_lights()
-        for l in all_lights:
-            if l.supports_color():
-                color_lights.append(l)
-        return color_lights
-
-    def get_tilechain_lights(self):
-        chain_lights = []
-        all_lights = self.get_lights()
-        for l in all_lights:
-            if l.supports_chain():
-                chain_lights.append(l)
-        return chain_lights
-
-    def get_device_by_name(self, name):
-        device = None
-        all_devices = self.get_devices()
-        for d in all_devices:
-            if d.get_label() == name:
-                device = d
-        if device == None:               # didn't find it?
-            self.discover_devices()      # update list in case it is out of date
-            all_devices = self.get_devices()
-            for d in all_devices:            # and try again
-                if d.get_label() == name:
-                    device = d
+        self.registry.refresh()
+        self.devices = self.registry.get_devices()
+        self.lights = self.registry.get_lights()
+
+    # Discovery as a pipeline: one GetService broadcast, then for every device that answers, concurrently (at most
+    # `concurrency` devices at a time), a GetVersion to tell what kind of device it is and, if refresh is True, a
+    # refresh(). Yields (device, error) in the calling thread as soon as each device is ready: error is None, or the
+    # WorkflowException or asyncio.TimeoutError that stopped the device being classified and refreshed within
+    # deadline_secs (the device is then a plain Device if it couldn't be classified). A device that is slow or gone
+    # only holds up itself.
+    # responses: StateService replies from an earlier GetService broadcast, to work on just those devices instead of broadcasting
+    # expected_macs, extra_repeats: the devices the broadcast is expected to find (e.g. those found last time), and how
+    # long to go on listening once they have all answered, see broadcast_with_resp_async()
+    def iter_devices(self, refresh=False, concurrency=DISCOVERY_CONCURRENCY, deadline_secs=DISCOVERY_DEADLINE, responses=None, expected_macs=None, extra_repeats=0):
+        ready = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self.discover_devices_async(ready.put, refresh, concurrency, deadline_secs, responses, expected_macs, extra_repeats),
+                                                  get_transport().open())
+        future.add_done_callback(lambda future: ready.put(None))
+        try:
+            while True:
+                item = ready.get()
+                if item is None:
+                    break
+                yield item
+            future.result()  # raises whatever stopped the broadcast
+        finally:
+            future.cancel()  # the caller stopped early
+
+    # Calls on_ready((device, error)) from the transport's loop for each device found, see iter_devices()
+    async def discover_devices_async(self, on_ready, refresh=False, concurrency=DISCOVERY_CONCURRENCY, deadline_secs=DISCOVERY_DEADLINE, responses=None, expected_macs=None, extra_repeats=0):
+        if responses is None:
+            responses = await self.broadcast_with_resp_async(GetService, StateService, expected_macs=expected_macs, extra_repeats=extra_repeats)
+        semaphore = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_running_loop()
+
+        async def prepare(r):
+            async with semaphore:
+                deadline = loop.time() + deadline_secs
+                device = Device(r.target_addr, r.ip_addr, r.service, r.port, self.source_id, self.verbose)
+                error = None
+                try:
+                    device = await asyncio.wait_for(self.classify_device_async(device), deadline_secs)
+                    if refresh and isinstance(device, Light):
+                        await asyncio.wait_for(device.refresh_async(), max(0, deadline - loop.time()))
+                except (WorkflowException, asyncio.TimeoutError) as e:
+                    error = e
+            on_ready((device, error))
+
+        await asyncio.gather(*[prepare(r) for r in responses])
+
+    # Returns the device as the Light, MultiZoneLight or TileChain it is, or as the plain Device if it isn't a light.
+    # The version read to classify it is cached in static_attributes and set on the device returned, so neither its
+    # refresh nor its capability checks ask for it again.
+    async def classify_device_async(self, device):
+        device.load_cached_version()
+        if device.product == None:
+            device.vendor, device.product, device.version = await device.get_version_tuple_async()
+            static_attributes.put_version(device.mac_addr, device.vendor, device.product, device.version)
+        if device.is_light():
+            if device.supports_multizone():
+                light = MultiZoneLight(device.mac_addr, device.ip_addr, device.service, device.port, self.source_id, self.verbose)
+            elif device.supports_chain():
+                # TileChain() reads the chain's layout with blocking requests, which can't be made from the transport's loop
+                light = await asyncio.get_running_loop().run_in_executor(None, TileChain, device.mac_addr, device.ip_addr, device.service,
+                                                                         device.port, self.source_id, self.verbose)
+            else:
+                light = Light(device.mac_addr, device.ip_addr, device.service, device.port, self.source_id, self.verbose)
+            light.vendor, light.product, light.version = device.vendor, device.product, device.version
+            return light
+        elif device.is_switch():
+            indigo.server.log(
+                u'LIFXLAN [discover_devices] discovered a LIFX Switch device with product code: \'{}\'. Device\'s MAC is \'{}\' and IP Address is \'{}\'. LIFX switch devices are not supported by the plugin'
+                .format(device.product, device.mac_addr, device.ip_addr), level=logging.WARNING)
+        else:
+            indigo.server.log(
+                u'LIFXLAN [discover_devices] discovered an unknown LIFX device with product code: \'{}\'. Device\'s MAC is \'{}\' and IP Address is \'{}\'. Plugin is unable to manage this device. Please report this on the support forum.'
+                .format(device.product, device.mac_addr, device.ip_addr), level=logging.WARNING)
         return device
 
+    def get_multizone_lights(self, refresh=False):
+        return self.registry.get_lights_by_capability("multizone", refresh)
+
+    def get_infrared_lights(self, refresh=False):
+        return self.registry.get_lights_by_capability("infrared", refresh)
+
+    def get_color_lights(self, refresh=False):
+        return self.registry.get_lights_by_capability("color", refresh)
+
+    def get_tilechain_lights(self, refresh=False):
+        return self.registry.get_lights_by_capability("chain", refresh)
+
+    def get_device_by_mac(self, mac_addr, refresh=False):
+        return self.registry.get_device_by_mac(mac_addr, refresh)
+
+    def get_device_by_name(self, name, refresh=False):
+        devices = self.registry.get_devices_by_label(name, refresh)
+        if len(devices) == 0 and not refresh:               # didn't find it?
+            devices = self.registry.get_devices_by_label(name, True)  # update list in case it is out of date
+        return devices[-1] if len(devices) > 0 else None
+
     # takes in list of strings, returns Group of devices
-    def get_devices_by_name(self, names):
+    def get_devices_by_name(self, names, refresh=False):
+        if refresh:
+            self.registry.refresh()
         devices = []
-        all_devices = self.get_devices()
-        for d in all_devices:
-            if d.get_label() in names:
-                devices.append(d)
-        if len(devices) != len(names):  # didn't find everything?
-            self.discover_devices()     # update list in case it is out of date
-            all_devices = self.get_devices()
-            for d in all_devices:       # and try again
-                if d.get_label() in names:
-                    devices.append(d)
+        for name in names:
+            devices.extend(self.registry.get_devices_by_label(name))
+        if len(devices) < len(names) and not refresh:  # didn't find everything?
+            return self.get_devices_by_name(names, True)  # update list in case it is out of date
         return Group(devices)
 
-    def get_devices_by_group(self, group):
-        devices = []
-        all_devices = self.get_devices()
-        for d in all_devices:
-            if d.get_group() == group:
-                devices.append(d)
-        return Group(devices)
+    def get_devices_by_group(self, group, refresh=False):
+        return Group(self.registry.get_devices_by_group(group, refresh))
 
-    def get_devices_by_location(self, location):
-        devices = []
-        all_devices = self.get_devices()
-        for d in all_devices:
-            if d.get_location() == location:
-                devices.append(d)
-        return Group(devices)
+    def get_devices_by_location(self, location, refresh=False):
+        return Group(self.registry.get_devices_by_location(location, refresh))
 
     # returns dict of Light: power_level pairs
     def get_power_all_lights(self):
@@ -233,57 +255,90 @@ class LifxLAN:
     ############################################################################
 
     def broadcast_fire_and_forget(self, msg_type, payload={}, timeout_secs=DEFAULT_TIMEOUT, num_repeats=DEFAULT_ATTEMPTS):
-        self.initialize_socket(timeout_secs)
-        msg = msg_type(BROADCAST_MAC, self.source_id, seq_num=0, payload=payload, ack_requested=False, response_requested=False)
+        get_transport().run(self.broadcast_fire_and_forget_async(msg_type, payload, timeout_secs, num_repeats))
+
+    async def broadcast_fire_and_forget_async(self, msg_type, payload={}, timeout_secs=DEFAULT_TIMEOUT, num_repeats=DEFAULT_ATTEMPTS):
+        transport = get_transport()
+        packed_message = frame_cache.pack(msg_type, BROADCAST_MAC, self.source_id, transport.next_seq_num(BROADCAST_MAC), payload, ack_requested=False, response_requested=False)
         sent_msg_count = 0
         sleep_interval = 0.05 if num_repeats > 20 else 0
         while(sent_msg_count < num_repeats):
-            for ip_addr in UDP_BROADCAST_IP_ADDRS:
-                self.sock.sendto(msg.packed_message, (ip_addr, UDP_BROADCAST_PORT))
+            for broadcast_addr in UDP_BROADCAST_TARGETS:
+                transport.sendto(packed_message, broadcast_addr)
             if self.verbose:
-                print("SEND: " + str(msg))
+                print("SEND: " + str(unpack_lifx_message(packed_message)))
             sent_msg_count += 1
-            sleep(sleep_interval) # Max num of messages device can handle is 20 per second.
-        self.close_socket()
-
-    def broadcast_with_resp(self, msg_type, response_type, payload={}, timeout_secs=DEFAULT_TIMEOUT, max_attempts=DEFAULT_ATTEMPTS):
-        self.initialize_socket(timeout_secs)
+            await asyncio.sleep(sleep_interval) # Max num of messages device can handle is 20 per second.
+
+    def broadcast_with_resp(self, msg_type, response_type, payload={}, timeout_secs=DEFAULT_TIMEOUT, max_attempts=DEFAULT_ATTEMPTS, expected_macs=None, extra_repeats=0):
+        return get_transport().run(self.broadcast_with_resp_async(msg_type, response_type, payload, timeout_secs, max_attempts, expected_macs, extra_repeats))
+
+    # Collects one response per device for up to timeout_secs per attempt. Within an attempt the broadcast is repeated
+    # after BROADCAST_REPEAT_INTERVAL, then after twice that, and so on, to reach devices that missed it (or whose
+    # reply was lost). Collection stops early once num_devices have answered or, if expected_macs is given, once every
+    # device in it has answered (other devices that answer meanwhile are still collected). With extra_repeats, that
+    # many more repeats are sent once every expected device has answered, and collection only stops when the next
+    # would be due, so that devices that aren't expected (e.g. new ones) have a chance to answer too.
+    async def broadcast_with_resp_async(self, msg_type, response_type, payload={}, timeout_secs=DEFAULT_TIMEOUT, max_attempts=DEFAULT_ATTEMPTS, expected_macs=None, extra_repeats=0):
+        transport = get_transport()
+        loop = asyncio.get_running_loop()
+        # Every reply carrying our sequence number is routed here, whichever device sent it
+        request = transport.register(BROADCAST_MAC, self.source_id, [response_type])
         if response_type == Acknowledgement:
-            msg = msg_type(BROADCAST_MAC, self.source_id, seq_num=0, payload=payload, ack_requested=True, response_requested=False)
+            packed_message = frame_cache.pack(msg_type, BROADCAST_MAC, self.source_id, request.seq_num, payload, ack_requested=True, response_requested=False)
         else:
-            msg = msg_type(BROADCAST_MAC, self.source_id, seq_num=0, payload=payload, ack_requested=False, response_requested=True)
+            packed_message = frame_cache.pack(msg_type, BROADCAST_MAC, self.source_id, request.seq_num, payload, ack_requested=False, response_requested=True)
         responses = []
-        addr_seen = []
-        num_devices_seen = 0
+        addr_seen = set()
+        missing = set(mac_addr.lower() for mac_addr in expected_macs) if expected_macs else None
+        repeats_left = extra_repeats  # repeats still to send once every expected device has answered
+        listened_out = extra_repeats == 0  # ... and whether the last of them has been listened through
+
+        def all_expected():
+            return missing is not None and len(missing) == 0
+
+        def complete():
+            if self.num_devices != None and len(addr_seen) >= self.num_devices:
+                return True
+            return all_expected() and listened_out
+
         attempts = 0
-        while (self.num_devices == None or num_devices_seen < self.num_devices) and attempts < max_attempts:
-            sent = False
-            start_time = time()
-            timedout = False
-            while (self.num_devices == None or num_devices_seen < self.num_devices) and not timedout:
-                if not sent:
-                    for ip_addr in UDP_BROADCAST_IP_ADDRS:
-                        self.sock.sendto(msg.packed_message, (ip_addr, UDP_BROADCAST_PORT))
-                    sent = True
-                    if self.verbose:
-                        print("SEND: " + str(msg))
-                try:
-                    data, (ip_addr, port) = self.sock.recvfrom(1024)
-                    response = unpack_lifx_message(data)
+        try:
+            while not complete() and attempts < max_attempts:
+                deadline = loop.time() + timeout_secs
+                next_send = loop.time()
+                repeat_interval = BROADCAST_REPEAT_INTERVAL
+                while not complete():
+                    now = loop.time()
+                    if now >= deadline:
+                        listened_out = True  # no further attempt just for the extra repeats
+                        break
+                    if now >= next_send:
+                        if all_expected():
+                            if repeats_left == 0:
+                                listened_out = True
+                                continue
+                            repeats_left -= 1
+                        for broadcast_addr in UDP_BROADCAST_TARGETS:
+                            transport.sendto(packed_message, broadcast_addr)
+                        if self.verbose:
+                            print("SEND: " + str(unpack_lifx_message(packed_message)))
+                        next_send = now + repeat_interval
+                        repeat_interval *= BROADCAST_REPEAT_BACKOFF
+                    response, ip_addr = await request.get_response(min(deadline, next_send) - now)
+                    if response is None:
+                        continue
                     response.ip_addr = ip_addr
                     if self.verbose:
                         print("RECV: " + str(response))
-                    if type(response) == response_type and response.source_id == self.source_id:
-                        if response.target_addr not in addr_seen and response.target_addr != BROADCAST_MAC:
-                            addr_seen.append(response.target_addr)
-                            num_devices_seen += 1
-                            responses.append(response)
-                except timeout:
-                    pass
-                elapsed_time = time() - start_time
-                timedout = True if elapsed_time > timeout_secs else False
-            attempts += 1
-        self.close_socket()
+                    if response.target_addr not in addr_seen and response.target_addr != BROADCAST_MAC:
+                        addr_seen.add(response.target_addr)
+                        if missing is not None:
+                            missing.discard(response.target_addr)
+                        responses.append(response)
+                attempts += 1
+        finally:
+            transport.unregister(request)
         return responses
 
     def broadcast_with_ack(self, msg_type, payload={}, timeout_secs=DEFAULT_TIMEOUT+0.5, max_attempts=DEFAULT_ATTEMPTS):
@@ -293,26 +348,6 @@ class LifxLAN:
     def broadcast_with_ack_resp(self, msg_type, response_type, payload={}, timeout_secs=DEFAULT_TIMEOUT+0.5, max_attempts=DEFAULT_ATTEMPTS):
         pass
 
-    ############################################################################
-    #                                                                          #
-    #                              Socket Methods                              #
-    #                                                                          #
-    ############################################################################
-
-    def initialize_socket(self, timeout):
-        self.sock = socket(AF_INET, SOCK_DGRAM)
-        self.sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-        self.sock.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
-        self.sock.settimeout(timeout)
-        try:
-            self.sock.bind(("", 0))  # allow OS to assign next available source port
-        except Exception as err:
-            raise WorkflowException("WorkflowException: error {} while trying to open socket".format(str(err)))
-
-
-    def close_socket(self):
-        self.sock.close()
-
 def test():
     pass
 
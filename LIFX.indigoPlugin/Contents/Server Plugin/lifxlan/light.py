@@ -2,6 +2,7 @@
 # light.py
 # Author: Meghan Clark
 
+import asyncio
 import random
 from .device import Device
 from .errors import InvalidParameterException, WorkflowException
@@ -35,6 +36,13 @@ class Light(Device):
     #                                                                          #
     ############################################################################
 
+    # LightState carries the label and power level along with the colour, so refresh() gets all three from one LightGet
+    async def refresh_slow_async(self):
+        await asyncio.gather(self.get_location_async(), self.get_group_async())
+
+    async def refresh_dynamic_async(self):
+        await self.get_color_async()
+
     # GetPower - power level
     def get_power(self):
         try:
@@ -45,17 +53,20 @@ class Light(Device):
         return self.power_level
 
     def set_power(self, power, duration=0, rapid=False):
+        self.run_sync(self.set_power_async(power, duration, rapid))
+
+    async def set_power_async(self, power, duration=0, rapid=False):
         on = [True, 1, "on", 65535]
         off = [False, 0, "off"]
         try:
             if power in on and not rapid:
-                self.req_with_ack(LightSetPower, {"power_level": 65535, "duration": duration})
+                await self.req_with_ack_async(LightSetPower, {"power_level": 65535, "duration": duration})
             elif power in on and rapid:
-                self.fire_and_forget(LightSetPower, {"power_level": 65535, "duration": duration}, num_repeats=1)
+                await self.fire_and_forget_async(LightSetPower, {"power_level": 65535, "duration": duration}, num_repeats=1)
             elif power in off and not rapid:
-                self.req_with_ack(LightSetPower, {"power_level": 0, "duration": duration})
+                await self.req_with_ack_async(LightSetPower, {"power_level": 0, "duration": duration})
             elif power in off and rapid:
-                self.fire_and_forget(LightSetPower, {"power_level": 0, "duration": duration}, num_repeats=1)
+                await self.fire_and_forget_async(LightSetPower, {"power_level": 0, "duration": duration}, num_repeats=1)
             else:
                 raise InvalidParameterException("{} is not a valid power level.".format(power))
         except WorkflowException as e:
@@ -74,18 +85,24 @@ class Light(Device):
 
     # color is [Hue, Saturation, Brightness, Kelvin], duration in ms
     def set_color(self, color, duration=0, rapid=False):
+        self.run_sync(self.set_color_async(color, duration, rapid))
+
+    async def set_color_async(self, color, duration=0, rapid=False):
         if len(color) == 4:
             try:
                 if rapid:
-                    self.fire_and_forget(LightSetColor, {"color": color, "duration": duration}, num_repeats=1)
+                    await self.fire_and_forget_async(LightSetColor, {"color": color, "duration": duration}, num_repeats=1)
                 else:
-                    self.req_with_ack(LightSetColor, {"color": color, "duration": duration})
+                    await self.req_with_ack_async(LightSetColor, {"color": color, "duration": duration})
             except WorkflowException as e:
                 raise
 
     def get_color(self):
+        return self.run_sync(self.get_color_async())
+
+    async def get_color_async(self):
         try:
-            response = self.req_with_resp(LightGet, LightState)
+            response = await self.req_with_resp_async(LightGet, LightState)
             self.color = response.color
             self.power_level = response.power_level
             self.label = response.label
@@ -152,11 +169,16 @@ class Light(Device):
     # Infrared get maximum brightness, infrared_brightness
     def get_infrared(self):
         if self.supports_infrared():
-            try:
-                response = self.req_with_resp(LightGetInfrared, LightStateInfrared)
-                self.infrared_brightness = response.infrared_brightness
-            except WorkflowException as e:
-                raise
+            self.run_sync(self.get_infrared_async())
+        return self.infrared_brightness
+
+    # Doesn't check supports_infrared(), so the caller must
+    async def get_infrared_async(self):
+        try:
+            response = await self.req_with_resp_async(LightGetInfrared, LightStateInfrared)
+            self.infrared_brightness = response.infrared_brightness
+        except WorkflowException as e:
+            raise
         return self.infrared_brightness
 
     # Infrared set maximum brightness, infrared_brightness
@@ -171,15 +193,11 @@ class Light(Device):
 
     # minimum color temperature supported by lightbulb
     def get_min_kelvin(self):
-        if self.product_features == None:
-            self.product_features = self.get_product_features()
-        return self.product_features['min_kelvin']
+        return self.get_product_capabilities().min_kelvin
 
     # maximum color temperature supported by lightbulb
     def get_max_kelvin(self):
-        if self.product_features == None:
-            self.product_features = self.get_product_features()
-        return self.product_features['max_kelvin']
+        return self.get_product_capabilities().max_kelvin
 
     ############################################################################
     #                                                                          #
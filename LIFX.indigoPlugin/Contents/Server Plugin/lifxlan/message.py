@@ -4,7 +4,7 @@
 
 import struct
 
-from .bitstring import pack
+from .pack import pack_lifx_message
 
 BROADCAST_MAC = "00:00:00:00:00:00"
 BROADCAST_SOURCE_ID = 0
@@ -12,10 +12,28 @@ BROADCAST_SOURCE_ID = 0
 HEADER_SIZE_BYTES = 36
 
 class Message(object):
+    # Messages are created for every packet sent and received, so they are slotted and lazy: nothing is encoded
+    # until packed_message is first used, and payload_fields is only filled in when the message is described
+    # (see __str__). A received message keeps the datagram it was decoded from as its packed_message.
+    # Subclasses list their payload attributes in their own __slots__.
+    __slots__ = ("size", "origin", "tagged", "addressable", "protocol", "source_id",
+                 "target_addr", "reserved", "ack_requested", "response_requested", "seq_num",
+                 "message_type", "ip_addr", "_packed_message", "_payload_fields")
+
+    # Frame
+    frame_format = ["16", "2, 1, 1, 12", "32"]
+    # Frame Address
+    frame_addr_format = ["64", "48", "6, 1, 1", "8"]
+    # Protocol Header
+    protocol_header_format = ["64", "16", "16"]
+
     def __init__(self, msg_type, target_addr, source_id, seq_num, ack_requested=False, response_requested=False):
+        self.set_header_fields(msg_type, target_addr, source_id, seq_num, ack_requested, response_requested)
+
+    # Split out of __init__ so that unpack_lifx_message() can build a received message without re-encoding it
+    def set_header_fields(self, msg_type, target_addr, source_id, seq_num, ack_requested=False, response_requested=False):
 
         # Frame
-        self.frame_format = ["16", "2, 1, 1, 12", "32"]
         self.size = None                                                # 16 bits/uint16
         self.origin = 0                                                 # 2 bits/uint8, must be zero
         self.tagged = 1 if target_addr == BROADCAST_MAC else 0          # 1 bit/bool, also must be one if getservice
@@ -24,7 +42,6 @@ class Message(object):
         self.source_id = source_id                                      # 32 bits/uint32, unique ID set by client. If zero, broadcast reply requested. If non-zero, unicast reply requested.
 
         # Frame Address
-        self.frame_addr_format = ["64", "48", "6, 1, 1", "8"]
         self.target_addr = target_addr                                  # 64 bits/uint64, either single MAC address or all zeroes for broadcast.
         self.reserved = 0                                               # 48 bits/uint8 x 6, all zero
         self.reserved = 0                                               # 6 bits, all zero
@@ -33,19 +50,57 @@ class Message(object):
         self.seq_num = seq_num                                          # 8 bits/uint8, wraparound
 
         # Protocol Header
-        self.protocol_header_format = ["64", "16", "16"]
         self.reserved = 0                                               # 64 bits/uint64, all zero
         self.message_type = msg_type                                    # 16 bits/uint16
         self.reserved = 0                                               # 16 bits/uint16, all zero
 
-        self.payload_fields = [] # tuples of ("label", value)
-
-        self.packed_message = self.generate_packed_message()
+    # The encoded message, generated on first use
+    @property
+    def packed_message(self):
+        try:
+            return self._packed_message
+        except AttributeError:
+            self._packed_message = self.generate_packed_message()
+            return self._packed_message
+
+    @packed_message.setter
+    def packed_message(self, packed_message):
+        self._packed_message = packed_message
+
+    # tuples of ("label", value), filled in by get_payload()
+    @property
+    def payload_fields(self):
+        try:
+            return self._payload_fields
+        except AttributeError:
+            self._payload_fields = []
+            return self._payload_fields
+
+    @payload_fields.setter
+    def payload_fields(self, payload_fields):
+        self._payload_fields = payload_fields
+
+    @property
+    def header(self):
+        return self.packed_message[:HEADER_SIZE_BYTES]
+
+    @property
+    def payload(self):
+        return self.packed_message[HEADER_SIZE_BYTES:]
 
     def generate_packed_message(self):
-        self.payload = self.get_payload()
-        self.header = self.get_header()
-        packed_message = self.header + self.payload
+        # Fast path: precompiled struct encoders (see pack.py). A bare Message has no payload attributes for them to
+        # read, even if its type id is a known one.
+        packed_message = pack_lifx_message(self) if type(self) is not Message else None
+        if packed_message is not None:
+            self.size = len(packed_message)
+            return packed_message
+
+        # Fallback: bitstring
+        payload = self.get_payload()
+        self.size = HEADER_SIZE_BYTES + len(payload)
+        header = self.get_header()
+        packed_message = header + payload
         return packed_message
 
     # frame (and thus header) needs to be generated after payload (for size field)
@@ -95,11 +150,11 @@ class Message(object):
         return protocol_header
 
     def get_msg_size(self):
-        payload_size_bytes = len(self.payload)
-        return HEADER_SIZE_BYTES + payload_size_bytes
+        return len(self.packed_message)
 
     def __str__(self):
         indent = "  "
+        packed_message = self.packed_message  # sets size if the message hasn't been encoded yet
         s = self.__class__.__name__ + "\n"
         s += indent + "Size: {}\n".format(self.size)
         s += indent + "Origin: {}\n".format(self.origin)
@@ -112,13 +167,15 @@ class Message(object):
         s += indent + "Seq Num: {}\n".format(self.seq_num)
         s += indent + "Message Type: {}\n".format(self.message_type)
         s += indent + "Payload:"
+        if len(self.payload_fields) == 0:
+            self.get_payload() # the struct encoder doesn't fill in payload_fields
         for field in self.payload_fields:
             s += "\n" + indent*2 + "{}: {}".format(field[0], field[1])
         if len(self.payload_fields) == 0:
             s += "\n" + indent*2 + "<empty>"
         s += "\n"
         s += indent + "Bytes:\n"
-        s += indent*2 + str([hex(b) for b in struct.unpack("B"*(len(self.packed_message)),self.packed_message)])
+        s += indent*2 + str([hex(b) for b in struct.unpack("B"*(len(packed_message)),packed_message)])
         s += "\n"
         return s
 
@@ -129,6 +186,12 @@ def convert_MAC_to_int(addr):
     addr_str = "".join(reverse_bytes_str)
     return int(addr_str, 16)
 
+# bitstring.pack(), imported on first use: only messages that pack.py has no encoder for (see
+# generate_packed_message) need bitstring, which is much the largest module of lifxlan
+def pack(fmt, *values, **kwargs):
+    from .bitstring import pack as bitstring_pack
+    return bitstring_pack(fmt, *values, **kwargs)
+
 def little_endian(bs):
     shifts = [i*8 for i in range(int(len(bs)/8))]
     int_bytes_little_endian = [int(bs.uintbe >> i & 0xff) for i in shifts]
@@ -6,20 +6,22 @@
 # Need to look into assert-type frameworks or something, there has to be a tool for that.
 # Also need to make custom errors possibly, though tool may have those.
 
-from .bitstring import pack
-
-from .message import BROADCAST_MAC, Message, little_endian
+from .message import BROADCAST_MAC, Message, little_endian, pack
 
 # #### DEVICE MESSAGES #####
 
 
 class GetService(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         target_addr = BROADCAST_MAC
         super(GetService, self).__init__(MSG_IDS[GetService], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class StateService(Message):
+    __slots__ = ("service", "port")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.service = payload["service"]
         self.port = payload["port"]
@@ -35,11 +37,15 @@ class StateService(Message):
 
 
 class GetHostInfo(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(GetHostInfo, self).__init__(MSG_IDS[GetHostInfo], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class StateHostInfo(Message):
+    __slots__ = ("signal", "tx", "rx", "reserved1")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.signal = payload["signal"]
         self.tx = payload["tx"]
@@ -61,11 +67,15 @@ class StateHostInfo(Message):
 
 
 class GetHostFirmware(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(GetHostFirmware, self).__init__(MSG_IDS[GetHostFirmware], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class StateHostFirmware(Message):
+    __slots__ = ("build", "reserved1", "version")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.build = payload["build"]
         self.reserved1 = payload["reserved1"]
@@ -84,11 +94,15 @@ class StateHostFirmware(Message):
 
 
 class GetWifiInfo(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(GetWifiInfo, self).__init__(MSG_IDS[GetWifiInfo], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class StateWifiInfo(Message):
+    __slots__ = ("signal", "tx", "rx", "reserved1")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.signal = payload["signal"]
         self.tx = payload["tx"]
@@ -110,11 +124,15 @@ class StateWifiInfo(Message):
 
 
 class GetWifiFirmware(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(GetWifiFirmware, self).__init__(MSG_IDS[GetWifiFirmware], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class StateWifiFirmware(Message):
+    __slots__ = ("build", "reserved1", "version")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.build = payload["build"]
         self.reserved1 = payload["reserved1"]
@@ -133,11 +151,15 @@ class StateWifiFirmware(Message):
 
 
 class GetPower(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(GetPower, self).__init__(MSG_IDS[GetPower], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class SetPower(Message):
+    __slots__ = ("power_level",)
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.power_level = payload["power_level"]
         super(SetPower, self).__init__(MSG_IDS[SetPower], target_addr, source_id, seq_num, ack_requested, response_requested)
@@ -150,6 +172,8 @@ class SetPower(Message):
 
 
 class StatePower(Message):
+    __slots__ = ("power_level",)
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.power_level = payload["power_level"]
         super(StatePower, self).__init__(MSG_IDS[StatePower], target_addr, source_id, seq_num, ack_requested, response_requested)
@@ -162,11 +186,15 @@ class StatePower(Message):
 
 
 class GetLabel(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(GetLabel, self).__init__(MSG_IDS[GetLabel], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class SetLabel(Message):
+    __slots__ = ("label",)
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.label = payload["label"]
         super(SetLabel, self).__init__(MSG_IDS[SetLabel], target_addr, source_id, seq_num, ack_requested, response_requested)
@@ -184,6 +212,8 @@ class SetLabel(Message):
 
 
 class StateLabel(Message):
+    __slots__ = ("label",)
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.label = payload["label"]
         super(StateLabel, self).__init__(MSG_IDS[StateLabel], target_addr, source_id, seq_num, ack_requested, response_requested)
@@ -201,11 +231,15 @@ class StateLabel(Message):
 
 
 class GetVersion(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(GetVersion, self).__init__(MSG_IDS[GetVersion], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class StateVersion(Message):
+    __slots__ = ("vendor", "product", "version")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.vendor = payload["vendor"]
         self.product = payload["product"]
@@ -224,11 +258,15 @@ class StateVersion(Message):
 
 
 class GetInfo(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(GetInfo, self).__init__(MSG_IDS[GetInfo], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class StateInfo(Message):
+    __slots__ = ("time", "uptime", "downtime")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.time = payload["time"]
         self.uptime = payload["uptime"]
@@ -246,11 +284,15 @@ class StateInfo(Message):
         return payload
 
 class GetLocation(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(GetLocation, self).__init__(MSG_IDS[GetLocation], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class StateLocation(Message):
+    __slots__ = ("location", "label", "updated_at")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.location = payload["location"]
         self.label = payload["label"]
@@ -273,11 +315,15 @@ class StateLocation(Message):
         return payload
 
 class GetGroup(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(GetGroup, self).__init__(MSG_IDS[GetGroup], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class StateGroup(Message):
+    __slots__ = ("group", "label", "updated_at")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.group = payload["group"]
         self.label = payload["label"]
@@ -300,11 +346,15 @@ class StateGroup(Message):
         return payload
 
 class Acknowledgement(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(Acknowledgement, self).__init__(MSG_IDS[Acknowledgement], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class EchoRequest(Message):
+    __slots__ = ("byte_array",)
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.byte_array = payload["byte_array"]
         super(EchoRequest, self).__init__(MSG_IDS[EchoRequest], target_addr, source_id, seq_num, ack_requested, response_requested)
@@ -323,6 +373,8 @@ class EchoRequest(Message):
 
 
 class EchoResponse(Message):
+    __slots__ = ("byte_array",)
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.byte_array = payload["byte_array"]
         super(EchoResponse, self).__init__(MSG_IDS[EchoResponse], target_addr, source_id, seq_num, ack_requested, response_requested)
@@ -338,11 +390,15 @@ class EchoResponse(Message):
 
 
 class LightGet(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(LightGet, self).__init__(MSG_IDS[LightGet], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class LightSetColor(Message):
+    __slots__ = ("color", "duration")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.color = payload["color"]
         self.duration = payload["duration"]
@@ -359,6 +415,8 @@ class LightSetColor(Message):
 
 
 class LightSetWaveform(Message):
+    __slots__ = ("transient", "color", "period", "cycles", "duty_cycle", "waveform")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.transient = payload["transient"]
         self.color = payload["color"]
@@ -387,6 +445,8 @@ class LightSetWaveform(Message):
 
 
 class LightState(Message):
+    __slots__ = ("color", "reserved1", "power_level", "label", "reserved2")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.color = payload["color"]
         self.reserved1 = payload["reserved1"]
@@ -416,11 +476,15 @@ class LightState(Message):
 
 
 class LightGetPower(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(LightGetPower, self).__init__(MSG_IDS[LightGetPower], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 
 class LightSetPower(Message):
+    __slots__ = ("power_level", "duration")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.power_level = payload["power_level"]
         self.duration = payload["duration"]
@@ -436,6 +500,8 @@ class LightSetPower(Message):
 
 
 class LightStatePower(Message):
+    __slots__ = ("power_level",)
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.power_level = payload["power_level"]
         super(LightStatePower, self).__init__(MSG_IDS[LightStatePower], target_addr, source_id, seq_num, ack_requested, response_requested)
@@ -449,10 +515,14 @@ class LightStatePower(Message):
 ##### INFRARED MESSAGES #####
 
 class LightGetInfrared(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         super(LightGetInfrared, self).__init__(MSG_IDS[LightGetInfrared], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 class LightStateInfrared(Message):
+    __slots__ = ("infrared_brightness",)
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.infrared_brightness = payload["infrared_brightness"]
         super(LightStateInfrared, self).__init__(MSG_IDS[LightStateInfrared], target_addr, source_id, seq_num, ack_requested, response_requested)
@@ -464,6 +534,8 @@ class LightStateInfrared(Message):
         return payload
 
 class LightSetInfrared(Message):
+    __slots__ = ("infrared_brightness",)
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.infrared_brightness = payload["infrared_brightness"]
         super(LightSetInfrared, self).__init__(MSG_IDS[LightSetInfrared], target_addr, source_id, seq_num, ack_requested, response_requested)
@@ -477,6 +549,8 @@ class LightSetInfrared(Message):
 ##### MULTIZONE MESSAGES #####
 
 class MultiZoneStateMultiZone(Message):
+    __slots__ = ("count", "index", "color")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.count = payload["count"]
         self.index = payload["index"]
@@ -495,6 +569,8 @@ class MultiZoneStateMultiZone(Message):
         return payload
 
 class MultiZoneStateZone(Message): #503
+    __slots__ = ("count", "index", "color")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.count = payload["count"]
         self.index = payload["index"]
@@ -513,6 +589,8 @@ class MultiZoneStateZone(Message): #503
 
 
 class MultiZoneSetColorZones(Message):
+    __slots__ = ("start_index", "end_index", "color", "duration", "apply")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.start_index = payload["start_index"]
         self.end_index = payload["end_index"]
@@ -536,6 +614,8 @@ class MultiZoneSetColorZones(Message):
         return payload
 
 class MultiZoneGetColorZones(Message):
+    __slots__ = ("start_index", "end_index")
+
     def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
         self.start_index = payload["start_index"]
         self.end_index = payload["end_index"]
@@ -549,14 +629,80 @@ class MultiZoneGetColorZones(Message):
         payload = start_index + end_index
         return payload
 
+class MultiZoneSetExtendedColorZones(Message): #510
+    __slots__ = ("duration", "apply", "zone_index", "colors_count", "colors")
+
+    def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
+        self.duration = payload["duration"]
+        self.apply = payload["apply"]
+        self.zone_index = payload["zone_index"]
+        self.colors_count = payload["colors_count"]
+        self.colors = payload["colors"]
+        super(MultiZoneSetExtendedColorZones, self).__init__(MSG_IDS[MultiZoneSetExtendedColorZones], target_addr, source_id, seq_num, ack_requested, response_requested)
+
+    def get_payload(self):
+        self.payload_fields.append(("Duration", self.duration))
+        self.payload_fields.append(("Apply", self.apply))
+        self.payload_fields.append(("Zone Index", self.zone_index))
+        self.payload_fields.append(("Colors Count", self.colors_count))
+        self.payload_fields.append(("Colors[82]", self.colors))
+        duration = little_endian(pack("32", self.duration))
+        apply = little_endian(pack("8", self.apply))
+        zone_index = little_endian(pack("16", self.zone_index))
+        colors_count = little_endian(pack("8", self.colors_count))
+        payload = duration + apply + zone_index + colors_count
+        for color in extended_zone_colors(self.colors):
+            payload += b"".join(little_endian(pack("16", field)) for field in color)
+        return payload
+
+class MultiZoneGetExtendedColorZones(Message): #511
+    __slots__ = ()
+
+    def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
+        super(MultiZoneGetExtendedColorZones, self).__init__(MSG_IDS[MultiZoneGetExtendedColorZones], target_addr, source_id, seq_num, ack_requested, response_requested)
+
+class MultiZoneStateExtendedColorZones(Message): #512
+    __slots__ = ("count", "index", "colors_count", "colors")
+
+    def __init__(self, target_addr, source_id, seq_num, payload, ack_requested=False, response_requested=False):
+        self.count = payload["count"]
+        self.index = payload["index"]
+        self.colors_count = payload["colors_count"]
+        self.colors = payload["colors"]
+        super(MultiZoneStateExtendedColorZones, self).__init__(MSG_IDS[MultiZoneStateExtendedColorZones], target_addr, source_id, seq_num, ack_requested, response_requested)
+
+    def get_payload(self):
+        self.payload_fields.append(("Count", self.count))
+        self.payload_fields.append(("Index", self.index))
+        self.payload_fields.append(("Colors Count", self.colors_count))
+        self.payload_fields.append(("Colors[82]", self.colors))
+        count = little_endian(pack("16", self.count))
+        index = little_endian(pack("16", self.index))
+        colors_count = little_endian(pack("8", self.colors_count))
+        payload = count + index + colors_count
+        for color in extended_zone_colors(self.colors):
+            payload += b"".join(little_endian(pack("16", field)) for field in color)
+        return payload
+
+# The extended multizone messages always carry 82 colours; only the first colors_count of them are used
+EXTENDED_ZONE_COLORS = 82
+
+def extended_zone_colors(colors):
+    colors = list(colors[:EXTENDED_ZONE_COLORS])
+    return colors + [(0, 0, 0, 0)] * (EXTENDED_ZONE_COLORS - len(colors))
+
 ##### TILE MESSAGES #####
 
 class GetDeviceChain(Message):
+    __slots__ = ()
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         target_addr = BROADCAST_MAC
         super(GetDeviceChain, self).__init__(MSG_IDS[GetDeviceChain], target_addr, source_id, seq_num, ack_requested, response_requested)
 
 class StateDeviceChain(Message):
+    __slots__ = ("start_index", "total_count", "tile_devices")
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         target_addr = BROADCAST_MAC
         self.start_index = payload["start_index"]
@@ -593,6 +739,8 @@ class StateDeviceChain(Message):
         return payload
 
 class SetUserPosition(Message):
+    __slots__ = ("tile_index", "user_x", "user_y")
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         target_addr = BROADCAST_MAC
         self.tile_index = payload["tile_index"]
@@ -614,6 +762,8 @@ class SetUserPosition(Message):
         return payload
 
 class GetTileState64(Message):
+    __slots__ = ("tile_index", "length", "x", "y", "width")
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         target_addr = BROADCAST_MAC
         self.tile_index = payload["tile_index"]
@@ -641,6 +791,8 @@ class GetTileState64(Message):
         return payload
 
 class StateTileState64(Message):
+    __slots__ = ("tile_index", "x", "y", "width", "colors")
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         target_addr = BROADCAST_MAC
         self.tile_index = payload["tile_index"]
@@ -669,6 +821,8 @@ class StateTileState64(Message):
         return payload
 
 class SetTileState64(Message):
+    __slots__ = ("tile_index", "length", "x", "y", "width", "duration", "colors")
+
     def __init__(self, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
         target_addr = BROADCAST_MAC
         self.tile_index = payload["tile_index"]
@@ -744,6 +898,9 @@ MSG_IDS = {     GetService: 2,
                 MultiZoneGetColorZones: 502,
                 MultiZoneStateZone: 503,
                 MultiZoneStateMultiZone: 506,
+                MultiZoneSetExtendedColorZones: 510,
+                MultiZoneGetExtendedColorZones: 511,
+                MultiZoneStateExtendedColorZones: 512,
                 GetDeviceChain: 701,
                 StateDeviceChain: 702,
                 SetUserPosition: 703,
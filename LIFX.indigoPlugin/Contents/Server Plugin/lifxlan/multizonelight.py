@@ -1,22 +1,68 @@
 # coding=utf-8
 # multizonelight.py
 
-import math
 import random
 
 from .device import WorkflowException
 from .light import Light
-from .msgtypes import MultiZoneGetColorZones, MultiZoneSetColorZones, MultiZoneStateMultiZone, MultiZoneStateZone
+from .msgtypes import EXTENDED_ZONE_COLORS, GetHostFirmware, GetVersion, MultiZoneGetColorZones, MultiZoneGetExtendedColorZones, \
+    MultiZoneSetColorZones, MultiZoneSetExtendedColorZones, MultiZoneStateExtendedColorZones, MultiZoneStateMultiZone, \
+    MultiZoneStateZone, StateHostFirmware, StateVersion
+from .products import extended_multizone_products, supports_extended_multizone
 
 
 class MultiZoneLight(Light):
     def __init__(self, mac_addr, ip_addr, service=1, port=56700, source_id=random.randrange(2, 1 << 32), verbose=False):
         super(MultiZoneLight, self).__init__(mac_addr, ip_addr, service, port, source_id, verbose)
+        self.extended_multizone = None  # True if the product and its firmware support the extended multizone messages
+
+    # Extended multizone reads and writes up to 82 zones per packet; older strips (and older firmware) only
+    # support the original messages, which handle 8 zones per read and one colour per write.
+    def supports_extended_multizone(self):
+        return self.run_sync(self.supports_extended_multizone_async())
+
+    async def supports_extended_multizone_async(self):
+        if self.extended_multizone == None:
+            self.load_cached_version()
+            if self.product == None:
+                response = await self.req_with_resp_async(GetVersion, StateVersion)
+                self.vendor, self.product, self.version = response.vendor, response.product, response.version
+            if self.product in extended_multizone_products:
+                response = await self.req_with_resp_async(GetHostFirmware, StateHostFirmware)
+                self.extended_multizone = supports_extended_multizone(self.product, response.version)
+            else:
+                self.extended_multizone = False
+        return self.extended_multizone
 
     # 0 indexed, NOT inclusive, works like python list indices
     def get_color_zones(self, start=None, end=None):
-        response = self.req_with_resp(MultiZoneGetColorZones, [MultiZoneStateZone, MultiZoneStateMultiZone], {"start_index":0, "end_index":255})
-        total_zones = response.count
+        return self.run_sync(self.get_color_zones_async(start, end))
+
+    async def get_color_zones_async(self, start=None, end=None):
+        if (start != None and end == None) or (start == None and end != None):
+            raise ValueError("In the function get_color_zones, start and end indices must both be provided, or neither provided.")
+
+        # One request for every zone: the device replies with a MultiZoneStateExtendedColorZones per 82 zones, or with the
+        # original messages a MultiZoneStateMultiZone per 8 zones (or a single MultiZoneStateZone if it only has one).
+        # Each reply carries the total zone count and the index of its first zone.
+        zones = {}
+        total_zones = None
+
+        def collect(response):
+            nonlocal total_zones
+            total_zones = response.count
+            if type(response) == MultiZoneStateZone:
+                zones[response.index] = response.color
+            else:
+                colors = response.colors[:response.colors_count] if type(response) == MultiZoneStateExtendedColorZones else response.color
+                for offset, color in enumerate(colors[:total_zones - response.index]):
+                    zones[response.index + offset] = color
+            return len(zones) >= total_zones
+        if await self.supports_extended_multizone_async():
+            await self.req_with_multi_resp_async(MultiZoneGetExtendedColorZones, MultiZoneStateExtendedColorZones, collect)
+        else:
+            await self.req_with_multi_resp_async(MultiZoneGetColorZones, [MultiZoneStateZone, MultiZoneStateMultiZone], collect, {"start_index":0, "end_index":255})
+
         # validate indices
         if start != None and end != None:
             # automatically truncate if the end is too large
@@ -26,23 +72,8 @@ class MultiZoneLight(Light):
                 raise ValueError("In the function get_color_zones, starting index is greater than the total available zones (provided start = {}, end = {} for a device with {} total zones).".format(start, end, total_zones))
             if end <= start:
                 raise ValueError("In the function get_color_zones, end must be greater than start (provided start = {}, end = {}).".format(start, end, total_zones))
-        if (start != None and end == None) or (start == None and end != None):
-            raise ValueError("In the function get_color_zones, start and end indices must both be provided, or neither provided.")
 
-        # get all zones
-        all_zones = []
-        for i in range(total_zones):
-            all_zones.append(None)
-        for i in range(int(math.ceil(total_zones/8.0))):
-            response = self.req_with_resp(MultiZoneGetColorZones, [MultiZoneStateZone, MultiZoneStateMultiZone], {"start_index":0+(i*8), "end_index":7+(i*8)})
-            first_included_zone = response.index
-            if first_included_zone + 8 > total_zones:
-                last_included_zone = total_zones-1
-                last_index = last_included_zone - first_included_zone
-            else:
-                last_included_zone = first_included_zone + 7
-                last_index = 8
-            all_zones[first_included_zone:last_included_zone+1] = response.color[:last_index+1]
+        all_zones = [zones[i] for i in range(total_zones)]
         self.color = all_zones
 
         if start != None and end != None:
@@ -51,23 +82,41 @@ class MultiZoneLight(Light):
         return self.color
 
     def set_zone_color(self, start_index, end_index, color, duration=0, rapid=False, apply=1):
+        self.run_sync(self.set_zone_color_async(start_index, end_index, color, duration, rapid, apply))
+
+    async def set_zone_color_async(self, start_index, end_index, color, duration=0, rapid=False, apply=1):
         if len(color) == 4:
             try:
                 if rapid:
-                    self.fire_and_forget(MultiZoneSetColorZones,
-                                         {"start_index": start_index, "end_index": end_index, "color": color,
-                                          "duration": duration, "apply": apply}, num_repeats=1)
+                    await self.fire_and_forget_async(MultiZoneSetColorZones,
+                                                     {"start_index": start_index, "end_index": end_index, "color": color,
+                                                      "duration": duration, "apply": apply}, num_repeats=1)
                 else:
-                    self.req_with_ack(MultiZoneSetColorZones,
-                                      {"start_index": start_index, "end_index": end_index, "color": color,
-                                       "duration": duration, "apply": apply})
+                    await self.req_with_ack_async(MultiZoneSetColorZones,
+                                                  {"start_index": start_index, "end_index": end_index, "color": color,
+                                                   "duration": duration, "apply": apply})
             except WorkflowException as e:
                 raise
 
     # Sets colors for all zones given a list of HSVK colors
     def set_zone_colors(self, colors, duration=0, rapid=False):
+        self.run_sync(self.set_zone_colors_async(colors, duration, rapid))
+
+    async def set_zone_colors_async(self, colors, duration=0, rapid=False):
+        if await self.supports_extended_multizone_async():
+            # Up to 82 zones per packet, only the last packet applies the new colours
+            for zone_index in range(0, len(colors), EXTENDED_ZONE_COLORS):
+                zone_colors = colors[zone_index:zone_index + EXTENDED_ZONE_COLORS]
+                apply = 1 if zone_index + EXTENDED_ZONE_COLORS >= len(colors) else 0
+                payload = {"duration": duration, "apply": apply, "zone_index": zone_index, "colors_count": len(zone_colors), "colors": zone_colors}
+                if rapid:
+                    await self.fire_and_forget_async(MultiZoneSetExtendedColorZones, payload, num_repeats=1)
+                else:
+                    await self.req_with_ack_async(MultiZoneSetExtendedColorZones, payload)
+            return
+
         for (i, color) in enumerate(colors):
             apply = 0
             if i == len(colors)-1:
                 apply = 1
-            self.set_zone_color(i, i+1, color, duration, rapid, apply)
+            await self.set_zone_color_async(i, i+1, color, duration, rapid, apply)
@@ -0,0 +1,391 @@
+# coding=utf-8
+# pack.py
+#
+# Fast encoder for outgoing LIFX messages, the counterpart of unpack.py.
+#
+# Every header and payload layout is compiled once into a struct.Struct and
+# packed straight into a reusable per-thread buffer, instead of building each
+# field through bitstring.pack() + little_endian(). Message types without an
+# encoder here (or payloads that don't fit the buffer) return None so that the
+# caller can fall back to the original bitstring path in message.py.
+
+from collections import OrderedDict
+from itertools import chain
+import struct
+import threading
+
+HEADER_SIZE_BYTES = 36
+MAX_PACKET_SIZE_BYTES = 1024
+
+# Frame (size, flags, source), Frame Address (target, reserved, response flags, sequence),
+# Protocol Header (reserved, type, reserved)
+HEADER = struct.Struct("<HHI6s2x6xBB8xH2x")
+
+HSBK = struct.Struct("<4H")
+SEQ_NUM_OFFSET = 23
+
+FRAME_CACHE_SIZE = 256
+
+_buffers = threading.local()
+_color_structs = {}
+
+
+def _get_buffer():
+    buf = getattr(_buffers, "buf", None)
+    if buf is None:
+        buf = bytearray(MAX_PACKET_SIZE_BYTES)
+        _buffers.buf = buf
+    return buf
+
+
+def _colors_struct(count):
+    # One struct per number of HSBK colours, e.g. 8 for multizone, 64 for tiles
+    s = _color_structs.get(count)
+    if s is None:
+        s = struct.Struct("<{}H".format(count * 4))
+        _color_structs[count] = s
+    return s
+
+
+def _pack_colors(buf, offset, colors):
+    s = _colors_struct(len(colors))
+    s.pack_into(buf, offset, *chain.from_iterable(colors))
+    return s.size
+
+
+def _pack_padded_colors(buf, offset, colors, count):
+    # Exactly `count` colours: extra ones are dropped, missing ones are zero filled
+    colors = colors[:count]
+    size = _pack_colors(buf, offset, colors) if colors else 0
+    padding = (count * HSBK.size) - size
+    buf[offset + size:offset + size + padding] = bytes(padding)
+    return count * HSBK.size
+
+
+def _label_bytes(label):
+    # struct's "32s" would silently cut a longer label short: leave those to the bitstring path
+    label_bytes = label.encode("utf-8")
+    if len(label_bytes) > 32:
+        raise ValueError("label longer than 32 bytes")
+    return label_bytes
+
+
+def mac_to_bytes(addr):
+    return bytes.fromhex(addr.replace(":", ""))
+
+
+##### PAYLOAD ENCODERS #####
+# Each encoder packs the payload of `msg` into `buf` at `offset` and returns the number of bytes written.
+
+def _encode_empty(msg, buf, offset):
+    return 0
+
+
+_SERVICE = struct.Struct("<BI")
+def _encode_state_service(msg, buf, offset):
+    _SERVICE.pack_into(buf, offset, msg.service, msg.port)
+    return _SERVICE.size
+
+
+# signal is a float32, as the LIFX protocol and unpack.py have it (the bitstring path packs it as a uint32)
+_INFO = struct.Struct("<fIIh")
+def _encode_state_host_info(msg, buf, offset):
+    _INFO.pack_into(buf, offset, msg.signal, msg.tx, msg.rx, msg.reserved1)
+    return _INFO.size
+
+
+_FIRMWARE = struct.Struct("<QQI")
+def _encode_state_firmware(msg, buf, offset):
+    _FIRMWARE.pack_into(buf, offset, msg.build, msg.reserved1, msg.version)
+    return _FIRMWARE.size
+
+
+_UINT16 = struct.Struct("<H")
+def _encode_power_level(msg, buf, offset):
+    _UINT16.pack_into(buf, offset, msg.power_level)
+    return _UINT16.size
+
+
+_LABEL = struct.Struct("<32s")
+def _encode_label(msg, buf, offset):
+    _LABEL.pack_into(buf, offset, _label_bytes(msg.label))
+    return _LABEL.size
+
+
+_VERSION = struct.Struct("<III")
+def _encode_state_version(msg, buf, offset):
+    _VERSION.pack_into(buf, offset, msg.vendor, msg.product, msg.version)
+    return _VERSION.size
+
+
+_TIMES = struct.Struct("<QQQ")
+def _encode_state_info(msg, buf, offset):
+    _TIMES.pack_into(buf, offset, msg.time, msg.uptime, msg.downtime)
+    return _TIMES.size
+
+
+_LOCATION_GROUP = struct.Struct("<16s32sQ")
+def _encode_state_location(msg, buf, offset):
+    _LOCATION_GROUP.pack_into(buf, offset, bytes(msg.location), _label_bytes(msg.label), msg.updated_at)
+    return _LOCATION_GROUP.size
+
+
+def _encode_state_group(msg, buf, offset):
+    _LOCATION_GROUP.pack_into(buf, offset, bytes(msg.group), _label_bytes(msg.label), msg.updated_at)
+    return _LOCATION_GROUP.size
+
+
+_ECHO = struct.Struct("<64s")
+def _encode_echo_request(msg, buf, offset):
+    _ECHO.pack_into(buf, offset, bytes(msg.byte_array))
+    return _ECHO.size
+
+
+def _encode_echo_response(msg, buf, offset):
+    byte_array = bytes(msg.byte_array)
+    buf[offset:offset + len(byte_array)] = byte_array
+    return len(byte_array)
+
+
+_SET_COLOR = struct.Struct("<B4HI")
+def _encode_light_set_color(msg, buf, offset):
+    _SET_COLOR.pack_into(buf, offset, 0, *msg.color, msg.duration)
+    return _SET_COLOR.size
+
+
+_SET_WAVEFORM = struct.Struct("<BB4HIfhB")
+def _encode_light_set_waveform(msg, buf, offset):
+    _SET_WAVEFORM.pack_into(buf, offset, 0, msg.transient, *msg.color, msg.period, msg.cycles, msg.duty_cycle, msg.waveform)
+    return _SET_WAVEFORM.size
+
+
+_LIGHT_STATE = struct.Struct("<4HHH32sQ")
+def _encode_light_state(msg, buf, offset):
+    _LIGHT_STATE.pack_into(buf, offset, *msg.color, msg.reserved1, msg.power_level, _label_bytes(msg.label), msg.reserved2)
+    return _LIGHT_STATE.size
+
+
+_SET_POWER = struct.Struct("<HI")
+def _encode_light_set_power(msg, buf, offset):
+    _SET_POWER.pack_into(buf, offset, msg.power_level, msg.duration)
+    return _SET_POWER.size
+
+
+def _encode_infrared(msg, buf, offset):
+    _UINT16.pack_into(buf, offset, msg.infrared_brightness)
+    return _UINT16.size
+
+
+_ZONE_INDEX = struct.Struct("<BB")
+def _encode_multizone_state_multizone(msg, buf, offset):
+    _ZONE_INDEX.pack_into(buf, offset, msg.count, msg.index)
+    return _ZONE_INDEX.size + _pack_colors(buf, offset + _ZONE_INDEX.size, msg.color)
+
+
+_STATE_ZONE = struct.Struct("<BB4H")
+def _encode_multizone_state_zone(msg, buf, offset):
+    _STATE_ZONE.pack_into(buf, offset, msg.count, msg.index, *msg.color)
+    return _STATE_ZONE.size
+
+
+_SET_COLOR_ZONES = struct.Struct("<BB4HIB")
+def _encode_multizone_set_color_zones(msg, buf, offset):
+    _SET_COLOR_ZONES.pack_into(buf, offset, msg.start_index, msg.end_index, *msg.color, msg.duration, msg.apply)
+    return _SET_COLOR_ZONES.size
+
+
+def _encode_multizone_get_color_zones(msg, buf, offset):
+    _ZONE_INDEX.pack_into(buf, offset, msg.start_index, msg.end_index)
+    return _ZONE_INDEX.size
+
+
+EXTENDED_ZONE_COLORS = 82
+_SET_EXTENDED_COLOR_ZONES = struct.Struct("<IBHB")
+def _encode_multizone_set_extended_color_zones(msg, buf, offset):
+    _SET_EXTENDED_COLOR_ZONES.pack_into(buf, offset, msg.duration, msg.apply, msg.zone_index, msg.colors_count)
+    return _SET_EXTENDED_COLOR_ZONES.size + _pack_padded_colors(buf, offset + _SET_EXTENDED_COLOR_ZONES.size, msg.colors, EXTENDED_ZONE_COLORS)
+
+
+_STATE_EXTENDED_COLOR_ZONES = struct.Struct("<HHB")
+def _encode_multizone_state_extended_color_zones(msg, buf, offset):
+    _STATE_EXTENDED_COLOR_ZONES.pack_into(buf, offset, msg.count, msg.index, msg.colors_count)
+    return _STATE_EXTENDED_COLOR_ZONES.size + _pack_padded_colors(buf, offset + _STATE_EXTENDED_COLOR_ZONES.size, msg.colors, EXTENDED_ZONE_COLORS)
+
+
+_UINT8 = struct.Struct("<B")
+_TILE_DEVICE = struct.Struct("<hhhhffBBBIIIQQII")
+def _encode_state_device_chain(msg, buf, offset):
+    start = offset
+    _UINT8.pack_into(buf, offset, msg.start_index)
+    offset += _UINT8.size
+    for tile in msg.tile_devices:
+        _TILE_DEVICE.pack_into(buf, offset, tile["reserved1"], tile["reserved2"], tile["reserved3"], tile["reserved4"],
+                               tile["user_x"], tile["user_y"], tile["width"], tile["height"], tile["reserved5"],
+                               tile["device_version_vendor"], tile["device_version_product"], tile["device_version_version"],
+                               tile["firmware_build"], tile["reserved6"], tile["firmware_version"], tile["reserved7"])
+        offset += _TILE_DEVICE.size
+    _UINT8.pack_into(buf, offset, msg.total_count)
+    offset += _UINT8.size
+    return offset - start
+
+
+_SET_USER_POSITION = struct.Struct("<BHff")
+def _encode_set_user_position(msg, buf, offset):
+    _SET_USER_POSITION.pack_into(buf, offset, msg.tile_index, msg.reserved, msg.user_x, msg.user_y)
+    return _SET_USER_POSITION.size
+
+
+_GET_TILE_STATE = struct.Struct("<BBBBBB")
+def _encode_get_tile_state64(msg, buf, offset):
+    _GET_TILE_STATE.pack_into(buf, offset, msg.tile_index, msg.length, msg.reserved, msg.x, msg.y, msg.width)
+    return _GET_TILE_STATE.size
+
+
+_STATE_TILE_STATE = struct.Struct("<BBBBB")
+def _encode_state_tile_state64(msg, buf, offset):
+    _STATE_TILE_STATE.pack_into(buf, offset, msg.tile_index, msg.reserved, msg.x, msg.y, msg.width)
+    return _STATE_TILE_STATE.size + _pack_colors(buf, offset + _STATE_TILE_STATE.size, msg.colors)
+
+
+_SET_TILE_STATE = struct.Struct("<BBBBBBI")
+def _encode_set_tile_state64(msg, buf, offset):
+    _SET_TILE_STATE.pack_into(buf, offset, msg.tile_index, msg.length, msg.reserved, msg.x, msg.y, msg.width, msg.duration)
+    return _SET_TILE_STATE.size + _pack_colors(buf, offset + _SET_TILE_STATE.size, msg.colors)
+
+
+# Keyed on message type (see MSG_IDS in msgtypes.py)
+PAYLOAD_ENCODERS = {
+    2: _encode_empty,                           # GetService
+    3: _encode_state_service,                   # StateService
+    12: _encode_empty,                          # GetHostInfo
+    13: _encode_state_host_info,                # StateHostInfo
+    14: _encode_empty,                          # GetHostFirmware
+    15: _encode_state_firmware,                 # StateHostFirmware
+    16: _encode_empty,                          # GetWifiInfo
+    17: _encode_state_host_info,                # StateWifiInfo
+    18: _encode_empty,                          # GetWifiFirmware
+    19: _encode_state_firmware,                 # StateWifiFirmware
+    20: _encode_empty,                          # GetPower
+    21: _encode_power_level,                    # SetPower
+    22: _encode_power_level,                    # StatePower
+    23: _encode_empty,                          # GetLabel
+    24: _encode_label,                          # SetLabel
+    25: _encode_label,                          # StateLabel
+    32: _encode_empty,                          # GetVersion
+    33: _encode_state_version,                  # StateVersion
+    34: _encode_empty,                          # GetInfo
+    35: _encode_state_info,                     # StateInfo
+    45: _encode_empty,                          # Acknowledgement
+    48: _encode_empty,                          # GetLocation
+    50: _encode_state_location,                 # StateLocation
+    51: _encode_empty,                          # GetGroup
+    53: _encode_state_group,                    # StateGroup
+    58: _encode_echo_request,                   # EchoRequest
+    59: _encode_echo_response,                  # EchoResponse
+    101: _encode_empty,                         # LightGet
+    102: _encode_light_set_color,               # LightSetColor
+    103: _encode_light_set_waveform,            # LightSetWaveform
+    107: _encode_light_state,                   # LightState
+    116: _encode_empty,                         # LightGetPower
+    117: _encode_light_set_power,               # LightSetPower
+    118: _encode_power_level,                   # LightStatePower
+    120: _encode_empty,                         # LightGetInfrared
+    121: _encode_infrared,                      # LightStateInfrared
+    122: _encode_infrared,                      # LightSetInfrared
+    501: _encode_multizone_set_color_zones,     # MultiZoneSetColorZones
+    502: _encode_multizone_get_color_zones,     # MultiZoneGetColorZones
+    503: _encode_multizone_state_zone,          # MultiZoneStateZone
+    506: _encode_multizone_state_multizone,     # MultiZoneStateMultiZone
+    510: _encode_multizone_set_extended_color_zones,    # MultiZoneSetExtendedColorZones
+    511: _encode_empty,                         # MultiZoneGetExtendedColorZones
+    512: _encode_multizone_state_extended_color_zones,  # MultiZoneStateExtendedColorZones
+    701: _encode_empty,                         # GetDeviceChain
+    702: _encode_state_device_chain,            # StateDeviceChain
+    703: _encode_set_user_position,             # SetUserPosition
+    707: _encode_get_tile_state64,              # GetTileState64
+    711: _encode_state_tile_state64,            # StateTileState64
+    715: _encode_set_tile_state64,              # SetTileState64
+}
+
+
+def pack_header(buf, size, msg):
+    flags = (msg.origin << 14) | (msg.tagged << 13) | (msg.addressable << 12) | (msg.protocol & 0xfff)
+    response_flags = (msg.ack_requested << 1) | msg.response_requested
+    HEADER.pack_into(buf, 0, size, flags, msg.source_id, mac_to_bytes(msg.target_addr), response_flags, msg.seq_num, msg.message_type)
+
+
+# Returns the packed bytes of a message (one of the msgtypes classes, whose payload attributes the encoders read), or
+# None if it has to go through the bitstring fallback
+def pack_lifx_message(msg):
+    encoder = PAYLOAD_ENCODERS.get(msg.message_type)
+    if encoder is None:
+        return None
+    buf = _get_buffer()
+    try:
+        payload_size = encoder(msg, buf, HEADER_SIZE_BYTES)
+    except (struct.error, ValueError):
+        # Data out of range for its field (e.g. a label longer than 32 bytes): let the bitstring path deal with (or
+        # report) it
+        return None
+    size = HEADER_SIZE_BYTES + payload_size
+    pack_header(buf, size, msg)
+    return bytes(buf[:size])
+
+
+##### FRAME CACHE #####
+# Most of what is sent is the same few requests over and over (LightGet, LightGetPower, LightGetInfrared, ...) to the
+# same device from the same source_id, differing only in their sequence number. FrameCache keeps the encoded frame of
+# the most recently sent (message type, target, source_id, ack/response flags, payload) combinations, so sending one
+# again is a copy of the cached frame with the sequence number byte patched in.
+#
+# Payloads that can't be hashed (e.g. ones holding lists of colours) aren't cached and are encoded each time.
+
+class FrameCache(object):
+    def __init__(self, maxsize=FRAME_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.frames = OrderedDict()  # key -> encoded frame (sequence number 0), least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+
+    # Returns the encoded message as a new bytearray
+    def pack(self, msg_type, target_addr, source_id, seq_num, payload={}, ack_requested=False, response_requested=False):
+        # Payloads are built by the same few call sites, so their items come in a consistent order
+        key = (msg_type, target_addr, source_id, ack_requested, response_requested, tuple(payload.items()) if payload else ())
+        try:
+            hash(key)
+        except TypeError:
+            with self.lock:
+                self.uncached += 1
+            return bytearray(msg_type(target_addr, source_id, seq_num, payload, ack_requested, response_requested).packed_message)
+
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is not None:
+                self.frames.move_to_end(key)
+                self.hits += 1
+        if frame is None:
+            frame = bytes(msg_type(target_addr, source_id, 0, payload, ack_requested, response_requested).packed_message)
+            with self.lock:
+                self.misses += 1
+                self.frames[key] = frame
+                if len(self.frames) > self.maxsize:
+                    self.frames.popitem(last=False)
+
+        packed_message = bytearray(frame)
+        packed_message[SEQ_NUM_OFFSET] = seq_num
+        return packed_message
+
+    # Returns (hits, misses, uncached, number of frames cached)
+    def statistics(self):
+        with self.lock:
+            return self.hits, self.misses, self.uncached, len(self.frames)
+
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+
+
+# The process-wide cache used by Device and LifxLAN
+frame_cache = FrameCache()
@@ -146,6 +146,12 @@ light_products = [1, 3, 10, 11, 15, 18, 19, 20, 22, 27, 28, 29, 30, 31, 32, 36,
 # Identifies which products are switches.
 switch_products = [70, 71, 89, 115, 116]
 
+# Identifies which multizone products support the extended multizone messages (up to 82 zones per packet),
+# and the host firmware version (major, minor) they need for it.
+extended_multizone_products = {32: (2, 77), 38: (2, 77), 117: (0, 0), 118: (0, 0), 119: (0, 0), 120: (0, 0),
+                               141: (0, 0), 142: (0, 0), 143: (0, 0), 144: (0, 0), 161: (0, 0), 162: (0, 0),
+                               203: (0, 0), 204: (0, 0), 205: (0, 0), 206: (0, 0), 213: (0, 0), 214: (0, 0)}
+
 features_map = {
                 1: {                    # LIFX Original 1000
                     "color": True,
@@ -1804,3 +1810,81 @@ features_map = {
                     "relays": False,
                     "buttons": False}
 }
+
+
+############################################################################
+#                                                                          #
+#                           Capability Registry                            #
+#                                                                          #
+############################################################################
+
+# One bit per capability. The features_map flags, plus what the product is (light or switch) and the
+# capabilities that depend on the host firmware as well as the product.
+CAPABILITY_COLOR = 1 << 0
+CAPABILITY_TEMPERATURE = 1 << 1
+CAPABILITY_INFRARED = 1 << 2
+CAPABILITY_MULTIZONE = 1 << 3
+CAPABILITY_CHAIN = 1 << 4
+CAPABILITY_MATRIX = 1 << 5
+CAPABILITY_HEV = 1 << 6
+CAPABILITY_RELAYS = 1 << 7
+CAPABILITY_BUTTONS = 1 << 8
+CAPABILITY_LIGHT = 1 << 9
+CAPABILITY_SWITCH = 1 << 10
+CAPABILITY_EXTENDED_MULTIZONE = 1 << 11  # firmware dependent, see extended_multizone_products
+
+FEATURE_CAPABILITIES = {"color": CAPABILITY_COLOR, "temperature": CAPABILITY_TEMPERATURE, "infrared": CAPABILITY_INFRARED,
+                        "multizone": CAPABILITY_MULTIZONE, "chain": CAPABILITY_CHAIN, "matrix": CAPABILITY_MATRIX,
+                        "hev": CAPABILITY_HEV, "relays": CAPABILITY_RELAYS, "buttons": CAPABILITY_BUTTONS}
+
+
+class ProductCapabilities(object):
+    __slots__ = ("capabilities", "min_kelvin", "max_kelvin", "firmware_capabilities")
+
+    # firmware_capabilities: ((major, minor) host firmware version, capabilities it adds), ...
+    def __init__(self, capabilities, min_kelvin, max_kelvin, firmware_capabilities=()):
+        self.capabilities = capabilities
+        self.min_kelvin = min_kelvin
+        self.max_kelvin = max_kelvin
+        self.firmware_capabilities = firmware_capabilities
+
+
+def build_capabilities_map():
+    light_product_ids = set(light_products)
+    switch_product_ids = set(switch_products)
+    capabilities = {}
+    for product, features in features_map.items():
+        mask = 0
+        for feature, capability in FEATURE_CAPABILITIES.items():
+            if features[feature]:
+                mask |= capability
+        if product in light_product_ids:
+            mask |= CAPABILITY_LIGHT
+        if product in switch_product_ids:
+            mask |= CAPABILITY_SWITCH
+        firmware_capabilities = ()
+        if product in extended_multizone_products:
+            firmware_capabilities = ((extended_multizone_products[product], CAPABILITY_EXTENDED_MULTIZONE),)
+        capabilities[product] = ProductCapabilities(mask, features["min_kelvin"], features["max_kelvin"], firmware_capabilities)
+    return capabilities
+
+
+# product -> ProductCapabilities, built once from the tables above. None is the unknown product.
+capabilities_map = build_capabilities_map()
+
+
+# Returns the capability bits of the product, including those its host firmware adds if host_firmware_version
+# ((major, minor)) is given
+def product_capabilities(product, host_firmware_version=None):
+    entry = capabilities_map.get(product, capabilities_map[None])
+    capabilities = entry.capabilities
+    if host_firmware_version != None:
+        for min_firmware, firmware_capabilities in entry.firmware_capabilities:
+            if host_firmware_version >= min_firmware:
+                capabilities |= firmware_capabilities
+    return capabilities
+
+
+# host_firmware_version is as reported in StateHostFirmware: major in the upper 16 bits, minor in the lower 16
+def supports_extended_multizone(product, host_firmware_version):
+    return bool(product_capabilities(product, (host_firmware_version >> 16, host_firmware_version & 0xffff)) & CAPABILITY_EXTENDED_MULTIZONE)
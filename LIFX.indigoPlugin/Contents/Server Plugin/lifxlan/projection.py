@@ -0,0 +1,110 @@
+# coding=utf-8
+# projection.py
+#
+# Vectorised projection of images onto a TileChain's canvas (needs NumPy, which is optional: without it
+# TileChain.project_matrix keeps using its pure Python path and project_image isn't available). NumPy
+# is only imported when a projection is first needed, see load_numpy().
+#
+# A TileProjection is built once from the chain's tile layout. It holds, for every colour of every tile,
+# the index of the canvas pixel it shows, and for each image size it is given, the index of the image pixel
+# that canvas pixel is resampled from (nearest neighbour). Projecting a frame is then a single gather of
+# tile_count * 64 pixels, plus an RGB to HSBK conversion of just those pixels, whatever the image size.
+
+from .errors import InvalidParameterException
+
+numpy = None  # set by load_numpy()
+_numpy_loaded = False
+
+
+# Imports NumPy the first time it is needed (it takes longer to import than all of lifxlan) and returns it,
+# or None if it isn't installed
+def load_numpy():
+    global numpy, _numpy_loaded
+    if not _numpy_loaded:
+        try:
+            import numpy as numpy_module
+            numpy = numpy_module
+        except ImportError:
+            numpy = None
+        _numpy_loaded = True
+    return numpy
+
+
+TILE_WIDTH = 8
+TILE_HEIGHT = 8
+
+
+# Vectorised utils.RGBtoHSBK: rgb is an array of (..., 3) colours 0-255, returns (..., 4) uint16 HSBK
+def rgb_to_hsbk(rgb, temperature=3500):
+    load_numpy()
+    rgb = numpy.asarray(rgb, dtype=numpy.float64)
+    red, green, blue = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    cmax = rgb.max(axis=-1)
+    cmin = rgb.min(axis=-1)
+    cdel = cmax - cmin
+    chromatic = cdel != 0
+    safe_cdel = numpy.where(chromatic, cdel, 1.0)
+    safe_cmax = numpy.where(cmax != 0, cmax, 1.0)
+
+    redc = (cmax - red) / safe_cdel
+    greenc = (cmax - green) / safe_cdel
+    bluec = (cmax - blue) / safe_cdel
+    hue = numpy.where(red == cmax, bluec - greenc, numpy.where(green == cmax, 2 + redc - bluec, 4 + greenc - redc)) / 6
+    hue = numpy.where(hue < 0, hue + 1, hue)
+
+    hsbk = numpy.empty(rgb.shape[:-1] + (4,), dtype=numpy.uint16)
+    hsbk[..., 0] = numpy.where(chromatic, (hue * 65535).astype(numpy.int64), 0)
+    hsbk[..., 1] = numpy.where(chromatic, ((cdel / safe_cmax) * 65535).astype(numpy.int64), 0)
+    hsbk[..., 2] = ((cmax / 255) * 65535).astype(numpy.int64)
+    hsbk[..., 3] = temperature
+    return hsbk
+
+
+class TileProjection(object):
+    # tile_origins: the (x, y) canvas pixel of the top left corner of each tile, as used by TileChain.get_tile_map()
+    def __init__(self, tile_origins, canvas_dimensions):
+        if load_numpy() is None:
+            raise ImportError("NumPy is needed to project images onto a TileChain")
+        self.tile_count = len(tile_origins)
+        self.canvas_x, self.canvas_y = canvas_dimensions
+
+        # Canvas pixel shown by each colour of each tile, in SetTileState64 order (row by row)
+        rows, cols = numpy.divmod(numpy.arange(TILE_WIDTH * TILE_HEIGHT), TILE_WIDTH)
+        origins = numpy.asarray(tile_origins, dtype=numpy.int64).reshape(self.tile_count, 2)
+        canvas_rows = origins[:, 1:2] + rows
+        canvas_cols = origins[:, 0:1] + cols
+        self.canvas_index = (canvas_rows * self.canvas_x) + canvas_cols  # (tile_count, 64)
+
+        # Where tiles overlap the later tile owns the pixel (as in get_tile_map); colours of a tile
+        # that don't own their pixel are left off
+        owner = numpy.full(self.canvas_x * self.canvas_y, -1, dtype=numpy.int64)
+        for tile_index in range(self.tile_count):
+            owner[self.canvas_index[tile_index]] = tile_index
+        self.shown = owner[self.canvas_index] == numpy.arange(self.tile_count)[:, None]
+
+        self.source_index = {}  # image (height, width) -> image pixel index for each tile colour
+
+    def image_index(self, height, width):
+        index = self.source_index.get((height, width))
+        if index is None:
+            canvas_rows, canvas_cols = numpy.divmod(self.canvas_index, self.canvas_x)
+            image_rows = (canvas_rows * height) // self.canvas_y
+            image_cols = (canvas_cols * width) // self.canvas_x
+            index = (image_rows * width) + image_cols
+            self.source_index[(height, width)] = index
+        return index
+
+    # image: a (height, width, 3) RGB (0-255) or (height, width, 4) HSBK array of any size, resampled to the canvas.
+    # Returns a (tile_count, 64, 4) uint16 array of each tile's colours.
+    def project(self, image, temperature=3500):
+        image = numpy.asarray(image)
+        if image.ndim != 3 or image.shape[2] not in (3, 4):
+            raise InvalidParameterException("Expected a (height, width, 3) RGB or (height, width, 4) HSBK image, not one of shape {}.".format(image.shape))
+        height, width, channels = image.shape
+        pixels = image.reshape(height * width, channels)[self.image_index(height, width)]
+        if channels == 3:
+            colors = rgb_to_hsbk(pixels, temperature)
+        else:
+            colors = pixels.astype(numpy.uint16)
+        colors[~self.shown] = 0
+        return colors
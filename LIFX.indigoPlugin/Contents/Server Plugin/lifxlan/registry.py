@@ -0,0 +1,121 @@
+# coding=utf-8
+# registry.py
+#
+# The devices found by a LifxLAN's last discovery, indexed by MAC address, label, group, location and
+# capability, so that LifxLAN.get_lights(), get_device_by_name(), get_devices_by_group() etc. are
+# dictionary lookups rather than a discovery broadcast plus a request to every device.
+#
+# The indexes are rebuilt by refresh(), which runs a discovery (every light is refreshed, so its label,
+# group and location are known). They are rebuilt as a whole and swapped in at once, so a lookup sees
+# either the old or the new set of devices, never a mix. Once the indexes are older than ttl seconds, the
+# next lookup starts a refresh on a background thread and is answered from the current indexes meanwhile;
+# only the very first lookup, or one made with refresh=True, waits for a discovery. Those run the broadcast's
+# whole repeat schedule; a background refresh stops listening one repeat after every device it already knows
+# has answered.
+#
+# Labels, groups and locations changed since the last refresh (e.g. with Device.set_label()) are only seen
+# after the next one.
+
+from time import time
+import threading
+
+from .light import Light
+from .products import CAPABILITY_CHAIN, CAPABILITY_COLOR, CAPABILITY_INFRARED, CAPABILITY_MULTIZONE, CAPABILITY_TEMPERATURE
+
+REGISTRY_TTL = 60 #seconds before the registry is refreshed in the background on its next lookup
+
+# capability -> its products.CAPABILITY_* bit
+CAPABILITIES = {"color": CAPABILITY_COLOR, "temperature": CAPABILITY_TEMPERATURE, "infrared": CAPABILITY_INFRARED,
+                "multizone": CAPABILITY_MULTIZONE, "chain": CAPABILITY_CHAIN}
+
+
+class DeviceRegistry(object):
+    def __init__(self, lifxlan, ttl=REGISTRY_TTL):
+        self.lifxlan = lifxlan
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()  # one discovery at a time
+        self.background_refresh = None  # the thread of a background refresh in progress
+        self.refreshed_at = None
+        self.indexes = self.build_indexes([])
+
+    @staticmethod
+    def build_indexes(devices):
+        indexes = {"devices": list(devices), "lights": [], "mac": {}, "label": {}, "group": {}, "location": {},
+                   "capability": {capability: [] for capability in CAPABILITIES}}
+        for device in devices:
+            indexes["mac"][device.mac_addr] = device
+            for attribute in ("label", "group", "location"):
+                value = getattr(device, attribute)
+                if value != None:
+                    indexes[attribute].setdefault(value, []).append(device)
+            if isinstance(device, Light):
+                indexes["lights"].append(device)
+                capabilities = device.get_product_capabilities().capabilities
+                for capability, bit in CAPABILITIES.items():
+                    if capabilities & bit:
+                        indexes["capability"][capability].append(device)
+        return indexes
+
+    # Discovers the devices and rebuilds the indexes. Blocks until done.
+    # background: a TTL refresh, which may stop early once the known devices (and any new ones answering
+    # within one more repeat) have answered
+    def refresh(self, background=False):
+        with self.refresh_lock:
+            if background:
+                found = self.lifxlan.iter_devices(refresh=True, expected_macs=list(self.indexes["mac"]), extra_repeats=1)
+            else:
+                found = self.lifxlan.iter_devices(refresh=True)
+            devices = [device for device, error in found]
+            indexes = self.build_indexes(devices)
+            with self.lock:
+                self.indexes = indexes
+                self.refreshed_at = time()
+
+    # Makes sure the indexes are usable and returns them: refreshes first if refresh is True or there has never
+    # been a refresh, and starts a background refresh if they are older than the TTL.
+    def current(self, refresh=False):
+        if refresh or self.refreshed_at == None:
+            self.refresh()
+        elif time() - self.refreshed_at >= self.ttl:
+            with self.lock:
+                if self.background_refresh == None or not self.background_refresh.is_alive():
+                    self.background_refresh = threading.Thread(target=self.refresh, args=(True,), name="lifxlan-registry")
+                    self.background_refresh.daemon = True
+                    self.background_refresh.start()
+        return self.indexes
+
+    # Forgets every device, so the next lookup discovers them again
+    def clear(self):
+        with self.lock:
+            self.indexes = self.build_indexes([])
+            self.refreshed_at = None
+
+    ############################################################################
+    #                                                                          #
+    #                                 Lookups                                  #
+    #                                                                          #
+    ############################################################################
+
+    def get_devices(self, refresh=False):
+        return list(self.current(refresh)["devices"])
+
+    def get_lights(self, refresh=False):
+        return list(self.current(refresh)["lights"])
+
+    # Returns the device with the MAC address, or None
+    def get_device_by_mac(self, mac_addr, refresh=False):
+        return self.current(refresh)["mac"].get(mac_addr.lower())
+
+    def get_devices_by_label(self, label, refresh=False):
+        return list(self.current(refresh)["label"].get(label, []))
+
+    def get_devices_by_group(self, group, refresh=False):
+        return list(self.current(refresh)["group"].get(group, []))
+
+    def get_devices_by_location(self, location, refresh=False):
+        return list(self.current(refresh)["location"].get(location, []))
+
+    # capability: one of CAPABILITIES
+    def get_lights_by_capability(self, capability, refresh=False):
+        return list(self.current(refresh)["capability"][capability])
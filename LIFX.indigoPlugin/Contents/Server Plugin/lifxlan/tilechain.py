@@ -1,9 +1,16 @@
+from array import array
+import asyncio
 import random
+import sys
 
 from .errors import WorkflowException, InvalidParameterException
 from .light import Light
+from .message import HEADER_SIZE_BYTES
 from .msgtypes import GetTileState64, StateTileState64, SetTileState64, GetDeviceChain, StateDeviceChain, SetUserPosition
-from threading import Thread
+from .projection import TILE_HEIGHT, TILE_WIDTH, TileProjection, load_numpy
+from .tilestream import DEVICE_MESSAGES_PER_SECOND, TILE_COLORS, TileFrameStreamer
+
+_STATE_TILE_STATE64_COLORS_OFFSET = HEADER_SIZE_BYTES + 5  # colours follow tile_index, reserved, x, y, width
 
 class TileChain(Light):
     def __init__(self, mac_addr, ip_addr, service=1, port=56700, source_id=random.randrange(2, 1 << 32), verbose=False):
@@ -12,6 +19,7 @@ class TileChain(Light):
         self.tile_count = None
         self.tile_map = None
         self.canvas_dimensions = None
+        self.projection = None
         self.get_tile_info()
         self.get_tile_map()
         self.get_canvas_dimensions()
@@ -35,29 +43,64 @@ class TileChain(Light):
         return self.tile_count
 
     def get_tile_colors(self, start_index, tile_count=1, x=0, y=0, width=8):
+        return self.run_sync(self.get_tile_colors_async(start_index, tile_count, x, y, width))
+
+    # one request for all the tiles asked for: the chain replies with a StateTileState64 per tile
+    async def get_tile_colors_async(self, start_index, tile_count=1, x=0, y=0, width=8):
         if (start_index < 0) or (start_index >= self.tile_count):
             raise InvalidParameterException("{} is not a valid start_index for TileChain with {} tiles.".format(start_index, self.tile_count))
+        tile_count = min(tile_count, self.tile_count - start_index)
+
+        colors = {}
 
-        colors = []
-        for i in range(tile_count):
-            payload = {"tile_index": start_index + i,
-                       "length": 1,
-                       "reserved": 0,
-                       "x": x,
-                       "y": y,
-                       "width": width}
-            response = self.req_with_resp(GetTileState64, StateTileState64, payload)
-            colors.append(response.colors)
-        return colors
+        def collect(response):
+            if start_index <= response.tile_index < start_index + tile_count:
+                colors[response.tile_index] = response.colors
+            return len(colors) >= tile_count
+        await self.req_with_multi_resp_async(GetTileState64, StateTileState64, collect, self.get_tile_state_payload(start_index, tile_count, x, y, width))
+        return [colors[start_index + i] for i in range(tile_count)]
 
     def get_tilechain_colors(self):
-        tilechain_colors = []
-        for i in range(self.tile_count):
-            tile_colors = self.get_tile_colors(i)
-            tilechain_colors.append(tile_colors[0])
-        return tilechain_colors
+        return self.run_sync(self.get_tilechain_colors_async())
+
+    async def get_tilechain_colors_async(self):
+        return await self.get_tile_colors_async(0, self.tile_count)
+
+    # Snapshot of every tile's colours in one request, as a compact array('H') of tile_count * 64 HSBK colours
+    # (h, s, b, k, h, s, b, k, ...) in SetTileState64 order. With NumPy,
+    # numpy.frombuffer(frame, dtype=numpy.uint16).reshape(-1, 64, 4) views it without a copy.
+    def get_tilechain_frame(self):
+        return self.run_sync(self.get_tilechain_frame_async())
+
+    async def get_tilechain_frame_async(self):
+        tile_values = TILE_COLORS * 4
+        frame = array("H", bytes(self.tile_count * tile_values * 2))
+        tiles_seen = set()
+
+        def collect(response):
+            if response.tile_index < self.tile_count:
+                # Copied straight from the received packet rather than from the decoded colour tuples
+                colors = array("H", response.packed_message[_STATE_TILE_STATE64_COLORS_OFFSET:_STATE_TILE_STATE64_COLORS_OFFSET + (tile_values * 2)])
+                if sys.byteorder == "big":
+                    colors.byteswap()
+                frame[response.tile_index * tile_values:(response.tile_index + 1) * tile_values] = colors
+                tiles_seen.add(response.tile_index)
+            return len(tiles_seen) >= self.tile_count
+        await self.req_with_multi_resp_async(GetTileState64, StateTileState64, collect, self.get_tile_state_payload(0, self.tile_count))
+        return frame
+
+    def get_tile_state_payload(self, start_index, tile_count, x=0, y=0, width=8):
+        return {"tile_index": start_index,
+                "length": tile_count,
+                "reserved": 0,
+                "x": x,
+                "y": y,
+                "width": width}
 
     def set_tile_colors(self, start_index, colors, duration=0, tile_count=1, x=0, y=0, width=8, rapid=False):
+        self.run_sync(self.set_tile_colors_async(start_index, colors, duration, tile_count, x, y, width, rapid))
+
+    async def set_tile_colors_async(self, start_index, colors, duration=0, tile_count=1, x=0, y=0, width=8, rapid=False):
         if (start_index < 0) or (start_index >= self.tile_count):
             raise InvalidParameterException("{} is not a valid start_index for TileChain with {} tiles.".format(start_index, self.tile_count))
 
@@ -70,18 +113,20 @@ class TileChain(Light):
                    "y": y,
                    "width": width}
         if not rapid:
-            self.req_with_ack(SetTileState64, payload)
+            await self.req_with_ack_async(SetTileState64, payload)
         else:
-            self.fire_and_forget(SetTileState64, payload, num_repeats=1)
+            await self.fire_and_forget_async(SetTileState64, payload, num_repeats=1)
 
     def set_tilechain_colors(self, tilechain_colors, duration=0, rapid=False):
-        threads = []
-        for i in range(self.tile_count):
-            t = Thread(target = self.set_tile_colors, args = ((i, tilechain_colors[i], duration, 1, 0, 0, 8, rapid)))
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
+        self.run_sync(self.set_tilechain_colors_async(tilechain_colors, duration, rapid))
+
+    # all tiles are set concurrently; use stream_frames() for animations
+    async def set_tilechain_colors_async(self, tilechain_colors, duration=0, rapid=False):
+        await asyncio.gather(*[self.set_tile_colors_async(i, tilechain_colors[i], duration, 1, 0, 0, 8, rapid) for i in range(self.tile_count)])
+
+    # Returns a started TileFrameStreamer (see tilestream.py): submit() frames to it, stop() it when done
+    def stream_frames(self, messages_per_second=DEVICE_MESSAGES_PER_SECOND, duration=0):
+        return TileFrameStreamer(self, messages_per_second, duration).start()
 
     def recenter_coordinates(self):
         num_tiles = self.get_tile_count()
@@ -100,6 +145,23 @@ class TileChain(Light):
         if (matrix_x != canvas_x) or (matrix_y != canvas_y):
             raise InvalidParameterException("Warning: TileChain canvas wants a {} x {} matrix, but given matrix is {} x {}.".format(canvas_x, canvas_y, matrix_x, matrix_y))
 
+        numpy = load_numpy()
+        if numpy is not None:
+            tile_colors = self.get_projection().project(numpy.asarray(hsvk_matrix, dtype=numpy.uint16)).tolist()
+        else:
+            tile_colors = self.matrix_to_tile_colors(hsvk_matrix)
+        self.set_tilechain_colors(tile_colors, duration, rapid)
+
+    # Projects an RGB (0-255) or HSBK image of any size onto the canvas (needs NumPy, see projection.py).
+    # image: a (height, width, 3) or (height, width, 4) array; temperature is used for RGB images.
+    def project_image(self, image, duration=0, rapid=False, temperature=3500):
+        tile_colors = self.get_projection().project(image, temperature).tolist()
+        self.set_tilechain_colors(tile_colors, duration, rapid)
+
+    # The pure Python projection of a canvas sized HSBK matrix, used when NumPy isn't available
+    def matrix_to_tile_colors(self, hsvk_matrix):
+        num_tiles = self.get_tile_count()
+        canvas_x, canvas_y = self.get_canvas_dimensions()
         tile_width = 8 # hardcoded, argh
         tile_height = 8
         default_color = (0, 0, 0, 0)
@@ -113,14 +175,7 @@ class TileChain(Light):
                 if tile_map[row][col] != 0:
                     (tile_num, color_num) = tile_map[row][col]
                     tile_colors[tile_num][color_num] = hsvk_matrix[row][col]
-
-        threads = []
-        for (i, tile_color) in enumerate(tile_colors):
-            t = Thread(target = self.set_tile_colors, args = ((i, tile_color, duration, 1, 0, 0, 8, rapid)))
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
+        return tile_colors
 
     ### HELPER FUNCTIONS
 
@@ -131,6 +186,7 @@ class TileChain(Light):
         self.get_tile_info(refresh_cache=True)
         self.get_tile_map(refresh_cache=True)
         self.get_canvas_dimensions(refresh_cache=True)
+        self.projection = None
 
     def get_xy_vals(self):
         tiles = self.get_tile_info()
@@ -178,6 +234,17 @@ class TileChain(Light):
             self.canvas_dimensions = (canvas_x, canvas_y)
         return self.canvas_dimensions
 
+    # The tile layout precomputed for project_image() and project_matrix() (see projection.py), for tiles of
+    # TILE_WIDTH x TILE_HEIGHT colours (those of a SetTileState64)
+    def get_projection(self, refresh_cache=False):
+        if (self.projection == None) or (refresh_cache == True):
+            x_vals, y_vals = self.get_xy_vals()
+            x_vals = self.shift_axis_upper_left(x_vals)
+            y_vals = self.shift_axis_upper_left(y_vals, is_y=True)
+            tile_origins = [(int(x * TILE_WIDTH), int(y * TILE_HEIGHT)) for (x, y) in zip(x_vals, y_vals)][:self.get_tile_count()]
+            self.projection = TileProjection(tile_origins, self.get_canvas_dimensions())
+        return self.projection
+
     def get_tile_map(self, refresh_cache=False):
         if (self.tile_map == None) or (refresh_cache == True):
             num_tiles = self.get_tile_count()
@@ -0,0 +1,142 @@
+# coding=utf-8
+# tilestream.py
+#
+# Streams animation frames to a TileChain.
+#
+# A TileFrameStreamer keeps the SetTileState64 packets for every tile of the chain pre-encoded in one
+# buffer. Each frame only has its colours and sequence numbers written into that buffer before the
+# packets are sent, fire and forget, over the shared transport. Packets are paced so the chain never
+# receives more than messages_per_second (LIFX recommend no more than 20 per device), and a frame that
+# is submitted while an earlier one is still waiting to be sent replaces it: when the animation runs
+# faster than the device can take it, stale frames are dropped rather than queued.
+#
+#   streamer = tilechain.stream_frames()
+#   for frame in animation:            # frame: one list of 64 HSBK colours per tile
+#       streamer.submit(frame)
+#       sleep(1 / 30)
+#   streamer.stop()
+
+from itertools import chain
+import asyncio
+import struct
+import threading
+
+from .device import UDP_BROADCAST_TARGETS
+from .message import HEADER_SIZE_BYTES
+from .msgtypes import SetTileState64
+from .pack import SEQ_NUM_OFFSET
+from .transport import get_transport
+
+DEVICE_MESSAGES_PER_SECOND = 20
+
+TILE_COLORS = 64
+_TILE_COLORS = struct.Struct("<{}H".format(TILE_COLORS * 4))
+_COLORS_OFFSET = HEADER_SIZE_BYTES + struct.calcsize("<BBBBBBI")  # colours follow tile_index ... duration
+_PACKET_SIZE = _COLORS_OFFSET + _TILE_COLORS.size
+
+
+class TileFrameStreamer(object):
+    def __init__(self, tilechain, messages_per_second=DEVICE_MESSAGES_PER_SECOND, duration=0):
+        self.tilechain = tilechain
+        self.tile_count = tilechain.get_tile_count()
+        self.message_interval = 1.0 / messages_per_second
+        self.duration = duration
+
+        # One SetTileState64 per tile, back to back
+        self.buffer = bytearray(self.tile_count * _PACKET_SIZE)
+        for tile_index in range(self.tile_count):
+            payload = {"tile_index": tile_index, "length": 1, "reserved": 0, "x": 0, "y": 0, "width": 8,
+                       "duration": duration, "colors": [(0, 0, 0, 0)] * TILE_COLORS}
+            msg = SetTileState64(tilechain.mac_addr, tilechain.source_id, 0, payload, False, False)
+            self.buffer[tile_index * _PACKET_SIZE:(tile_index + 1) * _PACKET_SIZE] = msg.packed_message
+
+        self.lock = threading.Lock()
+        self.pending = None   # the latest submitted frame that hasn't been sent yet
+        self.idle = threading.Event()
+        self.idle.set()
+        self.loop = None
+        self.frame_ready = None
+        self.future = None
+
+        self.frames_submitted = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.messages_sent = 0
+
+    def start(self):
+        self.loop = get_transport().open()
+        self.frame_ready = asyncio.Event()
+        self.future = asyncio.run_coroutine_threadsafe(self.run(), self.loop)
+        return self
+
+    def stop(self):
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+        with self.lock:
+            self.pending = None
+        self.idle.set()
+
+    # tilechain_colors: a list of 64 HSBK colours for each tile, or a (tile_count, 64, 4) array of them.
+    # May be called from any thread.
+    def submit(self, tilechain_colors):
+        with self.lock:
+            if self.pending is not None:
+                self.frames_dropped += 1
+            self.pending = tilechain_colors
+            self.frames_submitted += 1
+            self.idle.clear()
+        self.loop.call_soon_threadsafe(self.frame_ready.set)
+
+    # Blocks until every submitted frame has been sent (or dropped); returns False on timeout
+    def wait_idle(self, timeout=None):
+        return self.idle.wait(timeout)
+
+    # Returns (frames submitted, frames sent, frames dropped, messages sent)
+    def statistics(self):
+        with self.lock:
+            return self.frames_submitted, self.frames_sent, self.frames_dropped, self.messages_sent
+
+    # Runs on the transport's loop
+    async def run(self):
+        transport = get_transport()
+        view = memoryview(self.buffer)
+        next_send = self.loop.time()
+        while True:
+            await self.frame_ready.wait()
+            self.frame_ready.clear()
+            with self.lock:
+                frame, self.pending = self.pending, None
+            if frame is None:
+                continue
+
+            for tile_index in range(self.tile_count):
+                offset = tile_index * _PACKET_SIZE
+                if hasattr(frame, "tobytes"):
+                    # A (tile_count, 64, 4) uint16 array, e.g. from TileProjection.project()
+                    self.buffer[offset + _COLORS_OFFSET:offset + _PACKET_SIZE] = frame[tile_index].astype("<u2").tobytes()
+                else:
+                    fields = list(chain.from_iterable(frame[tile_index][:TILE_COLORS])) if tile_index < len(frame) else []
+                    fields.extend([0] * ((TILE_COLORS * 4) - len(fields)))  # missing colours are off
+                    _TILE_COLORS.pack_into(self.buffer, offset + _COLORS_OFFSET, *fields)
+                self.buffer[offset + SEQ_NUM_OFFSET] = transport.next_seq_num(self.tilechain.mac_addr)
+
+            for tile_index in range(self.tile_count):
+                delay = next_send - self.loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                packet = view[tile_index * _PACKET_SIZE:(tile_index + 1) * _PACKET_SIZE]
+                if self.tilechain.ip_addr:
+                    transport.sendto(packet, (self.tilechain.ip_addr, self.tilechain.port))
+                else:
+                    for broadcast_addr in UDP_BROADCAST_TARGETS:
+                        transport.sendto(packet, broadcast_addr)
+                # No credit is built up while idle, so a new frame never arrives as a burst
+                next_send = max(next_send, self.loop.time()) + self.message_interval
+                with self.lock:
+                    self.messages_sent += 1
+
+            with self.lock:
+                self.frames_sent += 1
+                if self.pending is None:
+                    self.idle.set()
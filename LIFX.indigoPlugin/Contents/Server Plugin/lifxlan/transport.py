@@ -0,0 +1,213 @@
+# coding=utf-8
+# transport.py
+#
+# A single UDP endpoint shared by every Device and LifxLAN in the process, driven by
+# an asyncio event loop that runs on its own background thread.
+#
+# Each request is registered under (target MAC, sequence number) before it is sent;
+# sequence numbers roll over independently for each target MAC. The datagram protocol
+# hands every reply to the request waiting on that (MAC, sequence number), so any number
+# of requests to different devices can be in flight at once.
+#
+# Broadcast requests register under BROADCAST_MAC and receive every matching reply,
+# whichever device it comes from. So that a device's reply to a unicast request can't
+# be taken for a reply to a broadcast (or the other way round), unicast requests use
+# sequence numbers 0-127 and broadcasts 128-255.
+#
+# The *_async methods of Device, Light, etc. may be awaited from any event loop. The
+# blocking methods are thin wrappers that run the async version on the transport's
+# loop (see Transport.run()), so they must not be called from that loop itself.
+
+from socket import AF_INET, SOCK_DGRAM, SOL_SOCKET, SO_BROADCAST, SO_RCVBUF, SO_REUSEADDR, socket
+import asyncio
+import threading
+
+from .errors import WorkflowException
+from .message import BROADCAST_MAC
+from .unpack import unpack_lifx_message
+
+# Bytes of socket receive buffer asked for, so the near simultaneous replies of hundreds of devices to a broadcast
+# aren't dropped before they are read (the OS may grant less, e.g. Linux caps it at net.core.rmem_max)
+RECEIVE_BUFFER_SIZE = 1 << 20
+
+
+SEQ_NUM_COUNT = 128   # sequence numbers in each of the unicast and broadcast ranges
+BROADCAST_SEQ_NUM_BASE = 128
+
+
+# The sequence number after seq_num in mac_addr's range
+def next_seq_num_for(mac_addr, seq_num):
+    base = BROADCAST_SEQ_NUM_BASE if mac_addr == BROADCAST_MAC else 0
+    return base + ((seq_num + 1) % SEQ_NUM_COUNT)
+
+
+class PendingRequest(object):
+    def __init__(self, mac_addr, seq_num, source_id, response_types, loop):
+        self.mac_addr = mac_addr
+        self.seq_num = seq_num
+        self.source_id = source_id
+        self.response_types = response_types
+        self.loop = loop  # the loop awaiting the responses
+        self.responses = asyncio.Queue()
+
+    # called on the transport's loop
+    def deliver(self, response, ip_addr, transport_loop):
+        if response.source_id == self.source_id and type(response) in self.response_types:
+            if self.loop is transport_loop:
+                self.responses.put_nowait((response, ip_addr))
+            else:
+                self.loop.call_soon_threadsafe(self.responses.put_nowait, (response, ip_addr))
+
+    # returns (response, ip_addr), or (None, None) if nothing arrived within timeout_secs
+    async def get_response(self, timeout_secs):
+        try:
+            return await asyncio.wait_for(self.responses.get(), timeout_secs)
+        except asyncio.TimeoutError:
+            return None, None
+
+
+class LifxProtocol(asyncio.DatagramProtocol):
+    def __init__(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            response = unpack_lifx_message(data)
+        except Exception:
+            return  # not a LIFX packet
+        self.transport.route(response, addr[0])
+
+    def error_received(self, exc):
+        pass  # e.g. ICMP port unreachable; the request concerned just times out
+
+
+class Transport(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}    # (mac_addr, seq_num) -> PendingRequest
+        self.seq_nums = {}   # mac_addr -> last sequence number used
+        self.loop = None
+        self.thread = None
+        self.endpoint = None
+
+    ############################################################################
+    #                                                                          #
+    #                              Request Table                               #
+    #                                                                          #
+    ############################################################################
+
+    # Allocates the next free sequence number for mac_addr and starts routing its responses.
+    # Must be called from a coroutine; responses are delivered to that coroutine's loop.
+    def register(self, mac_addr, source_id, response_types):
+        self.open()
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            seq_num = self.seq_nums.get(mac_addr, 0)
+            for _ in range(SEQ_NUM_COUNT):
+                seq_num = next_seq_num_for(mac_addr, seq_num)
+                if (mac_addr, seq_num) not in self.pending:
+                    break
+            else:
+                raise WorkflowException("WorkflowException: too many requests in flight to {}".format(mac_addr))
+            self.seq_nums[mac_addr] = seq_num
+            request = PendingRequest(mac_addr, seq_num, source_id, response_types, loop)
+            self.pending[(mac_addr, seq_num)] = request
+        return request
+
+    def unregister(self, request):
+        with self.lock:
+            if self.pending.get((request.mac_addr, request.seq_num)) is request:
+                del self.pending[(request.mac_addr, request.seq_num)]
+
+    # Sequence number for a message nobody waits on (fire and forget)
+    def next_seq_num(self, mac_addr):
+        with self.lock:
+            seq_num = next_seq_num_for(mac_addr, self.seq_nums.get(mac_addr, 0))
+            self.seq_nums[mac_addr] = seq_num
+            return seq_num
+
+    # called on the transport's loop
+    def route(self, response, ip_addr):
+        seq_num = response.seq_num
+        with self.lock:
+            if seq_num >= BROADCAST_SEQ_NUM_BASE:
+                # A reply to a broadcast, whichever device it comes from
+                requests = [request for request in (self.pending.get((BROADCAST_MAC, seq_num)),) if request is not None]
+            elif response.target_addr == BROADCAST_MAC:
+                # Can't tell which device it came from: offer it to every unicast request waiting on this sequence number
+                requests = [request for key, request in self.pending.items() if key[1] == seq_num]
+            else:
+                requests = [request for request in (self.pending.get((response.target_addr, seq_num)),) if request is not None]
+        for request in requests:
+            request.deliver(response, ip_addr, self.loop)
+
+    ############################################################################
+    #                                                                          #
+    #                             Event Loop Methods                           #
+    #                                                                          #
+    ############################################################################
+
+    # Runs a coroutine on the transport's loop and blocks until it is done (the sync API)
+    def run(self, coro):
+        loop = self.open()
+        if threading.current_thread() is self.thread:
+            coro.close()
+            raise RuntimeError("blocking lifxlan calls can't be made from the transport's event loop, await the *_async method instead")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def sendto(self, packed_message, addr):
+        loop = self.open()
+        if threading.current_thread() is self.thread:
+            self.endpoint.sendto(packed_message, addr)
+        else:
+            loop.call_soon_threadsafe(self.endpoint.sendto, packed_message, addr)
+
+    def open(self):
+        if self.loop is not None:
+            return self.loop
+        with self.lock:
+            if self.loop is None:
+                sock = socket(AF_INET, SOCK_DGRAM)
+                sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+                sock.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
+                try:
+                    if sock.getsockopt(SOL_SOCKET, SO_RCVBUF) < RECEIVE_BUFFER_SIZE:
+                        sock.setsockopt(SOL_SOCKET, SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+                except OSError:
+                    pass  # keep the default buffer
+                try:
+                    sock.bind(("", 0))  # allow OS to assign next available source port
+                except Exception as err:
+                    sock.close()
+                    raise WorkflowException("WorkflowException: error {} while trying to open socket".format(str(err)))
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="lifxlan-transport")
+                thread.daemon = True
+                thread.start()
+                self.endpoint, _ = asyncio.run_coroutine_threadsafe(
+                    loop.create_datagram_endpoint(lambda: LifxProtocol(self), sock=sock), loop).result()
+                self.thread = thread
+                self.loop = loop
+            return self.loop
+
+    def close(self):
+        with self.lock:
+            loop, endpoint = self.loop, self.endpoint
+            self.loop = self.thread = self.endpoint = None
+        if loop is not None:
+            loop.call_soon_threadsafe(endpoint.close)
+            loop.call_soon_threadsafe(loop.stop)
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+# The process-wide transport, created on first use
+def get_transport():
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = Transport()
+    return _transport
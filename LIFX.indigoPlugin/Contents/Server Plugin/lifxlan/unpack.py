@@ -2,347 +2,256 @@
 # unpack.py
 # Author: Meghan Clark
 
-import binascii
 import struct
 
 from .message import HEADER_SIZE_BYTES, Message
 from .msgtypes import *
+from .pack import HEADER
+
+
+def _label(raw):
+    return bytes(raw).replace(b'\x00', b'').decode('utf-8')
+
+
+def _hsbk_list(values):
+    # flat (h, s, b, k, h, s, b, k, ...) -> [(h, s, b, k), ...]
+    it = iter(values)
+    return list(zip(it, it, it, it))
+
+
+##### PAYLOAD DECODERS #####
+# Each decoder sets the payload attributes of `msg` from the memoryview `payload` (which starts after the header).
+
+_SERVICE = struct.Struct("<BI")
+def _decode_state_service(msg, payload):
+    msg.service, msg.port = _SERVICE.unpack_from(payload)
+
+
+_INFO = struct.Struct("<fIIh")
+def _decode_state_info_signal(msg, payload):
+    msg.signal, msg.tx, msg.rx, msg.reserved1 = _INFO.unpack_from(payload)
+
+
+_FIRMWARE = struct.Struct("<QQI")
+def _decode_state_firmware(msg, payload):
+    msg.build, msg.reserved1, msg.version = _FIRMWARE.unpack_from(payload)
+
+
+_UINT16 = struct.Struct("<H")
+def _decode_power_level(msg, payload):
+    msg.power_level = _UINT16.unpack_from(payload)[0]
+
+
+def _decode_label(msg, payload):
+    msg.label = _label(payload[0:32])
+
+
+_VERSION = struct.Struct("<III")
+def _decode_state_version(msg, payload):
+    msg.vendor, msg.product, msg.version = _VERSION.unpack_from(payload)
+
+
+_TIMES = struct.Struct("<QQQ")
+def _decode_state_info(msg, payload):
+    msg.time, msg.uptime, msg.downtime = _TIMES.unpack_from(payload)
+
+
+_LOCATION_GROUP = struct.Struct("<16s32sQ")
+def _decode_state_location(msg, payload):
+    location, label, msg.updated_at = _LOCATION_GROUP.unpack_from(payload)
+    msg.location = list(location)
+    msg.label = _label(label)
+
+
+def _decode_state_group(msg, payload):
+    group, label, msg.updated_at = _LOCATION_GROUP.unpack_from(payload)
+    msg.group = list(group)
+    msg.label = _label(label)
+
+
+def _decode_echo(msg, payload):
+    msg.byte_array = list(payload)
+
+
+_SET_COLOR = struct.Struct("<x4HI")
+def _decode_light_set_color(msg, payload):
+    h, s, b, k, msg.duration = _SET_COLOR.unpack_from(payload)
+    msg.color = (h, s, b, k)
+
+
+_SET_WAVEFORM = struct.Struct("<xB4HIfhB")
+def _decode_light_set_waveform(msg, payload):
+    msg.transient, h, s, b, k, msg.period, msg.cycles, msg.duty_cycle, msg.waveform = _SET_WAVEFORM.unpack_from(payload)
+    msg.color = (h, s, b, k)
+
+
+_LIGHT_STATE = struct.Struct("<4HHH32sQ")
+def _decode_light_state(msg, payload):
+    h, s, b, k, msg.reserved1, msg.power_level, label, msg.reserved2 = _LIGHT_STATE.unpack_from(payload)
+    msg.color = (h, s, b, k)
+    msg.label = _label(label)
+
+
+_SET_POWER = struct.Struct("<HI")
+def _decode_light_set_power(msg, payload):
+    msg.power_level, msg.duration = _SET_POWER.unpack_from(payload)
+
+
+def _decode_infrared(msg, payload):
+    msg.infrared_brightness = _UINT16.unpack_from(payload)[0]
+
+
+_SET_COLOR_ZONES = struct.Struct("<BB4HIB")
+def _decode_multizone_set_color_zones(msg, payload):
+    msg.start_index, msg.end_index, h, s, b, k, msg.duration, msg.apply = _SET_COLOR_ZONES.unpack_from(payload)
+    msg.color = (h, s, b, k)
+
+
+_ZONE_INDEX = struct.Struct("<BB")
+def _decode_multizone_get_color_zones(msg, payload):
+    msg.start_index, msg.end_index = _ZONE_INDEX.unpack_from(payload)
+
+
+_STATE_ZONE = struct.Struct("<BB4H")
+def _decode_multizone_state_zone(msg, payload):
+    msg.count, msg.index, h, s, b, k = _STATE_ZONE.unpack_from(payload)
+    msg.color = (h, s, b, k)
+
+
+_STATE_MULTIZONE = struct.Struct("<BB32H")
+def _decode_multizone_state_multizone(msg, payload):
+    values = _STATE_MULTIZONE.unpack_from(payload)
+    msg.count = values[0]
+    msg.index = values[1]
+    msg.color = _hsbk_list(values[2:])
+
+
+_SET_EXTENDED_COLOR_ZONES = struct.Struct("<IBHB328H")
+def _decode_multizone_set_extended_color_zones(msg, payload):
+    values = _SET_EXTENDED_COLOR_ZONES.unpack_from(payload)
+    msg.duration, msg.apply, msg.zone_index, msg.colors_count = values[0:4]
+    msg.colors = _hsbk_list(values[4:])
+
+
+_STATE_EXTENDED_COLOR_ZONES = struct.Struct("<HHB328H")
+def _decode_multizone_state_extended_color_zones(msg, payload):
+    values = _STATE_EXTENDED_COLOR_ZONES.unpack_from(payload)
+    msg.count, msg.index, msg.colors_count = values[0:3]
+    msg.colors = _hsbk_list(values[3:])
+
+
+_UINT8 = struct.Struct("<B")
+_TILE_DEVICE = struct.Struct("<hhhhffBBBIIIQQII")
+_TILE_DEVICE_FIELDS = ("reserved1", "reserved2", "reserved3", "reserved4", "user_x", "user_y", "width", "height", "reserved5",
+                       "device_version_vendor", "device_version_product", "device_version_version",
+                       "firmware_build", "reserved6", "firmware_version", "reserved7")
+def _decode_state_device_chain(msg, payload):
+    msg.start_index = _UINT8.unpack_from(payload)[0]
+    msg.tile_devices = [dict(zip(_TILE_DEVICE_FIELDS, values)) for values in _TILE_DEVICE.iter_unpack(payload[1:1 + (16 * _TILE_DEVICE.size)])]
+    msg.total_count = _UINT8.unpack_from(payload, 1 + (16 * _TILE_DEVICE.size))[0]
+
+
+_SET_USER_POSITION = struct.Struct("<BHff")
+def _decode_set_user_position(msg, payload):
+    msg.tile_index, msg.reserved, msg.user_x, msg.user_y = _SET_USER_POSITION.unpack_from(payload)
+
+
+_GET_TILE_STATE = struct.Struct("<BBBBBB")
+def _decode_get_tile_state64(msg, payload):
+    msg.tile_index, msg.length, msg.reserved, msg.x, msg.y, msg.width = _GET_TILE_STATE.unpack_from(payload)
+
+
+_STATE_TILE_STATE = struct.Struct("<BBBBB256H")
+def _decode_state_tile_state64(msg, payload):
+    values = _STATE_TILE_STATE.unpack_from(payload)
+    msg.tile_index, msg.reserved, msg.x, msg.y, msg.width = values[0:5]
+    msg.colors = _hsbk_list(values[5:])
+
+
+_SET_TILE_STATE = struct.Struct("<BBBBBBI256H")
+def _decode_set_tile_state64(msg, payload):
+    values = _SET_TILE_STATE.unpack_from(payload)
+    msg.tile_index, msg.length, msg.reserved, msg.x, msg.y, msg.width, msg.duration = values[0:7]
+    msg.colors = _hsbk_list(values[7:])
+
+
+# message type -> (Message subclass, payload decoder or None if there is no payload)
+PAYLOAD_DECODERS = {MSG_IDS[cls]: (cls, decoder) for cls, decoder in [
+    (GetService, None),
+    (StateService, _decode_state_service),
+    (GetHostInfo, None),
+    (StateHostInfo, _decode_state_info_signal),
+    (GetHostFirmware, None),
+    (StateHostFirmware, _decode_state_firmware),
+    (GetWifiInfo, None),
+    (StateWifiInfo, _decode_state_info_signal),
+    (GetWifiFirmware, None),
+    (StateWifiFirmware, _decode_state_firmware),
+    (GetPower, None),
+    (SetPower, _decode_power_level),
+    (StatePower, _decode_power_level),
+    (GetLabel, None),
+    (SetLabel, _decode_label),
+    (StateLabel, _decode_label),
+    (GetLocation, None),
+    (StateLocation, _decode_state_location),
+    (GetGroup, None),
+    (StateGroup, _decode_state_group),
+    (GetVersion, None),
+    (StateVersion, _decode_state_version),
+    (GetInfo, None),
+    (StateInfo, _decode_state_info),
+    (Acknowledgement, None),
+    (EchoRequest, _decode_echo),
+    (EchoResponse, _decode_echo),
+    (LightGet, None),
+    (LightSetColor, _decode_light_set_color),
+    (LightSetWaveform, _decode_light_set_waveform),
+    (LightState, _decode_light_state),
+    (LightGetPower, None),
+    (LightSetPower, _decode_light_set_power),
+    (LightStatePower, _decode_power_level),
+    (LightGetInfrared, None),
+    (LightStateInfrared, _decode_infrared),
+    (LightSetInfrared, _decode_infrared),
+    (MultiZoneSetColorZones, _decode_multizone_set_color_zones),
+    (MultiZoneGetColorZones, _decode_multizone_get_color_zones),
+    (MultiZoneStateZone, _decode_multizone_state_zone),
+    (MultiZoneStateMultiZone, _decode_multizone_state_multizone),
+    (MultiZoneSetExtendedColorZones, _decode_multizone_set_extended_color_zones),
+    (MultiZoneGetExtendedColorZones, None),
+    (MultiZoneStateExtendedColorZones, _decode_multizone_state_extended_color_zones),
+    (GetDeviceChain, None),
+    (StateDeviceChain, _decode_state_device_chain),
+    (SetUserPosition, _decode_set_user_position),
+    (GetTileState64, _decode_get_tile_state64),
+    (StateTileState64, _decode_state_tile_state64),
+    (SetTileState64, _decode_set_tile_state64),
+]}
 
 
 # Creates a LIFX Message out of packed binary data
 # If the message type is not one of the officially released ones above, it will create just a Message out of it
 # If it's not in the LIFX protocol format, uhhhhh...we'll put that on a to-do list.
+#
+# The message is built straight from the received bytes and keeps them as its packed_message: it is never
+# re-encoded, and its payload_fields are only filled in if it is described (e.g. logged with str()).
 def unpack_lifx_message(packed_message):
-    header_str = packed_message[0:HEADER_SIZE_BYTES]
-    payload_str = packed_message[HEADER_SIZE_BYTES:]
-
-    size = struct.unpack("<H", header_str[0:2])[0]
-    flags = struct.unpack("<H", header_str[2:4])[0]
-    origin = (flags >> 14) & 3
-    tagged = (flags >> 13) & 1
-    addressable = (flags >> 12) & 1
-    protocol = flags & 4095
-    source_id = struct.unpack("<I", header_str[4:8])[0]
-    target_addr = ":".join([('%02x' % b) for b in struct.unpack("<" + ("B"*6), header_str[8:14])])
-    response_flags = struct.unpack("<B", header_str[22:23])[0]
-    ack_requested = response_flags & 2
-    response_requested = response_flags & 1
-    seq_num = struct.unpack("<B", header_str[23:24])[0]
-    message_type = struct.unpack("<H", header_str[32:34])[0]
-
-    message = None
-    if message_type == MSG_IDS[GetService]:
-        message = GetService(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[StateService]:
-        service = struct.unpack("<B", payload_str[0:1])[0]
-        port = struct.unpack("<I", payload_str[1:5])[0]
-        payload = {"service": service, "port": port}
-        message = StateService(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[GetHostInfo]:
-        message = GetHostInfo(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[StateHostInfo]:
-        signal = struct.unpack("<f", payload_str[0:4])[0]
-        tx = struct.unpack("<I", payload_str[4:8])[0]
-        rx = struct.unpack("<I", payload_str[8:12])[0]
-        reserved1 = struct.unpack("<h", payload_str[12:14])[0]
-        payload = {"signal": signal, "tx": tx, "rx": rx, "reserved1": reserved1}
-        message = StateHostInfo(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[GetHostFirmware]:
-        message = GetHostFirmware(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[StateHostFirmware]:
-        build = struct.unpack("<Q", payload_str[0:8])[0]
-        reserved1 = struct.unpack("<Q", payload_str[8:16])[0]
-        version = struct.unpack("<I", payload_str[16:20])[0]
-        payload = {"build": build, "reserved1": reserved1, "version": version}
-        message = StateHostFirmware(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[GetWifiInfo]:
-        message = GetWifiInfo(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[StateWifiInfo]:
-        signal = struct.unpack("<f", payload_str[0:4])[0]
-        tx = struct.unpack("<I", payload_str[4:8])[0]
-        rx = struct.unpack("<I", payload_str[8:12])[0]
-        reserved1 = struct.unpack("<h", payload_str[12:14])[0]
-        payload = {"signal": signal, "tx": tx, "rx": rx, "reserved1": reserved1}
-        message = StateWifiInfo(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[GetWifiFirmware]:
-        message = GetWifiFirmware(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[StateWifiFirmware]:
-        build = struct.unpack("<Q", payload_str[0:8])[0]
-        reserved1 = struct.unpack("<Q", payload_str[8:16])[0]
-        version = struct.unpack("<I", payload_str[16:20])[0]
-        payload = {"build": build, "reserved1": reserved1, "version": version}
-        message = StateWifiFirmware(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[GetPower]:
-        message = GetPower(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[SetPower]:
-        power_level = struct.unpack("<H", payload_str[0:2])[0]
-        payload = {"power_level": power_level}
-        message = SetPower(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[StatePower]:
-        power_level = struct.unpack("<H", payload_str[0:2])[0]
-        payload = {"power_level": power_level}
-        message = StatePower(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[GetLabel]:
-        message = GetLabel(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[SetLabel]:
-        label = binascii.unhexlify("".join(["%2.2x" % (b & 0x000000ff) for b in struct.unpack("<" + ("b"*32), payload_str[0:32])])).replace(b'\x00', b'')
-        label = label.decode('utf-8')
-        payload = {"label": label}
-        message = SetLabel(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[StateLabel]:
-        label = binascii.unhexlify("".join(["%2.2x" % (b & 0x000000ff) for b in struct.unpack("<" + ("b"*32), payload_str[0:32])])).replace(b'\x00', b'')
-        label = label.decode('utf-8')
-        payload = {"label": label}
-        message = StateLabel(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[GetLocation]:
-        message = GetLocation(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[StateLocation]:
-        location = [b for b in struct.unpack("<" + ("B"*16), payload_str[0:16])]
-        label = binascii.unhexlify("".join(["%2.2x" % (b & 0x000000ff) for b in struct.unpack("<" + ("b"*32), payload_str[16:48])])).replace(b'\x00', b'')
-        label = label.decode('utf-8')
-        updated_at = struct.unpack("<Q", payload_str[48:56])[0]
-        payload = {"location": location, "label": label, "updated_at": updated_at}
-        message = StateLocation(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[GetGroup]:
-        message = GetGroup(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[StateGroup]:
-        group = [b for b in struct.unpack("<" + ("B"*16), payload_str[0:16])]
-        label = binascii.unhexlify("".join(["%2.2x" % (b & 0x000000ff) for b in struct.unpack("<" + ("b"*32), payload_str[16:48])])).replace(b'\x00', b'')
-        label = label.decode('utf-8')
-        updated_at = struct.unpack("<Q", payload_str[48:56])[0]
-        payload = {"group": group, "label": label, "updated_at": updated_at}
-        message = StateGroup(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[GetVersion]:
-        message = GetVersion(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[StateVersion]:
-        vendor = struct.unpack("<I", payload_str[0:4])[0]
-        product = struct.unpack("<I", payload_str[4:8])[0]
-        version = struct.unpack("<I", payload_str[8:12])[0]
-        payload = {"vendor": vendor, "product": product, "version": version}
-        message = StateVersion(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[GetInfo]:
-        message = GetInfo(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[StateInfo]:
-        time = struct.unpack("<Q", payload_str[0:8])[0]
-        uptime = struct.unpack("<Q", payload_str[8:16])[0]
-        downtime = struct.unpack("<Q", payload_str[16:24])[0]
-        payload = {"time": time, "uptime": uptime, "downtime": downtime}
-        message = StateInfo(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[Acknowledgement]:
-        message = Acknowledgement(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[EchoRequest]:
-        byte_array_len = len(payload_str)
-        byte_array = [b for b in struct.unpack("<" + ("B"*byte_array_len), payload_str[0:byte_array_len])]
-        payload = {"byte_array": byte_array}
-        message = EchoRequest(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[EchoResponse]:
-        byte_array_len = len(payload_str)
-        byte_array = [b for b in struct.unpack("<" + ("B"*byte_array_len), payload_str[0:byte_array_len])]
-        payload = {"byte_array": byte_array}
-        message = EchoResponse(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[LightGet]:
-        message = LightGet(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[LightSetColor]:
-        reserved = struct.unpack("<B", payload_str[0:1])[0]
-        color = struct.unpack("<" + ("H"*4), payload_str[1:9])
-        duration = struct.unpack("<I", payload_str[9:13])[0]
-        payload = {"color": color, "duration": duration}
-        message = LightSetColor(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[LightState]:
-        color = struct.unpack("<" + ("H"*4), payload_str[0:8])
-        reserved1 = struct.unpack("<H", payload_str[8:10])[0]
-        power_level = struct.unpack("<H", payload_str[10:12])[0]
-        label = binascii.unhexlify("".join(["%2.2x" % (b & 0x000000ff) for b in struct.unpack("<" + ("b"*32), payload_str[12:44])])).replace(b'\x00', b'')
-        label = label.decode('utf-8')
-        reserved2 = struct.unpack("<Q", payload_str[44:52])[0]
-        payload = {"color": color, "reserved1": reserved1, "power_level": power_level, "label": label, "reserved2": reserved2}
-        message = LightState(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[LightGetPower]:
-        message = LightGetPower(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[LightSetPower]:
-        power_level = struct.unpack("<H", payload_str[0:2])[0]
-        duration = struct.unpack("<I", payload_str[2:6])[0]
-        payload = {"power_level": power_level, "duration": duration}
-        message = LightSetPower(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[LightStatePower]:
-        power_level = struct.unpack("<H", payload_str[0:2])[0]
-        payload = {"power_level": power_level}
-        message = LightStatePower(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[LightGetInfrared]:  # 120
-        message = LightGetInfrared(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[LightStateInfrared]:  # 121
-        infrared_brightness = struct.unpack("<H", payload_str[0:2])[0]
-        payload = {"infrared_brightness": infrared_brightness}
-        message = LightStateInfrared(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[LightSetInfrared]:  # 122
-        infrared_brightness = struct.unpack("<H", payload_str[0:2])[0]
-        payload = {"infrared_brightness": infrared_brightness}
-        message = LightSetInfrared(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[MultiZoneSetColorZones]: #501
-        start_index = struct.unpack("<c", payload_str[0:1])[0]
-        start_index = ord(start_index) # 8 bit
-        end_index = struct.unpack("<c", payload_str[1:2])[0]
-        end_index = ord(end_index) #8 bit
-        color = struct.unpack("<" + ("H" * 4), payload_str[2:10])
-        duration = struct.unpack("<I", payload_str[10:14])[0]
-        apply = struct.unpack("<c", payload_str[14:15])[0]
-        apply = ord(apply) #8 bit
-        payload = {"start_index": start_index, "end_index": end_index, "color": color, "duration": duration, "apply": apply}
-        message = MultiZoneSetColorZones(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[MultiZoneGetColorZones]: #502
-        start_index = struct.unpack("<c", payload_str[0:1])[0]
-        start_index = ord(start_index) # 8 bit
-        end_index = struct.unpack("<c", payload_str[1:2])[0]
-        end_index = ord(end_index) #8 bit
-        payload = {"start_index": start_index, "end_index": end_index}
-        message = MultiZoneGetColorZones(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[MultiZoneStateZone]: #503
-        count = struct.unpack("<c", payload_str[0:1])[0]
-        count = ord(count) # 8 bit
-        index = struct.unpack("<c", payload_str[1:2])[0]
-        index = ord(index) #8 bit
-        color = struct.unpack("<" + ("H" * 4), payload_str[2:10])
-        payload = {"count": count, "index": index, "color": color}
-        message = MultiZoneStateZone(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[MultiZoneStateMultiZone]: #506
-        count = struct.unpack("<c", payload_str[0:1])[0]
-        count = ord(count) # 8 bit
-        index = struct.unpack("<c", payload_str[1:2])[0]
-        index = ord(index) #8 bit
-        colors = []
-        for i in range(8):
-            color = struct.unpack("<" + ("H" * 4), payload_str[2+(i*8):10+(i*8)])
-            colors.append(color)
-        payload = {"count": count, "index": index, "color": colors}
-        message = MultiZoneStateMultiZone(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[GetDeviceChain]: #701
-        message = GetDeviceChain(target_addr, source_id, seq_num, {}, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[StateDeviceChain]: #702
-        start_index = struct.unpack("<B", payload_str[0:1])[0]
-        tile_devices = []
-        tilesize_bytes = 55
-        for i in range(16):
-            offset = (i * tilesize_bytes)
-            tile = {"reserved1": struct.unpack("<h", payload_str[1+offset:3+offset])[0],
-                    "reserved2": struct.unpack("<h", payload_str[3+offset:5+offset])[0],
-                    "reserved3": struct.unpack("<h", payload_str[5+offset:7+offset])[0],
-                    "reserved4": struct.unpack("<h", payload_str[7+offset:9+offset])[0],
-                    "user_x": struct.unpack("<f", payload_str[9+offset:13+offset])[0],
-                    "user_y": struct.unpack("<f", payload_str[13+offset:17+offset])[0],
-                    "width": struct.unpack("<B", payload_str[17+offset:18+offset])[0],
-                    "height": struct.unpack("<B", payload_str[18+offset:19+offset])[0],
-                    "reserved5": struct.unpack("<B", payload_str[19+offset:20+offset])[0],
-                    "device_version_vendor": struct.unpack("<I", payload_str[20+offset:24+offset])[0],
-                    "device_version_product": struct.unpack("<I", payload_str[24+offset:28+offset])[0],
-                    "device_version_version": struct.unpack("<I", payload_str[28+offset:32+offset])[0],
-                    "firmware_build": struct.unpack("<Q", payload_str[32+offset:40+offset])[0],
-                    "reserved6": struct.unpack("<Q", payload_str[40+offset:48+offset])[0],
-                    "firmware_version": struct.unpack("<I", payload_str[48+offset:52+offset])[0],
-                    "reserved7": struct.unpack("<I", payload_str[52+offset:56+offset])[0]}
-            tile_devices.append(tile)
-        total_count = struct.unpack("<B", payload_str[881:882])[0]
-        payload = {"start_index": start_index, "total_count": total_count, "tile_devices": tile_devices}
-        message = StateDeviceChain(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[SetUserPosition]: #703
-        tile_index = struct.unpack("<B", payload_str[0:1])[0]
-        reserved = struct.unpack("<H", payload_str[1:3])[0]
-        user_x = struct.unpack("<f", payload_str[3:7])[0]
-        user_y = struct.unpack("<f", payload_str[7:11])[0]
-        payload = {"tile_index": tile_index, "reserved": reserved, "user_x": user_x, "user_y": user_y}
-        message = SetUserPosition(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[GetTileState64]: #707
-        tile_index = struct.unpack("<B", payload_str[0:1])[0]
-        length = struct.unpack("<B", payload_str[1:2])[0]
-        reserved = struct.unpack("<B", payload_str[2:3])[0]
-        x = struct.unpack("<B", payload_str[3:4])[0]
-        y = struct.unpack("<B", payload_str[4:5])[0]
-        width = struct.unpack("<B", payload_str[5:6])[0]
-        payload = {"tile_index": tile_index, "length": length, "reserved": reserved, "x": x, "y": y, "width": width}
-        message = GetTileState64(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[StateTileState64]: #711
-        tile_index = struct.unpack("<B", payload_str[0:1])[0]
-        reserved = struct.unpack("<B", payload_str[1:2])[0]
-        x = struct.unpack("<B", payload_str[2:3])[0]
-        y = struct.unpack("<B", payload_str[3:4])[0]
-        width = struct.unpack("<B", payload_str[4:5])[0]
-        colors = []
-        for i in range(64):
-            color = struct.unpack("<" + ("H" * 4), payload_str[5+(i*8):13+(i*8)])
-            colors.append(color)
-        payload = {"tile_index": tile_index, "reserved": reserved, "x": x, "y": y, "width": width, "colors": colors}
-        message = StateTileState64(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-    elif message_type == MSG_IDS[SetTileState64]: #715
-        tile_index = struct.unpack("<B", payload_str[0:1])[0]
-        length = struct.unpack("<B", payload_str[1:2])[0]
-        reserved = struct.unpack("<B", payload_str[2:3])[0]
-        x = struct.unpack("<B", payload_str[3:4])[0]
-        y = struct.unpack("<B", payload_str[4:5])[0]
-        width = struct.unpack("<B", payload_str[5:6])[0]
-        duration = struct.unpack("<I", payload_str[6:10])[0]
-        colors = []
-        for i in range(64):
-            color = struct.unpack("<" + ("H" * 4), payload_str[10+(i*8):18+(i*8)])
-            colors.append(color)
-        payload = {"tile_index": tile_index, "length": length, "reserved": reserved, "x": x, "y": y, "width": width, "duration": duration, "colors": colors}
-        message = SetTileState64(target_addr, source_id, seq_num, payload, ack_requested, response_requested)
-
-
-    else:
-        message = Message(message_type, target_addr, source_id, seq_num, ack_requested, response_requested)
+    view = memoryview(packed_message)
+    size, flags, source_id, target, response_flags, seq_num, message_type = HEADER.unpack_from(view)
+    target_addr = target.hex(":")
+
+    cls, decoder = PAYLOAD_DECODERS.get(message_type, (Message, None))
+    message = cls.__new__(cls)
+    message.set_header_fields(message_type, target_addr, source_id, seq_num, response_flags & 2, response_flags & 1)
+    if decoder is not None:
+        decoder(message, view[HEADER_SIZE_BYTES:])
 
     message.size = size
-    message.origin = origin
-    message.tagged = tagged
-    message.addressable = addressable
-    message.protocol = protocol
-    message.source_id = source_id
-    message.header = header_str
-    message.payload = payload_str
+    message.origin = (flags >> 14) & 3
+    message.tagged = (flags >> 13) & 1
+    message.addressable = (flags >> 12) & 1
+    message.protocol = flags & 4095
     message.packed_message = packed_message
 
     return message
@@ -21,6 +21,8 @@ except ImportError:
 
 # ============================== Plugin Imports ===============================
 from constants import *
+from discovery import lifx_light
+from dispatcher import CommandDispatcher
 from lifxlan.lifxlan import *
 
 
@@ -99,6 +101,8 @@ class ThreadLifxlanHandler(threading.Thread):
 
         self.lifxlan = None
 
+        self.dispatcher = CommandDispatcher(self.process_command, LIFXLAN_HANDLER_WORKER_THREADS)
+
     def __del__(self):
 
         indigo.PluginBase.__del__(self)
@@ -120,6 +124,9 @@ class ThreadLifxlanHandler(threading.Thread):
 
             self.lh_logger.debug("LIFXLAN Handler Thread initialised")
 
+            # Commands are run on a pool of worker threads, one command per device at a time (see dispatcher.py)
+            self.dispatcher.start()
+
             while not self.thread_stop.is_set():
                 try:
                     lifx_queued_entry = self.globals[K_QUEUES][K_LIFXLAN_HANDLER][K_QUEUE].get(True, 5)
@@ -132,13 +139,6 @@ class ThreadLifxlanHandler(threading.Thread):
 
                     lifx_queue_priority, lifx_command, dev_id, lifx_command_arguments = lifx_queued_entry
 
-                    # Debug info to log
-                    if dev_id is not None:
-                        debug_dev_info = f"for device '{indigo.devices[dev_id].name}' "
-                    else:
-                        debug_dev_info = ""
-                    self.lh_logger.debug(f"Dequeued lifxlanHandler Command '{CMD_TRANSLATION[lifx_command]}' {debug_dev_info} to process with priority: {lifx_queue_priority}")
-
                     if lifx_command == CMD_STOP_THREAD:
                         break  # Exit While loop and quit thread
 
@@ -147,124 +147,140 @@ class ThreadLifxlanHandler(threading.Thread):
                         pass
                         continue  # Loop back to process next entry off the queue
 
-                    dev = indigo.devices[dev_id]
+                    self.dispatcher.dispatch(lifx_queued_entry)
 
-                    if not dev.enabled:
-                        indigo.devices[dev_id].updateStateOnServer(key="brightnessLevel",
-                                                                   value=0,
-                                                                   uiValue=u'not enabled',
-                                                                   clearErrorState=True)
-                        continue  # Loop back to process next entry off the queue
+                except queue.Empty:
+                    pass
+                except Exception as exception_error:
+                    self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-                    if K_LIFX_COMMAND_CURRENT not in self.globals[K_LIFX][dev_id]:
-                        self.globals[K_LIFX][dev_id][K_LIFX_COMMAND_CURRENT] = ""
-                    self.globals[K_LIFX][dev_id][K_LIFX_COMMAND_PREVIOUS] = self.globals[K_LIFX][dev_id][K_LIFX_COMMAND_CURRENT]
-                    self.globals[K_LIFX][dev_id][K_LIFX_COMMAND_CURRENT] = lifx_command
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-                    if K_LIFX_DEVICE not in self.globals[K_LIFX][dev_id]:
-                        self.lh_logger.debug(f"Indigo LIFX device '{dev.name}' not yet set-up")
-                        return
+        self.dispatcher.stop()
+
+        self.lh_logger.debug("LIFX Send Receive Message Thread ended.")
 
-                    if self.globals[K_LIFX][dev_id][K_LIFX_DEVICE] is None:
-                        # self.globals[K_LIFX][dev_id][K_NO_ACK_STATE] = True
-                        # dev.updateStateOnServer(key="no_ack_state",
-                        #                         value=self.globals[K_LIFX][dev_id][K_NO_ACK_STATE],
-                        #                         clearErrorState=True)
-                        self.globals[K_LIFX][dev_id][K_CONNECTED] = False
-                        dev.updateStateOnServer(key="connected",
-                                                value=False,
-                                                clearErrorState=True)
-                        self.handle_no_ack_status(dev)
+    def process_command(self, lifx_queued_entry):
+        # Invoked by a dispatcher worker thread for each command dequeued for a device
+        try:
+            lifx_queue_priority, lifx_command, dev_id, lifx_command_arguments = lifx_queued_entry
+
+            dev = indigo.devices[dev_id]
+
+            # Debug info to log
+            self.lh_logger.debug(f"Dequeued lifxlanHandler Command '{CMD_TRANSLATION[lifx_command]}' for device '{dev.name}' to process with priority: {lifx_queue_priority}")
+
+            if not dev.enabled:
+                indigo.devices[dev_id].updateStateOnServer(key="brightnessLevel",
+                                                           value=0,
+                                                           uiValue=u'not enabled',
+                                                           clearErrorState=True)
+                return
+
+            if K_LIFX_COMMAND_CURRENT not in self.globals[K_LIFX][dev_id]:
+                self.globals[K_LIFX][dev_id][K_LIFX_COMMAND_CURRENT] = ""
+            self.globals[K_LIFX][dev_id][K_LIFX_COMMAND_PREVIOUS] = self.globals[K_LIFX][dev_id][K_LIFX_COMMAND_CURRENT]
+            self.globals[K_LIFX][dev_id][K_LIFX_COMMAND_CURRENT] = lifx_command
+
+            if K_LIFX_DEVICE not in self.globals[K_LIFX][dev_id]:
+                self.lh_logger.debug(f"Indigo LIFX device '{dev.name}' not yet set-up")
+                return
+
+            if self.globals[K_LIFX][dev_id][K_LIFX_DEVICE] is None:
+                # self.globals[K_LIFX][dev_id][K_NO_ACK_STATE] = True
+                # dev.updateStateOnServer(key="no_ack_state",
+                #                         value=self.globals[K_LIFX][dev_id][K_NO_ACK_STATE],
+                #                         clearErrorState=True)
+                self.globals[K_LIFX][dev_id][K_CONNECTED] = False
+                dev.updateStateOnServer(key="connected",
+                                        value=False,
+                                        clearErrorState=True)
+                self.handle_no_ack_status(dev)
 
-                    dev = indigo.devices[dev_id]
+            dev = indigo.devices[dev_id]
 
-                    if lifx_command == CMD_STATUS or lifx_command == CMD_POLLING_STATUS or lifx_command == CMD_RECOVERY_STATUS:
-                        self.process_status(lifx_command, dev)
-                        continue
+            if lifx_command == CMD_STATUS or lifx_command == CMD_POLLING_STATUS or lifx_command == CMD_RECOVERY_STATUS:
+                self.process_status(lifx_command, dev, lifx_command_arguments)
+                return
 
-                    if not self.globals[K_LIFX][dev_id][K_CONNECTED]:  # Ignore following commands if lamp not connected
-                        continue
+            if not self.globals[K_LIFX][dev_id][K_CONNECTED]:  # Ignore following commands if lamp not connected
+                return
 
-                    # At this point the device is confirmed to be connected - so now process commands
+            # At this point the device is confirmed to be connected - so now process commands
 
-                    if (lifx_command == CMD_ON) or \
-                            (lifx_command == CMD_OFF) or \
-                            (lifx_command == CMD_WAVEFORM_OFF) or \
-                            (lifx_command == CMD_IMMEDIATE_ON):
-                        self.process_on_off(lifx_command, dev)
+            if (lifx_command == CMD_ON) or \
+                    (lifx_command == CMD_OFF) or \
+                    (lifx_command == CMD_WAVEFORM_OFF) or \
+                    (lifx_command == CMD_IMMEDIATE_ON):
+                self.process_on_off(lifx_command, dev)
 
-                    elif (lifx_command == CMD_INFRARED_ON) or \
-                            (lifx_command == CMD_INFRARED_OFF) or \
-                            (lifx_command == CMD_INFRARED_SET):
-                        self.process_infrared(lifx_command, dev, lifx_command_arguments)
+            elif (lifx_command == CMD_INFRARED_ON) or \
+                    (lifx_command == CMD_INFRARED_OFF) or \
+                    (lifx_command == CMD_INFRARED_SET):
+                self.process_infrared(lifx_command, dev, lifx_command_arguments)
 
-                    elif lifx_command == CMD_STOP_BRIGHTEN_DIM_BY_TIMER:
-                        self.globals[K_LIFX][dev_id][K_STOP_REPEAT_BRIGHTEN] = True
-                        self.globals[K_LIFX][dev_id][K_STOP_REPEAT_DIM] = True
-                        self.clear_brighten_by_timer_timer(dev)
-                        self.clear_dim_by_timer_timer(dev)
+            elif lifx_command == CMD_STOP_BRIGHTEN_DIM_BY_TIMER:
+                self.globals[K_LIFX][dev_id][K_STOP_REPEAT_BRIGHTEN] = True
+                self.globals[K_LIFX][dev_id][K_STOP_REPEAT_DIM] = True
+                self.clear_brighten_by_timer_timer(dev)
+                self.clear_dim_by_timer_timer(dev)
 
-                    elif lifx_command == CMD_BRIGHTEN_BY_TIMER or lifx_command == CMD_REPEAT_BRIGHTEN_BY_TIMER:
-                        self.process_brighten_by_timer(lifx_command, dev, lifx_command_arguments)
+            elif lifx_command == CMD_BRIGHTEN_BY_TIMER or lifx_command == CMD_REPEAT_BRIGHTEN_BY_TIMER:
+                self.process_brighten_by_timer(lifx_command, dev, lifx_command_arguments)
 
-                    elif lifx_command == CMD_DIM_BY_TIMER or lifx_command == CMD_REPEAT_DIM_BY_TIMER:
-                        self.process_dim_by_timer(lifx_command, dev, lifx_command_arguments)
+            elif lifx_command == CMD_DIM_BY_TIMER or lifx_command == CMD_REPEAT_DIM_BY_TIMER:
+                self.process_dim_by_timer(lifx_command, dev, lifx_command_arguments)
 
-                    elif lifx_command == CMD_DIM or lifx_command == CMD_BRIGHTEN or lifx_command == CMD_BRIGHTNESS:
-                        self.process_dim_brighten_brightness(lifx_command, dev, lifx_command_arguments)
+            elif lifx_command == CMD_DIM or lifx_command == CMD_BRIGHTEN or lifx_command == CMD_BRIGHTNESS:
+                self.process_dim_brighten_brightness(lifx_command, dev, lifx_command_arguments)
 
-                    elif lifx_command == CMD_WHITE:
-                        self.process_white(lifx_command, dev, lifx_command_arguments)
+            elif lifx_command == CMD_WHITE:
+                self.process_white(lifx_command, dev, lifx_command_arguments)
 
-                    elif lifx_command == CMD_COLOR:
-                        self.process_color(lifx_command, dev, lifx_command_arguments)
+            elif lifx_command == CMD_COLOR:
+                self.process_color(lifx_command, dev, lifx_command_arguments)
 
-                    elif lifx_command == CMD_STANDARD:
-                        self.process_standard(lifx_command, dev, lifx_command_arguments)
+            elif lifx_command == CMD_STANDARD:
+                self.process_standard(lifx_command, dev, lifx_command_arguments)
 
-                    elif lifx_command == CMD_WAVEFORM:
-                        self.process_waveform(lifx_command, dev, lifx_command_arguments)
+            elif lifx_command == CMD_WAVEFORM:
+                self.process_waveform(lifx_command, dev, lifx_command_arguments)
 
-                    elif lifx_command == CMD_SET_LABEL:
-                        self.process_set_label(lifx_command, dev)
+            elif lifx_command == CMD_SET_LABEL:
+                self.process_set_label(lifx_command, dev)
 
-                    # elif lifx_command == CMD_GET_VERSION:
-                    #     self.process_get_version(lifx_command, dev)
+            # elif lifx_command == CMD_GET_VERSION:
+            #     self.process_get_version(lifx_command, dev)
 
-                    elif lifx_command == CMD_GET_HOST_FIRMWARE:
-                        self.process_get_host_firmware(lifx_command, dev)
+            elif lifx_command == CMD_GET_HOST_FIRMWARE:
+                self.process_get_host_firmware(lifx_command, dev)
 
-                    elif lifx_command == CMD_GET_PORT:
-                        self.process_get_port(lifx_command, dev)
+            elif lifx_command == CMD_GET_PORT:
+                self.process_get_port(lifx_command, dev)
 
-                    elif lifx_command == CMD_GET_WIFI_FIRMWARE:
-                        self.process_get_wifi_firmware(lifx_command, dev, lifx_command_arguments)
+            elif lifx_command == CMD_GET_WIFI_FIRMWARE:
+                self.process_get_wifi_firmware(lifx_command, dev, lifx_command_arguments)
 
-                    elif lifx_command == CMD_GET_WIFI_INFO:
-                        self.process_get_wifi_info(lifx_command, dev)
+            elif lifx_command == CMD_GET_WIFI_INFO:
+                self.process_get_wifi_info(lifx_command, dev)
 
-                    elif lifx_command == CMD_GET_HOST_INFO:
-                        self.process_get_host_info(lifx_command, dev, lifx_command_arguments)
+            elif lifx_command == CMD_GET_HOST_INFO:
+                self.process_get_host_info(lifx_command, dev, lifx_command_arguments)
 
-                    elif lifx_command == CMD_GET_LOCATION:
-                        self.process_get_location(lifx_command, dev, lifx_command_arguments)
+            elif lifx_command == CMD_GET_LOCATION:
+                self.process_get_location(lifx_command, dev, lifx_command_arguments)
 
-                    elif lifx_command == CMD_GET_GROUP:
-                        self.process_get_group(lifx_command, dev, lifx_command_arguments)
+            elif lifx_command == CMD_GET_GROUP:
+                self.process_get_group(lifx_command, dev, lifx_command_arguments)
 
-                    elif lifx_command == CMD_GET_INFO:
-                        self.process_get_info(lifx_command, dev, lifx_command_arguments)
+            elif lifx_command == CMD_GET_INFO:
+                self.process_get_info(lifx_command, dev, lifx_command_arguments)
 
-                except queue.Empty:
-                    pass
-                except Exception as exception_error:
-                    self.exception_handler(exception_error, True)  # Log error and display failing statement
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-        self.lh_logger.debug("LIFX Send Receive Message Thread ended.")
-
     def clear_brighten_by_timer_timer(self, dev):
         try:
             if dev.id in self.globals[K_DEVICE_TIMERS] and 'BRIGHTEN_BY_TIMER' in self.globals[K_DEVICE_TIMERS][dev.id]:
@@ -1230,7 +1246,7 @@ class ThreadLifxlanHandler(threading.Thread):
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-    def process_status(self, lifx_command, dev):
+    def process_status(self, lifx_command, dev, lifx_command_arguments=None):
         try:
             dev_id = dev.id
 
@@ -1244,9 +1260,10 @@ class ThreadLifxlanHandler(threading.Thread):
             if self.globals[K_LIFX][dev_id][K_LIFX_DEVICE] is None:
                 self.lh_logger.debug(f"PROCESS STATUS: K_LIFX_DEVICE is None for device '{dev.name}'")
                 lifx_ip_address = dev.pluginProps["ip_address"]
-                self.globals[K_LIFX][dev_id][K_LIFX_DEVICE] = Light(dev.address, lifx_ip_address)
+                self.globals[K_LIFX][dev_id][K_LIFX_DEVICE] = lifx_light(dev.address, lifx_ip_address, self.globals[K_DISCOVERY])
                 try:
-                    self.globals[K_LIFX][dev_id][K_LIFX_DEVICE].refresh()
+                    # Contact was lost, possibly for a firmware update: re-read the version and firmware too
+                    self.globals[K_LIFX][dev_id][K_LIFX_DEVICE].refresh(refresh_cache=True)
                     refreshed = True
                 except WorkflowException:
                     refreshed = False
@@ -1259,6 +1276,22 @@ class ThreadLifxlanHandler(threading.Thread):
                         self.lh_logger.debug(f"Unable to reconnect to LIFX device '{dev.name}'")
                 return
 
+            if lifx_command_arguments == POLLING_NO_REPLY:
+                # The polling thread has already asked for the status, and retried, without a reply
+                self.communication_lost(dev_id, 'get_color')
+                self.globals[K_LIFX][dev_id][K_LIFX_COMMAND_PREVIOUS] = lifx_command
+                return
+
+            if lifx_command_arguments is not None:
+                # Status already retrieved by the polling thread: [power, hsbk, infrared_brightness]
+                power, hsbk, infrared_brightness = lifx_command_arguments
+                self.communication_ok(dev_id, lifx_command)
+                self.update_status_from_message(lifx_command, dev_id, power, hsbk)
+                if infrared_brightness is not None:
+                    self.update_infrared_status(dev, infrared_brightness)
+                self.globals[K_LIFX][dev_id][K_LIFX_COMMAND_PREVIOUS] = lifx_command
+                return
+
             lifx_io_ok, power, hsbk = \
                 self.get_color(dev_id, self.globals[K_LIFX][dev_id][K_LIFX_DEVICE])
             if lifx_io_ok:
@@ -1270,19 +1303,22 @@ class ThreadLifxlanHandler(threading.Thread):
                         self.get_infrared(dev_id,
                                           self.globals[K_LIFX][dev_id][K_LIFX_DEVICE])
                     if lifx_io_ok:
-                        try:
-                            indigo_infrared_brightness = float((infrared_brightness * 100) / 65535)
-                            keyValueList = [
-                                {"key": "infrared_brightness", "value": infrared_brightness},
-                                {"key": "indigo_infrared_brightness", "value": indigo_infrared_brightness}]
-                            dev.updateStatesOnServer(keyValueList)
+                        self.update_infrared_status(dev, infrared_brightness)
 
-                            self.lh_logger.debug(f"LifxlanHandler Infrared Level for '{dev.name}' is: {indigo_infrared_brightness}")
+            self.globals[K_LIFX][dev_id][K_LIFX_COMMAND_PREVIOUS] = lifx_command
 
-                        except (Exception, WorkflowException, IOError) as exception_error:
-                            self.exception_handler(exception_error, True)  # Log error and display failing statement
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
 
-            self.globals[K_LIFX][dev_id][K_LIFX_COMMAND_PREVIOUS] = lifx_command
+    def update_infrared_status(self, dev, infrared_brightness):
+        try:
+            indigo_infrared_brightness = float((infrared_brightness * 100) / 65535)
+            keyValueList = [
+                {"key": "infrared_brightness", "value": infrared_brightness},
+                {"key": "indigo_infrared_brightness", "value": indigo_infrared_brightness}]
+            dev.updateStatesOnServer(keyValueList)
+
+            self.lh_logger.debug(f"LifxlanHandler Infrared Level for '{dev.name}' is: {indigo_infrared_brightness}")
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
@@ -24,9 +24,12 @@ except ImportError:
 from constants import *
 from discovery import ThreadDiscovery
 from discovery import store_discovered_lifx_device
+from discovery import lifx_device_from_discovery_cache, lifx_light, load_discovery_cache, save_discovery_cache
 from lifxlanHandler import ThreadLifxlanHandler
 from polling import ThreadPolling
 from lifxlan.lifxlan import *
+from lifxlan.device import static_attributes
+from lifxlan.pack import frame_cache
 
 import socket  # Must be placed AFTER 'from lifxlan.lifxlan import *' statement!
 
@@ -48,6 +51,7 @@ class Plugin(indigo.PluginBase):
         self.globals[K_PLUGIN_INFO][K_PATH] = indigo.server.getInstallFolderPath()
         self.globals[K_PLUGIN_INFO][K_API_VERSION] = indigo.server.apiVersion
         self.globals[K_PLUGIN_INFO][K_ADDRESS] = indigo.server.address
+        self.globals[K_PLUGIN_INFO][K_DISCOVERY_CACHE_PATH] = f"{self.globals[K_PLUGIN_INFO][K_PATH]}/Preferences/Plugins/{pluginId}/discovery_cache.json"
 
         # Initialise dictionary for debug log levels in plugin Globals
         self.globals[K_DEBUG] = dict()
@@ -117,6 +121,9 @@ class Plugin(indigo.PluginBase):
         self.globals[K_POLLING][K_THREAD_ACTIVE] = False        
         self.globals[K_POLLING][K_STATUS] = False
         self.globals[K_POLLING][K_SECONDS] = float(300.0)  # 5 minutes
+        self.globals[K_POLLING][K_PACKETS_PER_SECOND] = float(50.0)
+        self.globals[K_POLLING][K_DEVICE_PACKETS_PER_SECOND] = float(5.0)
+        self.globals[K_POLLING][K_BROADCAST] = True
         self.globals[K_POLLING][K_FORCE_THREAD_END] = False
         self.globals[K_POLLING][K_QUIESCED] = False
 
@@ -130,6 +137,11 @@ class Plugin(indigo.PluginBase):
         self.globals[K_DISCOVERY] = dict()
         self.globals[K_INITIAL_DISCOVERY_COMPLETE] = False
 
+        # Lamps found by previous discoveries can be started from the discovery cache without waiting for discovery
+        return_ok, return_message = load_discovery_cache(self.globals[K_DISCOVERY], self.globals[K_PLUGIN_INFO][K_DISCOVERY_CACHE_PATH])
+        if not return_ok:
+            self.logger.warning(return_message)
+
         # Initialise dictionary for managing device deletion
         self.globals[K_RECOVERY] = dict()
 
@@ -297,6 +309,9 @@ class Plugin(indigo.PluginBase):
 
             self.globals[K_POLLING][K_STATUS] = bool(values_dict.get("status_polling", False))
             self.globals[K_POLLING][K_SECONDS] = float(values_dict.get("polling_seconds", float(300.0)))  # Default to 5 minutes
+            self.globals[K_POLLING][K_PACKETS_PER_SECOND] = float(values_dict.get("polling_packets_per_second", float(50.0)))
+            self.globals[K_POLLING][K_DEVICE_PACKETS_PER_SECOND] = float(values_dict.get("polling_device_packets_per_second", float(5.0)))
+            self.globals[K_POLLING][K_BROADCAST] = bool(values_dict.get("polling_broadcast", True))
 
             self.globals[K_POLLING][K_MINUTES] = int(values_dict.get("discovery_minutes", int(5)))  # Default to 5 minutes
 
@@ -451,8 +466,14 @@ class Plugin(indigo.PluginBase):
 
             refresh_count = 0
             refreshed = False
-            while refresh_count < 5:
-                self.globals[K_LIFX][dev_id][K_LIFX_DEVICE] = Light(lifx_mac_address, lifx_ip_address)
+            cached = dev.address in self.globals[K_DISCOVERY] and self.globals[K_DISCOVERY][dev.address][K_CACHED]
+            if cached:
+                # Only known from the discovery cache so far: start straight away from the cached address and capabilities.
+                # The status request queued below, and the discovery running in the background, check them against the lamp.
+                self.globals[K_LIFX][dev_id][K_LIFX_DEVICE] = lifx_device_from_discovery_cache(lifx_mac_address, self.globals[K_DISCOVERY][dev.address])
+                refreshed = True
+            while not refreshed and refresh_count < 5:
+                self.globals[K_LIFX][dev_id][K_LIFX_DEVICE] = lifx_light(lifx_mac_address, lifx_ip_address, self.globals[K_DISCOVERY])
                 try:
                     self.globals[K_LIFX][dev_id][K_LIFX_DEVICE].refresh()
                     refreshed = True
@@ -494,12 +515,18 @@ class Plugin(indigo.PluginBase):
                 dev.updateStateOnServer(key="total_successful_recoveries", value=total_successful_recoveries)
                 self.logger.info(f". . . Successfully recovered access to LIFX device '{dev.name}' with MAC address '{lifx_mac_address}' at IP address '{lifx_ip_address}")
 
-            return_ok, return_message = store_discovered_lifx_device(self.globals[K_DISCOVERY], self.globals[K_LIFX][dev_id][K_LIFX_DEVICE])
+            newly_classified = dev.address not in self.globals[K_DISCOVERY]
+            return_ok, return_message = store_discovered_lifx_device(self.globals[K_DISCOVERY], self.globals[K_LIFX][dev_id][K_LIFX_DEVICE], cached)
             if not return_ok:
                 self.logger.warning(f'Unable to store discovered device: {return_message}')
                 # self.exception_handler(return_message, True)  # Log error and display failing statement
                 self.globals[K_LIFX][dev_id][K_LIFX_DEVICE] = None
                 return
+            if newly_classified:
+                # Save its product straight away, so that after a restart its capabilities are known without asking it
+                return_ok, return_message = save_discovery_cache(self.globals[K_DISCOVERY], self.globals[K_PLUGIN_INFO][K_DISCOVERY_CACHE_PATH])
+                if not return_ok:
+                    self.logger.warning(return_message)
 
             self.logger.debug(f"{match_status_ui} '{dev.name} to LIFX device type '{self.globals[K_DISCOVERY][dev.address][K_PRODUCT_NAME]}'")
 
@@ -930,6 +957,10 @@ class Plugin(indigo.PluginBase):
             self.globals[K_POLLING][K_FORCE_THREAD_END] = True
             self.globals[K_THREADS][K_POLLING][K_EVENT].set()  # Stop the Polling Thread
 
+        return_ok, return_message = save_discovery_cache(self.globals[K_DISCOVERY], self.globals[K_PLUGIN_INFO][K_DISCOVERY_CACHE_PATH])
+        if not return_ok:
+            self.logger.warning(return_message)
+
         self.logger.info("'LIFX Controller' Plugin shutdown complete")
 
     def startup(self):
@@ -993,9 +1024,9 @@ class Plugin(indigo.PluginBase):
                         dev.updateStateImageOnServer(indigo.kStateImageSel.PowerOff)
                     dev.updateStateOnServer(key="brightnessLevel", value=0, uiValue=ui_value)
 
-            #  Give discovery up to 10 seconds to complete
+            #  Give discovery up to 10 seconds to complete, unless lamps can be started from the discovery cache
             second_counter = 0
-            while not self.globals[K_INITIAL_DISCOVERY_COMPLETE] and second_counter < 10:
+            while not self.globals[K_INITIAL_DISCOVERY_COMPLETE] and not self.globals[K_DISCOVERY] and second_counter < 10:
                 self.sleep(1)
                 second_counter += 1
 
@@ -1112,6 +1143,19 @@ class Plugin(indigo.PluginBase):
                         "The number of minutes between discoveries must be a positive integer e.g 1, 2, 5 etc."
                     return False, values_dict, error_dict
 
+            for key, description in (("polling_packets_per_second", "polling packets per second"),
+                                     ("polling_device_packets_per_second", "polling packets per second per device")):
+                if key in values_dict:
+                    try:
+                        if float(values_dict[key]) <= 0.0:
+                            raise ValueError
+                    except ValueError:
+                        error_dict = indigo.Dict()
+                        error_dict[key] = f"Invalid number of {description}"
+                        error_dict["showAlertText"] = \
+                            "The number of packets per second must be a positive number e.g. 5, 20, 50 etc."
+                        return False, values_dict, error_dict
+
             if "defaultDurationDimBrighten" in values_dict:
                 try:
                     float(values_dict["defaultDurationDimBrighten"])
@@ -1174,6 +1218,26 @@ class Plugin(indigo.PluginBase):
     #
     #################################
 
+    def logCommandQueueStatistics(self):
+        try:
+            if K_THREAD not in self.globals[K_THREADS][K_LIFXLAN_HANDLER]:
+                self.logger.info("LIFX command queue statistics not available as the LIFX handler isn't running")
+                return
+
+            dispatched_count, coalesced_counts = self.globals[K_THREADS][K_LIFXLAN_HANDLER][K_THREAD].dispatcher.statistics()
+            coalesced_total = sum(coalesced_counts.values())
+            log_message = f"LIFX command queue statistics: {dispatched_count} commands queued, {coalesced_total} superseded by a later command for the same device"
+            for lifx_command in sorted(coalesced_counts, key=lambda command: CMD_TRANSLATION[command]):
+                log_message = log_message + f"\n   {CMD_TRANSLATION[lifx_command]}: {coalesced_counts[lifx_command]} superseded"
+            cache_hits, cache_misses, cache_uncached, cache_size = frame_cache.statistics()
+            log_message = log_message + f"\nLIFX packet cache: {cache_hits} hits, {cache_misses} misses, {cache_uncached} not cacheable, {cache_size} packets cached"
+            static_hits, static_misses, static_size = static_attributes.statistics()
+            log_message = log_message + f"\nLIFX version and firmware cache: {static_hits} hits, {static_misses} misses, {static_size} devices cached"
+            self.logger.info(log_message)
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
     def colorPickerUpdated(self, values_dict, type_id, dev_id):
         try:
             if values_dict["actionType"] == "Standard":
@@ -2178,12 +2242,21 @@ class Plugin(indigo.PluginBase):
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
     def processDiscoverDevices(self, plugin_action):
+        # Every lamp is refreshed, so label, group, location and firmware changes are picked up
         try:
             self.globals[K_QUEUES][K_DISCOVERY][K_QUEUE].put([QUEUE_PRIORITY_INIT_DISCOVERY, CMD_DISCOVERY])
 
         except Exception as exception_error:
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
+    def processIncrementalDiscoverDevices(self, plugin_action):
+        # Only lamps that are new, gone or at a new address are refreshed
+        try:
+            self.globals[K_QUEUES][K_DISCOVERY][K_QUEUE].put([QUEUE_PRIORITY_INIT_DISCOVERY, CMD_DISCOVERY_INCREMENTAL])
+
+        except Exception as exception_error:
+            self.exception_handler(exception_error, True)  # Log error and display failing statement
+
     def processPresetApply(self, plugin_action, dev):  # Dev is a LIFX Device
         try:
             preset = indigo.variables[int(plugin_action.props.get("PresetId"))]
@@ -5,6 +5,7 @@
 
 # noinspection PyUnresolvedReferences
 # ============================== Native Imports ===============================
+import asyncio
 import logging
 import sys
 import threading
@@ -19,6 +20,32 @@ except ImportError:
 
 # ============================== Plugin Imports ===============================
 from constants import *
+from lifxlan.errors import WorkflowException
+from lifxlan.lifxlan import LifxLAN
+from lifxlan.msgtypes import LightGet, LightGetInfrared, LightState, LightStateInfrared
+from lifxlan.pack import frame_cache
+from lifxlan.transport import get_transport
+
+
+class PacketRateLimiter(object):
+    # Spaces out status requests so that no more than 'packets_per_second' are sent in total
+    # and no more than 'device_packets_per_second' are sent to any one LIFX device.
+    # It is only used on the lifxlan transport's event loop, so needs no locking.
+
+    def __init__(self, packets_per_second, device_packets_per_second):
+        self.interval = 1.0 / packets_per_second
+        self.device_interval = 1.0 / device_packets_per_second
+        self.next_slot = 0.0
+        self.next_device_slot = dict()
+
+    async def acquire(self, mac_address):
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        slot = max(slot, self.next_device_slot.get(mac_address, 0.0))
+        self.next_device_slot[mac_address] = slot + self.device_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
 
 
 class ThreadPolling(threading.Thread):
@@ -32,6 +59,8 @@ class ThreadPolling(threading.Thread):
 
         self.previous_polling_seconds = self.globals[K_POLLING][K_SECONDS]
 
+        self.lifxlan = LifxLAN()  # Used for broadcast polling
+
         self.globals[K_POLLING][K_THREAD_ACTIVE] = True
 
         self.p_logger = logging.getLogger("Plugin.POLLING")
@@ -77,10 +106,7 @@ class ThreadPolling(threading.Thread):
 
                     # self.globals[K_POLLING][K_COUNT] += 1  # Increment polling count
 
-                    for dev in indigo.devices.iter("self"):
-                        if dev.enabled:
-                            self.globals[K_QUEUES][K_LIFXLAN_HANDLER][K_QUEUE].put([QUEUE_PRIORITY_STATUS_MEDIUM, CMD_POLLING_STATUS, dev.id, None])
-                            time.sleep(1.0)  # delay each status request in order to not overload the system
+                    self.poll_devices()
 
             self.p_logger.debug(u"Polling thread ending: pollStop.isSet={0}, forceThreadEnd={1}, newSeconds={2}, previousSeconds={3}"
                                 .format(self.poll_stop.isSet(), self.globals[K_POLLING][K_FORCE_THREAD_END],
@@ -91,3 +117,91 @@ class ThreadPolling(threading.Thread):
             self.exception_handler(exception_error, True)  # Log error and display failing statement
 
         self.globals[K_POLLING][K_THREAD_ACTIVE] = False
+
+    def poll_devices(self):
+        # Requests the status of every connected LIFX device, either with one broadcast or with individual requests
+        #   sent in parallel, and queues the results for the LIFX handler.
+        # A device that isn't connected is queued without a result so that the LIFX handler requests its status
+        #   individually and handles any recovery. A device that doesn't reply (to the broadcast nor to the individual
+        #   request that follows it) is queued with POLLING_NO_REPLY, so that the LIFX handler goes straight to recovery.
+        lifx_queue = self.globals[K_QUEUES][K_LIFXLAN_HANDLER][K_QUEUE]
+
+        lights = list()
+        for dev in indigo.devices.iter("self"):
+            if not dev.enabled:
+                continue
+            lifx_device_globals = self.globals[K_LIFX].get(dev.id, dict())
+            if lifx_device_globals.get(K_LIFX_DEVICE) is None or not lifx_device_globals.get(K_CONNECTED, False):
+                lifx_queue.put([QUEUE_PRIORITY_STATUS_MEDIUM, CMD_POLLING_STATUS, dev.id, None])
+            else:
+                lights.append((dev.id, lifx_device_globals[K_LIFX_DEVICE], bool(dev.pluginProps.get("supports_infrared", False))))
+
+        if not lights:
+            return
+
+        limiter = PacketRateLimiter(self.globals[K_POLLING][K_PACKETS_PER_SECOND], self.globals[K_POLLING][K_DEVICE_PACKETS_PER_SECOND])
+        sweep_start = time.time()
+        cache_hits, cache_misses, _, _ = frame_cache.statistics()
+        if self.globals[K_POLLING][K_BROADCAST]:
+            results = get_transport().run(self.poll_lights_by_broadcast(lights))
+
+            # Fall back to polling individually any device that didn't reply to the broadcast
+            unanswered = [index for index, result in enumerate(results) if result is None]
+            if unanswered:
+                self.p_logger.debug(u"{0} of {1} LIFX devices didn't reply to the broadcast poll".format(len(unanswered), len(lights)))
+                unanswered_results = get_transport().run(self.poll_lights([lights[index] for index in unanswered], limiter))
+                for index, result in zip(unanswered, unanswered_results):
+                    results[index] = result
+        else:
+            results = get_transport().run(self.poll_lights(lights, limiter))
+        sweep_seconds = time.time() - sweep_start
+        sweep_hits, sweep_misses, _, _ = frame_cache.statistics()
+        self.p_logger.debug(u"Polled {0} LIFX devices in {1:.2f} seconds, {2} requests sent from the packet cache and {3} encoded".format(
+            len(lights), sweep_seconds, sweep_hits - cache_hits, sweep_misses - cache_misses))
+
+        for (dev_id, light, supports_infrared), result in zip(lights, results):
+            lifx_queue.put([QUEUE_PRIORITY_STATUS_MEDIUM, CMD_POLLING_STATUS, dev_id, POLLING_NO_REPLY if result is None else result])
+
+    async def poll_lights(self, lights, limiter):
+        return await asyncio.gather(*[self.poll_light(light, supports_infrared, limiter) for dev_id, light, supports_infrared in lights])
+
+    async def poll_lights_by_broadcast(self, lights):
+        # Broadcasts one LightGet (plus one LightGetInfrared if any device supports infrared) and matches the replies
+        #   received within POLLING_BROADCAST_WINDOW_SECONDS to the devices by MAC address.
+        # Returns a result per device as poll_light() does, with None for devices that didn't reply.
+        # Collection stops as soon as every polled device has replied.
+        broadcasts = [self.lifxlan.broadcast_with_resp_async(LightGet, LightState, timeout_secs=POLLING_BROADCAST_WINDOW_SECONDS,
+                                                             expected_macs=[light.mac_addr for dev_id, light, supports_infrared in lights])]
+        infrared_macs = [light.mac_addr for dev_id, light, supports_infrared in lights if supports_infrared]
+        if infrared_macs:
+            broadcasts.append(self.lifxlan.broadcast_with_resp_async(LightGetInfrared, LightStateInfrared, timeout_secs=POLLING_BROADCAST_WINDOW_SECONDS,
+                                                                     expected_macs=infrared_macs))
+        replies = await asyncio.gather(*broadcasts)
+        states = {response.target_addr: response for response in replies[0]}
+        infrared_states = {response.target_addr: response for response in replies[1]} if len(replies) > 1 else dict()
+
+        results = list()
+        for dev_id, light, supports_infrared in lights:
+            mac_address = light.mac_addr.lower()
+            state = states.get(mac_address)
+            if state is None or (supports_infrared and mac_address not in infrared_states):
+                results.append(None)
+            elif supports_infrared:
+                results.append([state.power_level, state.color, infrared_states[mac_address].infrared_brightness])
+            else:
+                results.append([state.power_level, state.color, None])
+        return results
+
+    async def poll_light(self, light, supports_infrared, limiter):
+        # Returns [power, hsbk, infrared_brightness] (infrared_brightness is None if not supported) or None if the device didn't reply
+        try:
+            await limiter.acquire(light.mac_addr)
+            hsbk = await light.get_color_async()
+            power = light.power_level
+            infrared_brightness = None
+            if supports_infrared:
+                await limiter.acquire(light.mac_addr)
+                infrared_brightness = await light.get_infrared_async()
+            return [power, hsbk, infrared_brightness]
+        except (WorkflowException, IOError):
+            return None
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_async_fanout.py
+#
+# Time to get_color() N bulbs at once: asyncio.gather() over the *_async API on one
+# event loop, against one thread per bulb (the way Group used to do it). The bulbs
+# are emulated on localhost (lifxlan.emulator) and answer after --latency seconds.
+#
+# Usage: python benchmarks/bench_async_fanout.py [--bulbs N] [--latency SECS]
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan import Light  # noqa: E402
+from lifxlan.emulator import Emulator, make_devices  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bulbs", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    emulator = Emulator(make_devices(args.bulbs), latency=args.latency, rate_limit=0).start()
+    lights = [Light(device.mac_addr, emulator.host, port=emulator.port) for device in emulator.devices.values()]
+
+    async def fan_out():
+        return await asyncio.gather(*[light.get_color_async() for light in lights])
+
+    start = time.perf_counter()
+    colors = asyncio.run(fan_out())
+    t_async = time.perf_counter() - start
+    assert len(colors) == args.bulbs
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=light.get_color) for light in lights]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    t_threads = time.perf_counter() - start
+
+    print("{} bulbs, {:.0f} ms device latency".format(args.bulbs, args.latency * 1000))
+    print("  asyncio.gather on one loop: {:8.1f} ms".format(t_async * 1000))
+    print("  one thread per bulb:        {:8.1f} ms".format(t_threads * 1000))
+
+
+if __name__ == "__main__":
+    main()
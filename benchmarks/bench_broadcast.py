@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_broadcast.py
+#
+# Missed devices and time to complete for a GetService broadcast to a large site: the previous
+# collector (one broadcast, responders deduplicated in a list, always listening for the whole
+# timeout) against LifxLAN.broadcast_with_resp, which repeats the broadcast with backoff and, given
+# the MACs found by the previous discovery, stops as soon as they have all answered. Each device
+# misses a given broadcast with probability --loss. The site is emulated on localhost
+# (lifxlan.emulator) and answers after --latency plus up to --jitter seconds.
+#
+# --default-buffer leaves the socket receive buffer at the OS default instead of
+# transport.RECEIVE_BUFFER_SIZE.
+#
+# Usage: python benchmarks/bench_broadcast.py [--lights N] [--runs N] [--loss P] [--latency SECS] [--jitter SECS] [--default-buffer]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from socket import SOL_SOCKET, SO_RCVBUF  # noqa: E402
+
+from lifxlan import transport as lifx_transport  # noqa: E402
+from lifxlan.device import DEFAULT_TIMEOUT, UDP_BROADCAST_TARGETS, set_broadcast_targets  # noqa: E402
+from lifxlan.emulator import Emulator, make_devices  # noqa: E402
+from lifxlan.lifxlan import LifxLAN  # noqa: E402
+from lifxlan.message import BROADCAST_MAC  # noqa: E402
+from lifxlan.msgtypes import GetService, StateService  # noqa: E402
+from lifxlan.pack import frame_cache  # noqa: E402
+
+
+async def list_collector(lifxlan, timeout_secs=DEFAULT_TIMEOUT):
+    # What LifxLAN.broadcast_with_resp_async did before, for one attempt with num_devices None
+    transport = lifx_transport.get_transport()
+    request = transport.register(BROADCAST_MAC, lifxlan.source_id, [StateService])
+    packed_message = frame_cache.pack(GetService, BROADCAST_MAC, lifxlan.source_id, request.seq_num, {}, ack_requested=False, response_requested=True)
+    responses = []
+    addr_seen = []
+    try:
+        for broadcast_addr in UDP_BROADCAST_TARGETS:
+            transport.sendto(packed_message, broadcast_addr)
+        deadline = time.time() + timeout_secs
+        while True:
+            remaining_secs = deadline - time.time()
+            if remaining_secs <= 0:
+                break
+            response, ip_addr = await request.get_response(remaining_secs)
+            if response is None:
+                break
+            if response.target_addr not in addr_seen and response.target_addr != BROADCAST_MAC:
+                addr_seen.append(response.target_addr)
+                responses.append(response)
+    finally:
+        transport.unregister(request)
+    return responses
+
+
+def measure(collect, device_count, runs):
+    seconds, missed = 0.0, 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        responses = collect()
+        seconds += time.perf_counter() - start
+        missed += device_count - len(responses)
+        time.sleep(1.0)  # let the emulated devices' rate limits recover
+    return seconds / runs, missed / (device_count * runs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lights", type=int, default=300)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--loss", type=float, default=0.02)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--default-buffer", action="store_true")
+    args = parser.parse_args()
+
+    if args.default_buffer:
+        lifx_transport.RECEIVE_BUFFER_SIZE = 0
+    transport = lifx_transport.get_transport()
+    transport.open()
+    receive_buffer = transport.endpoint.get_extra_info("socket").getsockopt(SOL_SOCKET, SO_RCVBUF)
+
+    devices = make_devices(light_count=args.lights)
+    expected_macs = [device.mac_addr for device in devices]
+    emulator = Emulator(devices, latency=args.latency, jitter=args.jitter, loss=args.loss).start()
+    set_broadcast_targets([emulator.address])
+    lifxlan = LifxLAN()
+    try:
+        rows = [
+            ("list, full timeout (before)", measure(lambda: transport.run(list_collector(lifxlan)), args.lights, args.runs)),
+            ("repeats, no expected MACs", measure(lambda: lifxlan.broadcast_with_resp(GetService, StateService), args.lights, args.runs)),
+            ("repeats, expected MACs", measure(lambda: lifxlan.broadcast_with_resp(GetService, StateService, expected_macs=expected_macs), args.lights, args.runs)),
+        ]
+    finally:
+        emulator.stop()
+        set_broadcast_targets()
+
+    print("{} lamps, {:.0f} ms latency + up to {:.0f} ms jitter, {:.0%} packet loss, {} byte receive buffer, {} runs".format(
+        args.lights, args.latency * 1000, args.jitter * 1000, args.loss, receive_buffer, args.runs))
+    print("  {:<32} {:>8} {:>8}".format("", "seconds", "missed"))
+    for name, (seconds, missed) in rows:
+        print("  {:<32} {:>8.2f} {:>7.1%}".format(name, seconds, missed))
+
+
+if __name__ == "__main__":
+    main()
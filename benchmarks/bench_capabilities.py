@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_capabilities.py
+#
+# Cost of the capability checks made on a freshly built Light (as lifxlanHandler's process_status
+# builds one): supports_color / supports_multizone / supports_infrared / supports_chain / is_light.
+# Before, the first of them sent a GetVersion because the new Light didn't know its product, and
+# is_light searched the light_products list. Now they look the product up in static_attributes
+# (primed by discovery, or from the discovery cache file) and test bits in capabilities_map. The
+# lamp is emulated on localhost (lifxlan.emulator) and answers after --latency seconds.
+#
+# Usage: python benchmarks/bench_capabilities.py [--latency SECS] [--checks N]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan.device import set_broadcast_targets, static_attributes  # noqa: E402
+from lifxlan.emulator import Emulator, make_devices  # noqa: E402
+from lifxlan.light import Light  # noqa: E402
+from lifxlan.products import features_map, light_products  # noqa: E402
+
+
+def checks_before(light):
+    # What the checks did before on a Light that didn't know its product
+    light.vendor, light.product, light.version = light.get_version_tuple()
+    features = features_map[light.product]
+    return features["color"], features["multizone"], features["infrared"], features["chain"], light.product in light_products
+
+
+def checks_after(light):
+    return light.supports_color(), light.supports_multizone(), light.supports_infrared(), light.supports_chain(), light.is_light()
+
+
+def measure(emulator, checks, mac_addr, count):
+    address = emulator.address
+    received = emulator.received_count
+    start = time.perf_counter()
+    for _ in range(count):
+        result = checks(Light(mac_addr, address[0], port=address[1]))
+    return (time.perf_counter() - start) / count, (emulator.received_count - received) / count, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--checks", type=int, default=50)
+    args = parser.parse_args()
+
+    device = make_devices(light_count=1)[0]
+    emulator = Emulator([device], latency=args.latency, rate_limit=0).start()
+    set_broadcast_targets([emulator.address])
+    try:
+        static_attributes.put(device.mac_addr, {"host_firmware_build_timestamp": 0, "host_firmware_version": 3.7, "wifi_firmware_build_timestamp": 0,
+                                                "wifi_firmware_version": 0.0, "vendor": 1, "product": device.product, "version": 0},
+                              cached_at=0)  # long past the TTL, as after a restart from an old discovery cache
+        before = measure(emulator, checks_before, device.mac_addr, args.checks)
+        after = measure(emulator, checks_after, device.mac_addr, args.checks * 1000)
+        assert before[2] == after[2]
+    finally:
+        emulator.stop()
+        set_broadcast_targets()
+
+    print("5 capability checks on a new Light, {:.0f} ms device latency".format(args.latency * 1000))
+    print("  {:<34} {:>12} {:>8}".format("", "time", "packets"))
+    print("  {:<34} {:>9.2f} ms {:>8.1f}".format("GetVersion + features_map (before)", before[0] * 1000, before[1]))
+    print("  {:<34} {:>9.2f} us {:>8.1f}".format("capability bits", after[0] * 1e6, after[1]))
+
+
+if __name__ == "__main__":
+    main()
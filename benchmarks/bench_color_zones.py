@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_color_zones.py
+#
+# Time to read every zone of a multizone strip: MultiZoneLight.get_color_zones() (one request,
+# every MultiZoneStateMultiZone reply collected) against the previous approach of one request
+# for the zone count followed by one request per 8 zones. The strip is emulated on localhost
+# (lifxlan.emulator) and answers after --latency seconds.
+#
+# Usage: python benchmarks/bench_color_zones.py [--zones N] [--latency SECS] [--repeat N]
+
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan.emulator import Emulator, VirtualMultiZoneLight  # noqa: E402
+from lifxlan.msgtypes import MultiZoneGetColorZones, MultiZoneStateMultiZone, MultiZoneStateZone  # noqa: E402
+from lifxlan.multizonelight import MultiZoneLight  # noqa: E402
+
+MAC = "d0:73:d5:ee:00:01"
+
+
+async def get_color_zones_chunked(strip):
+    # The request pattern get_color_zones() used before: learn the count, then one round trip per 8 zones
+    response_types = [MultiZoneStateZone, MultiZoneStateMultiZone]
+    response = await strip.req_with_resp_async(MultiZoneGetColorZones, response_types, {"start_index": 0, "end_index": 255})
+    total_zones = response.count
+    all_zones = [None] * total_zones
+    for i in range(int(math.ceil(total_zones / 8.0))):
+        response = await strip.req_with_resp_async(MultiZoneGetColorZones, response_types, {"start_index": i * 8, "end_index": 7 + (i * 8)})
+        all_zones[response.index:response.index + 8] = response.color[:total_zones - response.index]
+    return all_zones
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--zones", type=int, default=80)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    device = VirtualMultiZoneLight(MAC, zone_count=args.zones)
+    device.zones = [(i * 800, 65535, 65535, 3500) for i in range(args.zones)]
+    emulator = Emulator([device], latency=args.latency, rate_limit=0).start()
+    strip = MultiZoneLight(MAC, emulator.host, port=emulator.port)
+    strip.extended_multizone = False  # the original messages; see bench_extended_multizone.py for the others
+
+    try:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            asyncio.run(get_color_zones_chunked(strip))
+        t_chunked = (time.perf_counter() - start) / args.repeat
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            assert strip.get_color_zones() == device.zones
+        t_single = (time.perf_counter() - start) / args.repeat
+    finally:
+        emulator.stop()
+
+    print("{} zones, {:.0f} ms device latency".format(args.zones, args.latency * 1000))
+    print("  count + one request per 8 zones: {:8.1f} ms".format(t_chunked * 1000))
+    print("  one request, all replies:        {:8.1f} ms".format(t_single * 1000))
+
+
+if __name__ == "__main__":
+    main()
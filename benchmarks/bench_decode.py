@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_decode.py
+#
+# Decodes/sec for unpack_lifx_message() on the packets the plugin receives most.
+#
+# Usage: python benchmarks/bench_decode.py [--number N] [--compare GIT_REV]
+#
+# --compare loads lifxlan/unpack.py as it was at GIT_REV (e.g. the commit before the
+# table-driven decoder) and times it side by side with the current one.
+
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import timeit
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PLUGIN_DIR = os.path.join(REPO_ROOT, "LIFX.indigoPlugin", "Contents", "Server Plugin")
+sys.path.insert(0, PLUGIN_DIR)
+
+from lifxlan.msgtypes import LightState, MultiZoneStateMultiZone, StateService, StateTileState64  # noqa: E402
+from lifxlan.unpack import unpack_lifx_message  # noqa: E402
+
+MAC = "d0:73:d5:01:02:03"
+SOURCE_ID = 0x12345678
+HSBK = (21845, 65535, 32768, 3500)
+
+CASES = [
+    ("StateService", StateService, {"service": 1, "port": 56700}),
+    ("LightState", LightState, {"color": HSBK, "reserved1": 0, "power_level": 65535, "label": "Kitchen", "reserved2": 0}),
+    ("MultiZoneStateMultiZone", MultiZoneStateMultiZone, {"count": 16, "index": 0, "color": [HSBK] * 8}),
+    ("StateTileState64", StateTileState64, {"tile_index": 0, "reserved": 0, "x": 0, "y": 0, "width": 8, "colors": [HSBK] * 64}),
+]
+
+
+def load_unpack_at(rev):
+    path = "LIFX.indigoPlugin/Contents/Server Plugin/lifxlan/unpack.py"
+    source = subprocess.check_output(["git", "show", "{}:{}".format(rev, path)], cwd=REPO_ROOT)
+    spec = importlib.util.spec_from_loader("lifxlan._bench_unpack", loader=None)
+    module = importlib.util.module_from_spec(spec)
+    module.__package__ = "lifxlan"
+    exec(compile(source, path, "exec"), module.__dict__)
+    return module.unpack_lifx_message
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=5000)
+    parser.add_argument("--compare", metavar="GIT_REV", help="also time unpack.py from this git revision")
+    args = parser.parse_args()
+
+    baseline = load_unpack_at(args.compare) if args.compare else None
+
+    if baseline is None:
+        print("{:<24} {:>14} {:>12}".format("message", "decodes/sec", "usec/decode"))
+    else:
+        print("{:<24} {:>14} {:>14} {:>9}".format("message", "baseline dps", "current dps", "speedup"))
+    for name, cls, payload in CASES:
+        packet = cls(MAC, SOURCE_ID, 1, payload).packed_message
+        t_current = min(timeit.repeat(lambda: unpack_lifx_message(packet), number=args.number, repeat=3))
+        dps_current = args.number / t_current
+        if baseline is None:
+            print("{:<24} {:>14,.0f} {:>12.2f}".format(name, dps_current, 1e6 / dps_current))
+        else:
+            t_baseline = min(timeit.repeat(lambda: baseline(packet), number=args.number, repeat=3))
+            dps_baseline = args.number / t_baseline
+            print("{:<24} {:>14,.0f} {:>14,.0f} {:>8.1f}x".format(name, dps_baseline, dps_current, dps_current / dps_baseline))
+
+
+if __name__ == "__main__":
+    main()
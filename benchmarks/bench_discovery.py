@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_discovery.py
+#
+# Time for the discovery thread to find, classify and refresh every lamp of a site: the previous
+# serial pass (a blocking GetVersion per responder, then refresh() on each light in turn) against the
+# LifxLAN.iter_devices() pipeline. Both use the tiered refresh(), with an empty version and firmware
+# cache, so only the pipelining differs. --gone of the devices answer the GetService broadcast and
+# then nothing else, as a bulb that drops off the network mid-discovery would. The site is emulated
+# on localhost (lifxlan.emulator) and answers after --latency seconds.
+#
+# Usage: python benchmarks/bench_discovery.py [--lights N] [--gone N] [--latency SECS]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan.device import Device, set_broadcast_targets, static_attributes  # noqa: E402
+from lifxlan.emulator import Emulator, VirtualLight, make_devices  # noqa: E402
+from lifxlan.errors import WorkflowException  # noqa: E402
+from lifxlan.lifxlan import LifxLAN  # noqa: E402
+from lifxlan.light import Light  # noqa: E402
+from lifxlan.msgtypes import GetService, StateService  # noqa: E402
+from lifxlan.multizonelight import MultiZoneLight  # noqa: E402
+from lifxlan.tilechain import TileChain  # noqa: E402
+
+
+class GoneLight(VirtualLight):
+    def handle(self, msg):
+        return super(GoneLight, self).handle(msg) if isinstance(msg, GetService) else []
+
+
+def serial_discovery(lifxlan):
+    # What LifxLAN.discover_devices() followed by ThreadDiscovery.discovery() did before
+    lights = []
+    for r in lifxlan.broadcast_with_resp(GetService, StateService):
+        device = Device(r.target_addr, r.ip_addr, r.service, r.port, lifxlan.source_id)
+        try:
+            device.vendor, device.product, device.version = device.get_version_tuple()  # as is_light() used to
+            if device.is_light():
+                if device.supports_multizone():
+                    device = MultiZoneLight(r.target_addr, r.ip_addr, r.service, r.port, lifxlan.source_id)
+                elif device.supports_chain():
+                    device = TileChain(r.target_addr, r.ip_addr, r.service, r.port, lifxlan.source_id)
+                else:
+                    device = Light(r.target_addr, r.ip_addr, r.service, r.port, lifxlan.source_id)
+                lights.append(device)
+        except WorkflowException:
+            pass
+    ready = []
+    for light in lights:
+        try:
+            light.refresh()
+        except WorkflowException:
+            continue
+        ready.append(light)
+    return ready
+
+
+def pipeline_discovery(lifxlan):
+    return [device for device, error in lifxlan.iter_devices(refresh=True) if error is None and isinstance(device, Light)]
+
+
+def measure(lifxlan, discovery):
+    static_attributes.clear()
+    start = time.perf_counter()
+    lights = discovery(lifxlan)
+    return time.perf_counter() - start, sorted(light.mac_addr for light in lights)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lights", type=int, default=100)
+    parser.add_argument("--gone", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    devices = make_devices(light_count=args.lights - 10, multizone_count=5, tilechain_count=5)
+    devices += [GoneLight("d0:73:d5:ef:00:{:02x}".format(index + 1)) for index in range(args.gone)]
+    emulator = Emulator(devices, latency=args.latency).start()
+    set_broadcast_targets([emulator.address])
+    lifxlan = LifxLAN()
+    try:
+        serial_secs, serial_lights = measure(lifxlan, serial_discovery)
+        pipeline_secs, pipeline_lights = measure(lifxlan, pipeline_discovery)
+    finally:
+        emulator.stop()
+        set_broadcast_targets()
+    assert serial_lights == pipeline_lights and len(pipeline_lights) == args.lights
+
+    print("{} lamps + {} gone after answering the broadcast, {:.0f} ms device latency".format(args.lights, args.gone, args.latency * 1000))
+    print("  serial classify + refresh   {:>8.2f} s".format(serial_secs))
+    print("  iter_devices(refresh=True)  {:>8.2f} s".format(pipeline_secs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_dispatcher.py
+#
+# Time to run one command for each of N bulbs through the lifxlanHandler CommandDispatcher,
+# compared with the single handler thread it replaces. Each command blocks for --latency
+# seconds (one device round trip), and --unreachable of the bulbs block for --timeout
+# seconds instead, like a bulb that doesn't answer. Also checks that every device's
+# commands ran in the order they were queued.
+#
+# Usage: python benchmarks/bench_dispatcher.py [--bulbs N] [--latency SECS] [--unreachable N] [--timeout SECS]
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from constants import CMD_ON, CMD_STATUS, LIFXLAN_HANDLER_WORKER_THREADS, QUEUE_PRIORITY_COMMAND_HIGH, QUEUE_PRIORITY_STATUS_MEDIUM  # noqa: E402
+from dispatcher import CommandDispatcher  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bulbs", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--unreachable", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=1.5)
+    args = parser.parse_args()
+
+    entries = []
+    for dev_id in range(args.bulbs):
+        entries.append([QUEUE_PRIORITY_STATUS_MEDIUM, CMD_STATUS, dev_id, 0])
+        entries.append([QUEUE_PRIORITY_COMMAND_HIGH, CMD_ON, dev_id, 1])
+
+    lock = threading.Lock()
+    processed = {}
+    finished = threading.Event()
+    reachable_done = []
+    reachable_commands = 2 * (args.bulbs - args.unreachable)
+
+    def process_command(entry):
+        time.sleep(args.timeout if entry[2] < args.unreachable else args.latency)
+        with lock:
+            processed.setdefault(entry[2], []).append(entry[3])
+            if sum(len(commands) for dev_id, commands in processed.items() if dev_id >= args.unreachable) == reachable_commands \
+                    and not reachable_done:
+                reachable_done.append(time.perf_counter())
+            if sum(len(commands) for commands in processed.values()) == len(entries):
+                finished.set()
+
+    # Single handler thread: the whole queue, in priority order, one command at a time
+    start = time.perf_counter()
+    for entry in sorted(entries):
+        process_command(entry)
+    t_serial = time.perf_counter() - start
+
+    t_serial_reachable = reachable_done[0] - start
+
+    processed.clear()
+    finished.clear()
+    del reachable_done[:]
+    dispatcher = CommandDispatcher(process_command, LIFXLAN_HANDLER_WORKER_THREADS)
+    dispatcher.start()
+    start = time.perf_counter()
+    for entry in entries:
+        dispatcher.dispatch(entry)
+    finished.wait()
+    t_pool = time.perf_counter() - start
+    t_pool_reachable = reachable_done[0] - start
+    dispatcher.stop()
+
+    # The CMD_ON (priority high) should overtake the queued status unless the status was already running
+    in_order = all(commands in ([0, 1], [1, 0]) for commands in processed.values())
+
+    print("{} bulbs x 2 commands, {:.0f} ms round trip, {} unreachable ({:.1f} s timeout), {} workers".format(
+        args.bulbs, args.latency * 1000, args.unreachable, args.timeout, LIFXLAN_HANDLER_WORKER_THREADS))
+    print("                         reachable bulbs done   all done")
+    print("  single handler thread: {:8.2f} s           {:8.2f} s".format(t_serial_reachable, t_serial))
+    print("  dispatcher pool:       {:8.2f} s           {:8.2f} s".format(t_pool_reachable, t_pool))
+    print("  per-device order kept: {}".format(in_order))
+
+
+if __name__ == "__main__":
+    main()
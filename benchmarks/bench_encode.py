@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_encode.py
+#
+# Packets/sec for building outgoing lifxlan messages: the precompiled struct
+# encoder (lifxlan/pack.py) against the original bitstring + little_endian() path.
+#
+# Before timing, checks that the struct encoder matches the bitstring path, except where it
+# deliberately differs: StateHostInfo and StateWifiInfo carry signal as the protocol's float32
+# (bitstring packs a uint32), so those are checked by decoding them again with unpack.py, and
+# labels over 32 bytes are left to the bitstring path rather than cut short.
+#
+# Usage: python benchmarks/bench_encode.py [--number N]
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan.message import HEADER_SIZE_BYTES  # noqa: E402
+from lifxlan.msgtypes import LightGet, LightSetColor, LightSetPower, MultiZoneSetColorZones, SetLabel, SetTileState64, \
+    StateHostInfo, StateWifiInfo  # noqa: E402
+from lifxlan.pack import pack_lifx_message  # noqa: E402
+from lifxlan.unpack import unpack_lifx_message  # noqa: E402
+
+MAC = "d0:73:d5:01:02:03"
+SOURCE_ID = 0x12345678
+HSBK = (21845, 65535, 32768, 3500)
+
+CASES = [
+    ("LightGet", LightGet, {}),
+    ("LightSetPower", LightSetPower, {"power_level": 65535, "duration": 0}),
+    ("LightSetColor", LightSetColor, {"color": HSBK, "duration": 1000}),
+    ("MultiZoneSetColorZones", MultiZoneSetColorZones, {"start_index": 0, "end_index": 7, "color": HSBK, "duration": 0, "apply": 1}),
+    ("SetTileState64", SetTileState64, {"tile_index": 0, "length": 1, "reserved": 0, "x": 0, "y": 0, "width": 8, "duration": 0, "colors": [HSBK] * 64}),
+]
+
+
+def encode_struct(cls, payload):
+    return cls(MAC, SOURCE_ID, 1, payload, False, False).packed_message
+
+
+def encode_bitstring(msg):
+    # The pre-pack.py generate_packed_message(), run against an already built message
+    msg.payload_fields = []
+    payload = msg.get_payload()
+    msg.size = 36 + len(payload)
+    return msg.get_header() + payload
+
+
+def check_round_trips():
+    info = {"signal": 0.015625, "tx": 123456, "rx": 654321, "reserved1": 0}
+    for cls in (StateHostInfo, StateWifiInfo):
+        msg = unpack_lifx_message(encode_struct(cls, info))
+        assert type(msg) == cls and (msg.signal, msg.tx, msg.rx, msg.reserved1) == tuple(info.values()), cls.__name__
+
+    label = {"label": "x" * 40}
+    msg = SetLabel(MAC, SOURCE_ID, 1, label, False, False)
+    assert pack_lifx_message(msg) is None  # falls back to bitstring...
+    assert len(encode_struct(SetLabel, label)) > HEADER_SIZE_BYTES + 32  # ...which keeps the whole label
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    check_round_trips()
+    print("{:<24} {:>14} {:>14} {:>9}".format("message", "bitstring pps", "struct pps", "speedup"))
+    for name, cls, payload in CASES:
+        msg = cls(MAC, SOURCE_ID, 1, payload, False, False)
+        assert encode_bitstring(msg) == encode_struct(cls, payload)
+        # Build the message for both paths so the object construction cost is the same
+        t_bitstring = min(timeit.repeat(lambda: encode_bitstring(cls(MAC, SOURCE_ID, 1, payload, False, False)), number=args.number, repeat=3))
+        t_struct = min(timeit.repeat(lambda: encode_struct(cls, payload), number=args.number, repeat=3))
+        pps_bitstring = args.number / t_bitstring
+        pps_struct = args.number / t_struct
+        print("{:<24} {:>14,.0f} {:>14,.0f} {:>8.1f}x".format(name, pps_bitstring, pps_struct, pps_struct / pps_bitstring))
+
+
+if __name__ == "__main__":
+    main()
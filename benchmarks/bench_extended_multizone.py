@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_extended_multizone.py
+#
+# Time to paint and read back a gradient on a multizone strip with the extended multizone messages
+# (up to 82 zones per packet) against the original ones (one acknowledged MultiZoneSetColorZones per
+# zone, 8 zones per read). The strip is emulated on localhost (lifxlan.emulator) and answers after
+# --latency seconds.
+#
+# Usage: python benchmarks/bench_extended_multizone.py [--zones N] [--latency SECS]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan.emulator import Emulator, VirtualMultiZoneLight  # noqa: E402
+from lifxlan.multizonelight import MultiZoneLight  # noqa: E402
+
+MAC = "d0:73:d5:ee:00:01"
+
+
+def paint(strip, device, colors):
+    start = time.perf_counter()
+    strip.set_zone_colors(colors)
+    t_set = time.perf_counter() - start
+    assert device.zones == colors
+    start = time.perf_counter()
+    assert strip.get_color_zones() == colors
+    t_get = time.perf_counter() - start
+    return t_set, t_get
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--zones", type=int, default=82)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    device = VirtualMultiZoneLight(MAC, zone_count=args.zones)
+    emulator = Emulator([device], latency=args.latency, rate_limit=0).start()
+    strip = MultiZoneLight(MAC, emulator.host, port=emulator.port)
+    try:
+        strip.supports_extended_multizone()  # learn the product and firmware up front
+        t_extended = paint(strip, device, [((i * 65535) // args.zones, 65535, 65535, 3500) for i in range(args.zones)])
+        strip.extended_multizone = False
+        t_original = paint(strip, device, [((i * 65535) // args.zones, 65535, 32768, 3500) for i in range(args.zones)])
+    finally:
+        emulator.stop()
+
+    print("{} zones, {:.0f} ms device latency".format(args.zones, args.latency * 1000))
+    print("{:<22} {:>12} {:>12}".format("", "set_zone_colors", "get_color_zones"))
+    print("{:<22} {:>12.1f} ms {:>12.1f} ms".format("original messages", t_original[0] * 1000, t_original[1] * 1000))
+    print("{:<22} {:>12.1f} ms {:>12.1f} ms".format("extended multizone", t_extended[0] * 1000, t_extended[1] * 1000))
+
+
+if __name__ == "__main__":
+    main()
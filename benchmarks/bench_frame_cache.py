@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_frame_cache.py
+#
+# Cost of encoding the requests the plugin sends repeatedly: building the Message and encoding it
+# (lifxlan/pack.py) every time, against FrameCache.pack() copying the cached frame and patching in
+# the sequence number.
+#
+# Usage: python benchmarks/bench_frame_cache.py [--number N]
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan.msgtypes import GetTileState64, LightGet, LightGetInfrared, LightGetPower, LightSetPower  # noqa: E402
+from lifxlan.pack import FrameCache  # noqa: E402
+
+MAC = "d0:73:d5:01:02:03"
+SOURCE_ID = 0x12345678
+
+CASES = [
+    ("LightGet", LightGet, {}),
+    ("LightGetPower", LightGetPower, {}),
+    ("LightGetInfrared", LightGetInfrared, {}),
+    ("LightSetPower", LightSetPower, {"power_level": 65535, "duration": 0}),
+    ("GetTileState64", GetTileState64, {"tile_index": 0, "length": 5, "reserved": 0, "x": 0, "y": 0, "width": 8}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    print("{:<20} {:>13} {:>13} {:>9}".format("message", "encode usec", "cached usec", "speedup"))
+    for name, cls, payload in CASES:
+        cache = FrameCache()
+        seq_nums = iter(range(10 ** 9))
+        assert cache.pack(cls, MAC, SOURCE_ID, 7, payload, False, True) == cls(MAC, SOURCE_ID, 7, payload, False, True).packed_message
+        t_encode = min(timeit.repeat(lambda: cls(MAC, SOURCE_ID, next(seq_nums) & 0xff, payload, False, True).packed_message, number=args.number, repeat=3))
+        t_cached = min(timeit.repeat(lambda: cache.pack(cls, MAC, SOURCE_ID, next(seq_nums) & 0xff, payload, False, True), number=args.number, repeat=3))
+        hits, misses, _, _ = cache.statistics()
+        assert misses == 1
+        print("{:<20} {:>13.2f} {:>13.2f} {:>8.1f}x".format(name, 1e6 * t_encode / args.number, 1e6 * t_cached / args.number, t_encode / t_cached))
+
+
+if __name__ == "__main__":
+    main()
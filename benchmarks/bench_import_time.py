@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_import_time.py
+#
+# Time Indigo spends importing the plugin before it can start it: the imports at the top of plugin.py
+# (everything before "class Plugin", which needs Indigo itself) run in a fresh interpreter with
+# python -X importtime, --runs times. Reports the median of the wall time and of each module's
+# cumulative import time (the slowest --top of them), and which of the modules that used to be
+# loaded eagerly (NumPy, bitstring, ifaddr) were loaded.
+#
+# Usage: python benchmarks/bench_import_time.py [--runs N] [--top N]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin")
+DEFERRED_MODULES = ("numpy", "lifxlan.bitstring", "ifaddr")
+
+RUNNER = """
+import sys, time
+start = time.perf_counter()
+exec(compile(sys.argv[1], "plugin.py", "exec"), {"__name__": "plugin"})
+elapsed = time.perf_counter() - start
+print("WALL", elapsed)
+print("LOADED", ",".join(name for name in sys.argv[2].split(",") if name in sys.modules))
+"""
+
+
+def plugin_imports():
+    with open(os.path.join(PLUGIN_DIR, "plugin.py")) as plugin_file:
+        source = plugin_file.read()
+    return source[:source.index("\nclass Plugin")]
+
+
+def run_once(source):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", RUNNER, source, ",".join(DEFERRED_MODULES)],
+                            cwd=PLUGIN_DIR, capture_output=True, text=True, check=True)
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+            _, cumulative_us, name = line[len("import time:"):].split("|")
+            if not name.startswith("  "):  # top level imports (one space of indent) only
+                cumulative[name.strip()] = int(cumulative_us)
+    wall = float(next(line.split()[1] for line in result.stdout.splitlines() if line.startswith("WALL")))
+    loaded = next(line[len("LOADED "):] for line in result.stdout.splitlines() if line.startswith("LOADED"))
+    return wall, cumulative, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    source = plugin_imports()
+    run_once(source)  # warm the bytecode caches
+    runs = [run_once(source) for _ in range(args.runs)]
+    wall = statistics.median(run[0] for run in runs)
+    modules = {name: statistics.median(run[1].get(name, 0) for run in runs) for name in runs[0][1]}
+
+    print("plugin.py imports, median of {} fresh interpreters".format(args.runs))
+    print("  {:<30} {:>9.1f} ms".format("wall time", wall * 1000))
+    for name, cumulative_us in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+        print("  {:<30} {:>9.1f} ms".format(name, cumulative_us / 1000))
+    print("  deferred modules loaded: {}".format(runs[0][2] or "none"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_incremental_discovery.py
+#
+# Cost of a periodic discovery on a site whose lamps are all already known: a full discovery (every
+# lamp refreshed and compared) against an incremental one (one GetService broadcast, compared with
+# the discovery records by diff_discovered_lifx_devices, and only new, gone or moved lamps
+# refreshed). The incremental broadcast is the plugin's: it expects the known lamps and stops one
+# repeat after they have all answered, where the full discovery's broadcast always runs its whole
+# repeat schedule. The incremental run is repeated after one lamp is forgotten, one is given a stale IP
+# address and one unknown record is added, to check it reports exactly those three. Packets are
+# those received by the emulated lamps (lifxlan.emulator on localhost, replies after --latency).
+#
+# Usage: python benchmarks/bench_incremental_discovery.py [--lights N] [--latency SECS]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from constants import DISCOVERY_EVENT_CHANGED, DISCOVERY_EVENT_FOUND, DISCOVERY_EVENT_VANISHED, K_CACHED, K_CHANGED_INFO, K_IP_ADDRESS  # noqa: E402
+from discovery import diff_discovered_lifx_devices, store_discovered_lifx_device  # noqa: E402
+from lifxlan.device import set_broadcast_targets  # noqa: E402
+from lifxlan.emulator import Emulator, make_devices  # noqa: E402
+from lifxlan.lifxlan import LifxLAN  # noqa: E402
+from lifxlan.msgtypes import GetService, StateService  # noqa: E402
+
+
+def full_discovery(globals_discovery):
+    for lifx_device, lifx_error in LifxLAN().iter_devices(refresh=True):
+        assert lifx_error is None
+        store_discovered_lifx_device(globals_discovery, lifx_device)
+    return None
+
+
+def incremental_discovery(globals_discovery):
+    # As ThreadDiscovery.incremental_discovery, without the Indigo updates
+    lifxlan = LifxLAN()
+    responses = lifxlan.broadcast_with_resp(GetService, StateService, expected_macs=set(globals_discovery), extra_repeats=1)
+    discovery_events, responses_to_refresh = diff_discovered_lifx_devices(globals_discovery, responses)
+    for lifx_device, lifx_error in lifxlan.iter_devices(refresh=True, responses=responses_to_refresh):
+        assert lifx_error is None
+        previously_confirmed = lifx_device.mac_addr in globals_discovery and not globals_discovery[lifx_device.mac_addr][K_CACHED]
+        store_discovered_lifx_device(globals_discovery, lifx_device)
+        if not previously_confirmed:
+            discovery_events.append((DISCOVERY_EVENT_FOUND, lifx_device.mac_addr))
+        elif globals_discovery[lifx_device.mac_addr][K_CHANGED_INFO]:
+            discovery_events.append((DISCOVERY_EVENT_CHANGED, lifx_device.mac_addr))
+    return discovery_events
+
+
+def measure(emulator, discovery, globals_discovery):
+    received = emulator.received_count
+    start = time.perf_counter()
+    discovery_events = discovery(globals_discovery)
+    return time.perf_counter() - start, emulator.received_count - received, discovery_events
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lights", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    devices = make_devices(light_count=args.lights)
+    emulator = Emulator(devices, latency=args.latency).start()
+    set_broadcast_targets([emulator.address])
+    globals_discovery = {}
+    try:
+        full_discovery(globals_discovery)  # the records a periodic discovery starts from
+        full = measure(emulator, full_discovery, globals_discovery)
+        stable = measure(emulator, incremental_discovery, globals_discovery)
+        assert stable[2] == []
+
+        forgotten, moved = devices[0].mac_addr, devices[1].mac_addr
+        del globals_discovery[forgotten]
+        globals_discovery[moved][K_IP_ADDRESS] = "192.0.2.1"
+        globals_discovery["d0:73:d5:ef:00:01"] = dict(globals_discovery[devices[2].mac_addr])
+        changed = measure(emulator, incremental_discovery, globals_discovery)
+        assert sorted(changed[2]) == sorted([(DISCOVERY_EVENT_FOUND, forgotten), (DISCOVERY_EVENT_CHANGED, moved), (DISCOVERY_EVENT_VANISHED, "d0:73:d5:ef:00:01")])
+    finally:
+        emulator.stop()
+        set_broadcast_targets()
+
+    print("{} known lamps, {:.0f} ms device latency".format(args.lights, args.latency * 1000))
+    print("  {:<40} {:>8} {:>9} {:>7}".format("", "seconds", "packets", "events"))
+    print("  {:<40} {:>8.2f} {:>9} {:>7}".format("full discovery", full[0], full[1], "-"))
+    print("  {:<40} {:>8.2f} {:>9} {:>7}".format("incremental, nothing changed", stable[0], stable[1], len(stable[2])))
+    print("  {:<40} {:>8.2f} {:>9} {:>7}".format("incremental, 1 new + 1 moved + 1 gone", changed[0], changed[1], len(changed[2])))
+
+
+if __name__ == "__main__":
+    main()
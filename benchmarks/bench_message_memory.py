@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_message_memory.py
+#
+# Memory retained by, and allocations made for, messages decoded with unpack_lifx_message():
+# the status replies the plugin receives most (a tile chain poll is one StateTileState64 per tile).
+#
+# Usage: python benchmarks/bench_message_memory.py [--count N]
+#
+# For each message type, decodes --count packets and keeps the results alive, then reports the
+# bytes and allocated blocks (tracemalloc) per message over and above the packet itself, the
+# number of gen-0 collections triggered, and the decode time.
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan.msgtypes import Acknowledgement, LightState, MultiZoneStateMultiZone, StateService, StateTileState64  # noqa: E402
+from lifxlan.unpack import unpack_lifx_message  # noqa: E402
+
+MAC = "d0:73:d5:01:02:03"
+SOURCE_ID = 0x12345678
+HSBK = (21845, 65535, 32768, 3500)
+
+CASES = [
+    ("Acknowledgement", Acknowledgement, {}),
+    ("StateService", StateService, {"service": 1, "port": 56700}),
+    ("LightState", LightState, {"color": HSBK, "reserved1": 0, "power_level": 65535, "label": "Kitchen", "reserved2": 0}),
+    ("MultiZoneStateMultiZone", MultiZoneStateMultiZone, {"count": 16, "index": 0, "color": [HSBK] * 8}),
+    ("StateTileState64", StateTileState64, {"tile_index": 0, "reserved": 0, "x": 0, "y": 0, "width": 8, "colors": [HSBK] * 64}),
+]
+
+
+def measure(packets):
+    gc.collect()
+    collections = gc.get_stats()[0]["collections"]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    messages = [unpack_lifx_message(packet) for packet in packets]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    collections = gc.get_stats()[0]["collections"] - collections
+
+    stats = after.compare_to(before, "filename")
+    size = sum(stat.size_diff for stat in stats)
+    blocks = sum(stat.count_diff for stat in stats)
+    # the list holding the messages isn't part of the per-message cost
+    size -= sys.getsizeof(messages)
+    blocks -= 1
+    return size / len(packets), blocks / len(packets), collections
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=10000)
+    args = parser.parse_args()
+
+    print("{:<24} {:>10} {:>12} {:>9} {:>12}".format("message", "bytes/msg", "blocks/msg", "gen0 GCs", "usec/decode"))
+    for name, cls, payload in CASES:
+        packet = cls(MAC, SOURCE_ID, 1, payload).packed_message
+        packets = [bytes(packet) for _ in range(args.count)]  # distinct objects, as received from the socket
+
+        size, blocks, collections = measure(packets)
+
+        start = time.perf_counter()
+        for packet in packets:
+            unpack_lifx_message(packet)
+        elapsed = time.perf_counter() - start
+
+        print("{:<24} {:>10,.0f} {:>12.1f} {:>9} {:>12.2f}".format(name, size, blocks, collections, 1e6 * elapsed / args.count))
+
+
+if __name__ == "__main__":
+    main()
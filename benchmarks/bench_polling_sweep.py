@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_polling_sweep.py
+#
+# Time for one polling sweep of N bulbs with ThreadPolling.poll_lights() under a given
+# packets-per-second budget. The old loop queued one status request per second, so
+# a sweep took at least N seconds. The bulbs are emulated on localhost (lifxlan.emulator)
+# and answer after --latency seconds.
+#
+# Usage: python benchmarks/bench_polling_sweep.py [--bulbs N] [--latency SECS] [--pps N] [--device-pps N]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan import Light  # noqa: E402
+from lifxlan.emulator import Emulator, make_devices  # noqa: E402
+from lifxlan.transport import get_transport  # noqa: E402
+from polling import PacketRateLimiter, ThreadPolling  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bulbs", type=int, default=80)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--pps", type=float, default=50.0)
+    parser.add_argument("--device-pps", type=float, default=5.0)
+    args = parser.parse_args()
+
+    emulator = Emulator(make_devices(args.bulbs), latency=args.latency, rate_limit=0).start()
+    lights = [(i, Light(device.mac_addr, emulator.host, port=emulator.port), False) for i, device in enumerate(emulator.devices.values())]
+
+    poller = ThreadPolling.__new__(ThreadPolling)  # only poll_lights() is used, which needs no plugin globals
+    limiter = PacketRateLimiter(args.pps, args.device_pps)
+    start = time.perf_counter()
+    results = get_transport().run(poller.poll_lights(lights, limiter))
+    elapsed = time.perf_counter() - start
+    assert all(result is not None for result in results)
+
+    print("{} bulbs, {:.0f} ms device latency, {:.0f} packets/sec budget".format(args.bulbs, args.latency * 1000, args.pps))
+    print("  serial loop (1 s per bulb): {:8.1f} s (at least)".format(float(args.bulbs)))
+    print("  parallel sweep:             {:8.2f} s".format(elapsed))
+
+
+if __name__ == "__main__":
+    main()
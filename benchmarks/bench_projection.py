@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_projection.py
+#
+# Per-frame CPU time to turn an image into per-tile SetTileState64 colours for tile walls of
+# increasing size: the pure Python path (RGBtoHSBK per canvas pixel, then the tile map scatter of
+# project_matrix) against TileProjection (lifxlan/projection.py, NumPy). The Python path needs an
+# image already at canvas size; the NumPy one is also timed on a 1920x1080 image it resamples.
+#
+# Usage: python benchmarks/bench_projection.py [--number N]
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+import numpy  # noqa: E402
+
+from lifxlan.tilechain import Tile, TileChain  # noqa: E402
+from lifxlan.utils import RGBtoHSBK  # noqa: E402
+
+WALLS = [(5, 1), (4, 4), (8, 8), (16, 8)]  # tiles across, tiles down
+
+
+def offline_tilechain(tiles_x, tiles_y):
+    # A TileChain with a known layout that never talks to a device
+    tilechain = TileChain.__new__(TileChain)
+    tilechain.tile_info = [Tile(float(x), float(-y)) for y in range(tiles_y) for x in range(tiles_x)]
+    tilechain.tile_count = len(tilechain.tile_info)
+    tilechain.tile_map = None
+    tilechain.canvas_dimensions = None
+    tilechain.projection = None
+    return tilechain
+
+
+def python_frame(tilechain, rgb_rows):
+    hsbk_matrix = [[RGBtoHSBK(rgb) for rgb in row] for row in rgb_rows]
+    return tilechain.matrix_to_tile_colors(hsbk_matrix)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = numpy.random.default_rng(0)
+    hd_image = rng.integers(0, 256, (1080, 1920, 3))
+    print("{:<10} {:>8} {:>10} {:>16} {:>16} {:>18}".format("wall", "tiles", "canvas", "python ms/frame", "numpy ms/frame", "numpy 1080p ms"))
+    for tiles_x, tiles_y in WALLS:
+        tilechain = offline_tilechain(tiles_x, tiles_y)
+        canvas_x, canvas_y = tilechain.get_canvas_dimensions()
+        tilechain.get_tile_map()
+        projection = tilechain.get_projection()
+        image = rng.integers(0, 256, (canvas_y, canvas_x, 3))
+        rgb_rows = [[tuple(int(c) for c in pixel) for pixel in row] for row in image]
+
+        assert projection.project(image).tolist() == [[list(color) for color in tile] for tile in python_frame(tilechain, rgb_rows)]
+        projection.project(hd_image)  # precompute the resampling index
+
+        t_python = min(timeit.repeat(lambda: python_frame(tilechain, rgb_rows), number=args.number, repeat=3)) / args.number
+        t_numpy = min(timeit.repeat(lambda: projection.project(image), number=args.number, repeat=3)) / args.number
+        t_hd = min(timeit.repeat(lambda: projection.project(hd_image), number=args.number, repeat=3)) / args.number
+        print("{:<10} {:>8} {:>10} {:>16.2f} {:>16.3f} {:>18.3f}".format(
+            "{}x{}".format(tiles_x, tiles_y), tilechain.tile_count, "{}x{}".format(canvas_x, canvas_y), t_python * 1000, t_numpy * 1000, t_hd * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_refresh.py
+#
+# Time to refresh() every light of a site, one light after the other as discovery does: the previous
+# refresh (nine serial requests) against the tiered refresh, both with an empty version and firmware
+# cache (first discovery) and with it filled (every discovery after that). The lights are emulated
+# on localhost (lifxlan.emulator) and answer after --latency seconds.
+#
+# Usage: python benchmarks/bench_refresh.py [--lights N] [--latency SECS]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan.device import static_attributes  # noqa: E402
+from lifxlan.emulator import Emulator, make_devices  # noqa: E402
+from lifxlan.light import Light  # noqa: E402
+
+
+def serial_refresh(light):
+    # What refresh() did before: each attribute read with its own blocking request
+    light.label = light.get_label()
+    light.location = light.get_location()
+    light.group = light.get_group()
+    light.power_level = light.get_power()
+    light.host_firmware_build_timestamp, light.host_firmware_version = light.get_host_firmware_tuple()
+    light.wifi_firmware_build_timestamp, light.wifi_firmware_version = light.get_wifi_firmware_tuple()
+    light.vendor, light.product, light.version = light.get_version_tuple()
+    light.product_name = light.get_product_name()
+    light.product_features = light.get_product_features()
+
+
+def measure(emulator, lights, refresh):
+    received = emulator.received_count
+    start = time.perf_counter()
+    for light in lights:
+        refresh(light)
+    return time.perf_counter() - start, (emulator.received_count - received) / len(lights)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lights", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    devices = make_devices(light_count=args.lights)
+    emulator = Emulator(devices, latency=args.latency).start()
+    lights = [Light(device.mac_addr, emulator.host, port=emulator.port) for device in devices]
+    try:
+        serial = measure(emulator, lights, serial_refresh)
+        expected = [(light.label, light.power_level, light.product, light.host_firmware_version) for light in lights]
+        static_attributes.clear()
+        cold = measure(emulator, lights, lambda light: light.refresh())
+        warm = measure(emulator, lights, lambda light: light.refresh())
+        assert [(light.label, light.power_level, light.product, light.host_firmware_version) for light in lights] == expected
+    finally:
+        emulator.stop()
+
+    print("{} lights, {:.0f} ms device latency, refreshed one after the other".format(args.lights, args.latency * 1000))
+    print("  {:<28} {:>10} {:>16}".format("", "seconds", "packets/light"))
+    for name, (elapsed, packets) in [("serial requests (before)", serial), ("tiered, cache empty", cold), ("tiered, cache filled", warm)]:
+        print("  {:<28} {:>10.2f} {:>16.1f}".format(name, elapsed, packets))
+
+
+if __name__ == "__main__":
+    main()
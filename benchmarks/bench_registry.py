@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_registry.py
+#
+# Time for the LifxLAN lookups (get_color_lights, get_device_by_name, get_devices_by_group): as they
+# were, a discovery followed by a request to every device for its label or group, against lookups in
+# the device registry once it has been filled. The site is emulated on localhost (lifxlan.emulator)
+# and answers after --latency seconds.
+#
+# Usage: python benchmarks/bench_registry.py [--lights N] [--latency SECS] [--lookups N]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan.device import set_broadcast_targets  # noqa: E402
+from lifxlan.emulator import Emulator, make_devices  # noqa: E402
+from lifxlan.lifxlan import LifxLAN  # noqa: E402
+
+
+def discovered_lookups(lifxlan, name, group):
+    # What the lookups did before: each one started with a discovery
+    lifxlan.discover_devices()
+    color_lights = [light for light in lifxlan.lights if light.supports_color()]
+    lifxlan.discover_devices()
+    by_name = [device for device in lifxlan.devices if device.get_label() == name][-1]
+    lifxlan.discover_devices()
+    by_group = [device for device in lifxlan.devices if device.get_group() == group]
+    return color_lights, by_name, by_group
+
+
+def registry_lookups(lifxlan, name, group):
+    return lifxlan.get_color_lights(), lifxlan.get_device_by_name(name), lifxlan.get_devices_by_group(group).devices
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lights", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    emulator = Emulator(make_devices(light_count=args.lights), latency=args.latency).start()
+    set_broadcast_targets([emulator.address])
+    try:
+        lifxlan = LifxLAN()
+        start = time.perf_counter()
+        lights = lifxlan.get_lights()  # fills the registry
+        first = time.perf_counter() - start
+        name, group = lights[-1].label, lights[-1].group
+
+        start = time.perf_counter()
+        before = discovered_lookups(lifxlan, name, group)
+        discovered = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.lookups):
+            after = registry_lookups(lifxlan, name, group)
+        indexed = (time.perf_counter() - start) / args.lookups
+        assert len(after[0]) == len(before[0]) and after[1].mac_addr == before[1].mac_addr and len(after[2]) == len(before[2])
+    finally:
+        emulator.stop()
+        set_broadcast_targets()
+
+    print("{} lamps, {:.0f} ms device latency; get_color_lights + get_device_by_name + get_devices_by_group".format(args.lights, args.latency * 1000))
+    print("  discovery per lookup (before)  {:>12.3f} s".format(discovered))
+    print("  registry, first lookup         {:>12.3f} s".format(first))
+    print("  registry, later lookups        {:>12.1f} us".format(indexed * 1e6))
+
+
+if __name__ == "__main__":
+    main()
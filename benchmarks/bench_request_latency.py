@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_request_latency.py
+#
+# Round-trip latency of the Device workflow methods (req_with_resp, req_with_ack,
+# fire_and_forget) against a bulb answering on 127.0.0.1, i.e. the library overhead
+# on the ThreadLifxlanHandler command path with the network taken out.
+#
+# Usage: python benchmarks/bench_request_latency.py [--number N]
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan import Light  # noqa: E402
+from lifxlan.msgtypes import Acknowledgement, LightGet, LightState  # noqa: E402
+from lifxlan.unpack import unpack_lifx_message  # noqa: E402
+
+MAC = "d0:73:d5:01:02:03"
+
+
+def responder(sock):
+    while True:
+        data, addr = sock.recvfrom(1024)
+        request = unpack_lifx_message(data)
+        if request.ack_requested:
+            sock.sendto(Acknowledgement(MAC, request.source_id, request.seq_num, {}).packed_message, addr)
+        if request.response_requested and isinstance(request, LightGet):
+            payload = {"color": (0, 0, 65535, 3500), "reserved1": 0, "power_level": 65535, "label": "Bench", "reserved2": 0}
+            sock.sendto(LightState(MAC, request.source_id, request.seq_num, payload).packed_message, addr)
+
+
+def timed(fn, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - start) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=500)
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    threading.Thread(target=responder, args=(sock,), daemon=True).start()
+
+    light = Light(MAC, "127.0.0.1", port=sock.getsockname()[1])
+    print("{:<34} {:>12}".format("operation", "usec/op"))
+    print("{:<34} {:>12.1f}".format("get_color (req_with_resp)", timed(light.get_color, args.number)))
+    print("{:<34} {:>12.1f}".format("set_color (req_with_ack)", timed(lambda: light.set_color((0, 0, 65535, 3500)), args.number)))
+    print("{:<34} {:>12.1f}".format("set_power rapid (fire_and_forget)", timed(lambda: light.set_power("on", rapid=True), args.number)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_tile_snapshot.py
+#
+# Snapshotting every tile of a chain: one GetTileState64 per tile (as get_tilechain_colors used to)
+# against one GetTileState64 covering the whole chain, read with get_tilechain_colors() and into an
+# array('H') frame with get_tilechain_frame(). Reports the time, the packets the chain had to accept,
+# and the memory the snapshot keeps. The chain is emulated on localhost (lifxlan.emulator).
+#
+# Usage: python benchmarks/bench_tile_snapshot.py [--tiles N] [--latency SECS] [--repeat N]
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan.emulator import Emulator, VirtualTileChain  # noqa: E402
+from lifxlan.msgtypes import GetTileState64, StateTileState64  # noqa: E402
+from lifxlan.tilechain import TileChain  # noqa: E402
+
+MAC = "d0:73:d5:ee:00:01"
+
+
+async def per_tile(tilechain):
+    responses = await asyncio.gather(*[tilechain.req_with_resp_async(GetTileState64, StateTileState64, tilechain.get_tile_state_payload(i, 1))
+                                       for i in range(tilechain.tile_count)])
+    return [response.colors for response in responses]
+
+
+def measure(emulator, repeat, snapshot):
+    received = emulator.received_count
+    start = time.perf_counter()
+    for _ in range(repeat):
+        snapshot()
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    result = snapshot()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return elapsed, (emulator.received_count - received) / (repeat + 1), retained
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tiles", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    device = VirtualTileChain(MAC, tile_count=args.tiles)
+    device.tiles = [dict(tile, colors=[(t * 1000 + i, 65535, 32768, 3500) for i in range(64)]) for t, tile in enumerate(device.tiles)]
+    emulator = Emulator([device], latency=args.latency, rate_limit=0).start()
+    tilechain = TileChain(MAC, emulator.host, port=emulator.port)
+    expected = [tile["colors"] for tile in device.tiles]
+    try:
+        assert tilechain.run_sync(per_tile(tilechain)) == expected
+        assert tilechain.get_tilechain_colors() == expected
+        assert list(tilechain.get_tilechain_frame()) == [v for tile in expected for color in tile for v in color]
+        results = [
+            ("one request per tile", measure(emulator, args.repeat, lambda: tilechain.run_sync(per_tile(tilechain)))),
+            ("get_tilechain_colors", measure(emulator, args.repeat, tilechain.get_tilechain_colors)),
+            ("get_tilechain_frame", measure(emulator, args.repeat, tilechain.get_tilechain_frame)),
+        ]
+    finally:
+        emulator.stop()
+
+    print("{} tiles, {:.0f} ms device latency".format(args.tiles, args.latency * 1000))
+    print("  {:<22} {:>10} {:>16} {:>14}".format("", "ms", "packets to chain", "bytes kept"))
+    for name, (elapsed, packets, retained) in results:
+        print("  {:<22} {:>10.1f} {:>16.0f} {:>14,}".format(name, elapsed * 1000, packets, retained))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_tile_stream.py
+#
+# Animating a 5-tile chain for --seconds: one thread per tile per frame doing an acknowledged
+# SetTileState64 (how set_tilechain_colors used to work) against a TileFrameStreamer fed at --fps.
+# The chain is emulated on localhost (lifxlan.emulator) with --latency and the usual 20 packets/sec
+# device limit, so packets sent over the limit are dropped by the "device".
+#
+# Usage: python benchmarks/bench_tile_stream.py [--tiles N] [--fps N] [--seconds N] [--latency SECS]
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from lifxlan.emulator import Emulator, VirtualTileChain  # noqa: E402
+from lifxlan.errors import WorkflowException  # noqa: E402
+from lifxlan.tilechain import TileChain  # noqa: E402
+
+MAC = "d0:73:d5:ee:00:01"
+
+
+def frame(number, tile_count):
+    return [[((number * 1000 + tile * 64 + i) & 0xffff, 65535, 65535, 3500) for i in range(64)] for tile in range(tile_count)]
+
+
+def threaded(tilechain, emulator, seconds):
+    errors = [0]
+
+    def set_tile(i, colors):
+        try:
+            tilechain.set_tile_colors(i, colors)
+        except WorkflowException:
+            errors[0] += 1
+
+    frames = 0
+    dropped = emulator.dropped_count
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        threads = [threading.Thread(target=set_tile, args=(i, colors)) for i, colors in enumerate(frame(frames, tilechain.tile_count))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        frames += 1
+    return frames, emulator.dropped_count - dropped, errors[0]
+
+
+def streamed(tilechain, emulator, seconds, fps):
+    streamer = tilechain.stream_frames()
+    dropped = emulator.dropped_count
+    frames = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        streamer.submit(frame(frames, tilechain.tile_count))
+        frames += 1
+        time.sleep(max(0.0, start + (frames / fps) - time.perf_counter()))
+    streamer.wait_idle(5)
+    streamer.stop()
+    submitted, sent, stale, messages = streamer.statistics()
+    return sent, stale, messages, emulator.dropped_count - dropped
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tiles", type=int, default=5)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    device = VirtualTileChain(MAC, tile_count=args.tiles)
+    emulator = Emulator([device], latency=args.latency).start()
+    tilechain = TileChain(MAC, emulator.host, port=emulator.port)
+    time.sleep(1.5)  # let the emulated device's rate limit recover from the set-up requests
+    try:
+        frames, device_dropped, errors = threaded(tilechain, emulator, args.seconds)
+        time.sleep(1.5)
+        sent, stale, messages, stream_device_dropped = streamed(tilechain, emulator, args.seconds, args.fps)
+    finally:
+        emulator.stop()
+
+    print("{} tiles, {:.0f} ms device latency, 20 packets/sec device limit, {:.0f} s".format(args.tiles, args.latency * 1000, args.seconds))
+    print("  thread per tile, acknowledged: {:5.1f} frames/sec, {} packets dropped by the device, {} tiles not acknowledged".format(
+        frames / args.seconds, device_dropped, errors))
+    print("  frame streamer at {:.0f} fps:   {:5.1f} frames/sec, {:5.1f} packets/sec, {} stale frames skipped, {} packets dropped by the device".format(
+        args.fps, sent / args.seconds, messages / args.seconds, stale, stream_device_dropped))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# coding=utf-8
+# bench_warm_start.py
+#
+# Plugin restart to controllable lamps, without and with the discovery cache. Cold: discovery has to
+# finish before the lamps are known, then each lamp is started (deviceStartComm builds a Light and
+# refresh()es it, one lamp after another). Warm: the cache file written by the previous discovery is
+# loaded and each lamp is started from its cached record, with no network traffic. Both then send an
+# acknowledged SetPower to every lamp in turn, so "controllable" means every lamp has accepted a command.
+# The lamps are emulated on localhost (lifxlan.emulator) and answer after --latency seconds.
+#
+# Usage: python benchmarks/bench_warm_start.py [--lights N] [--latency SECS]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LIFX.indigoPlugin", "Contents", "Server Plugin"))
+
+from constants import K_CACHED  # noqa: E402
+from discovery import lifx_device_from_discovery_cache, load_discovery_cache, save_discovery_cache, store_discovered_lifx_device  # noqa: E402
+from lifxlan.device import set_broadcast_targets, static_attributes  # noqa: E402
+from lifxlan.emulator import Emulator, make_devices  # noqa: E402
+from lifxlan.lifxlan import LifxLAN  # noqa: E402
+from lifxlan.light import Light  # noqa: E402
+
+
+def cold_start(emulator):
+    static_attributes.clear()
+    globals_discovery = {}
+    for lifx_device, lifx_error in LifxLAN().iter_devices(refresh=True):
+        assert lifx_error is None
+        store_discovered_lifx_device(globals_discovery, lifx_device)
+    lamps = []
+    for lifx_mac_address in globals_discovery:
+        lamp = Light(lifx_mac_address, emulator.host, port=emulator.port)
+        lamp.refresh()
+        lamps.append(lamp)
+    return globals_discovery, lamps
+
+
+def warm_start(cache_path):
+    static_attributes.clear()
+    globals_discovery = {}
+    return_ok, return_message = load_discovery_cache(globals_discovery, cache_path)
+    assert return_ok, return_message
+    lamps = []
+    for lifx_mac_address, lifx_value in globals_discovery.items():
+        assert lifx_value[K_CACHED]
+        lamps.append(lifx_device_from_discovery_cache(lifx_mac_address, lifx_value))
+    return globals_discovery, lamps
+
+
+def measure(start):
+    began = time.perf_counter()
+    globals_discovery, lamps = start()
+    started = time.perf_counter()
+    for lamp in lamps:
+        lamp.set_power("on")
+    return (started - began, time.perf_counter() - began), globals_discovery
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lights", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    emulator = Emulator(make_devices(light_count=args.lights), latency=args.latency).start()
+    set_broadcast_targets([emulator.address])
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, "discovery_cache.json")
+        try:
+            cold_secs, cold_discovery = measure(lambda: cold_start(emulator))
+            save_discovery_cache(cold_discovery, cache_path)
+            cache_size = os.path.getsize(cache_path)
+            warm_secs, warm_discovery = measure(lambda: warm_start(cache_path))
+        finally:
+            emulator.stop()
+            set_broadcast_targets()
+    for lifx_value in cold_discovery.values():
+        lifx_value.pop(K_CACHED)
+    for lifx_value in warm_discovery.values():
+        lifx_value.pop(K_CACHED)
+    assert cold_discovery == warm_discovery
+
+    print("{} lamps, {:.0f} ms device latency, discovery cache {:,} bytes".format(args.lights, args.latency * 1000, cache_size))
+    print("  {:<46} {:>16} {:>22}".format("", "lamps started", "every lamp controlled"))
+    print("  {:<46} {:>14.3f} s {:>20.3f} s".format("cold start (discovery, then start each lamp)", *cold_secs))
+    print("  {:<46} {:>14.3f} s {:>20.3f} s".format("warm start (from the discovery cache)", *warm_secs))
+
+
+if __name__ == "__main__":
+    main()